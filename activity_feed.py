@@ -0,0 +1,113 @@
+# activity_feed.py
+import logging
+import threading
+from collections import deque, namedtuple
+from datetime import datetime, timezone
+
+from row_types import money_property
+
+logger = logging.getLogger(__name__)
+
+# kind is 'contribution', 'claim' (submitted) or 'claim_status' (approved, declined, paid)
+class ActivityEvent(namedtuple('ActivityEvent', [
+        'seq', 'kind', 'entity_id', 'member_id', 'member_name', 'amount_cents', 'status', 'created_at'])):
+    __slots__ = ()
+    amount = money_property('amount_cents')
+
+    def to_dict(self):
+        data = self._asdict()
+        data['amount'] = self.amount
+        return data
+
+def utc_timestamp():
+    """Now in the format SQLite's CURRENT_TIMESTAMP stores"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+class ActivityFeed:
+    """Fixed-size, thread-safe ring buffer of recent write events.
+
+    The manager publishes an event after each committed write and the
+    dashboard reads the newest ones without touching SQLite. Subscribers
+    are called synchronously on the publishing thread, so they must be
+    quick; streaming consumers should use wait_for() instead.
+
+    The buffer lives in one process, so other workers' writes only arrive
+    through warm(); the manager re-warms it whenever the tables it is built
+    from have changed since the last warm.
+    """
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self._events = deque(maxlen=capacity)
+        self._seq = 0
+        self._subscribers = []
+        self._condition = threading.Condition()
+
+    def warm(self, rows):
+        """Replace the buffer with (kind, entity_id, member_id, member_name, amount_cents, status, created_at) rows, oldest first.
+
+        Events already held keep their seq, so streams only receive the ones
+        that are new to this process.
+        """
+        with self._condition:
+            known = {(event.kind, event.entity_id, event.status): event for event in self._events}
+            events = []
+            for row in rows[-self.capacity:]:
+                event = known.get((row[0], row[1], row[5]))
+                if event is None:
+                    self._seq += 1
+                    event = ActivityEvent(self._seq, *row)
+                events.append(event)
+            self._events = deque(events, maxlen=self.capacity)
+            self._condition.notify_all()
+
+    def publish(self, kind, entity_id, member_id, member_name, amount_cents, status, created_at=None):
+        with self._condition:
+            self._seq += 1
+            event = ActivityEvent(self._seq, kind, entity_id, member_id, member_name,
+                                  amount_cents, status, created_at or utc_timestamp())
+            self._events.append(event)
+            subscribers = list(self._subscribers)
+            self._condition.notify_all()
+
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Activity subscriber failed: {e}")
+        return event
+
+    def recent(self, limit=10, kind=None):
+        """Newest events first"""
+        with self._condition:
+            events = list(self._events)
+        events.reverse()
+        if kind:
+            events = [event for event in events if event.kind == kind]
+        return events[:limit]
+
+    def since(self, seq):
+        """Events newer than seq, oldest first"""
+        with self._condition:
+            return [event for event in self._events if event.seq > seq]
+
+    def wait_for(self, seq, timeout):
+        """Block until there are events newer than seq (or timeout); returns them oldest first"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > seq, timeout)
+            return [event for event in self._events if event.seq > seq]
+
+    @property
+    def last_seq(self):
+        return self._seq
+
+    def subscribe(self, callback):
+        """Call callback(event) for every new event; returns a function that unsubscribes"""
+        with self._condition:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._condition:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
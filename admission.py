@@ -0,0 +1,177 @@
+# admission.py
+import asyncio
+import threading
+import time
+from functools import wraps
+
+class RouteClass:
+    """Concurrency budget for one class of routes"""
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout, priority):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.priority = priority
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+class AdmissionController:
+    """Priority-aware admission control with per-class limits and bounded queues.
+
+    Each route class has its own concurrency limit and wait queue. On top of
+    that, a shared pool of worker slots is split so lower-priority classes can
+    never take the headroom reserved for critical ones: a class may only run
+    while total in-flight work stays below the shared limit minus the slots
+    reserved for classes of higher priority.
+    """
+
+    def __init__(self, total_slots, reserved_slots=None):
+        self.total_slots = total_slots
+        self.reserved_slots = reserved_slots or {}
+        self.classes = {}
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def add_class(self, name, max_concurrent, max_queue=0, queue_timeout=0.0, priority=0):
+        self.classes[name] = RouteClass(name, max_concurrent, max_queue, queue_timeout, priority)
+
+    def _ceiling(self, route_class):
+        """Total in-flight requests allowed while admitting this class"""
+        held_back = sum(
+            slots for name, slots in self.reserved_slots.items()
+            if self.classes[name].priority > route_class.priority
+        )
+        return self.total_slots - held_back
+
+    def _can_run(self, route_class):
+        return (route_class.active < route_class.max_concurrent
+                and self.in_flight < self._ceiling(route_class))
+
+    def try_acquire(self, name):
+        """Admit a request, waiting in the class queue if allowed; returns True when admitted"""
+        route_class = self.classes[name]
+        with self._condition:
+            if not self._can_run(route_class):
+                if route_class.waiting >= route_class.max_queue or route_class.queue_timeout <= 0:
+                    route_class.rejected += 1
+                    return False
+
+                route_class.waiting += 1
+                deadline = time.monotonic() + route_class.queue_timeout
+                try:
+                    while not self._can_run(route_class):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            route_class.timed_out += 1
+                            route_class.rejected += 1
+                            return False
+                        self._condition.wait(remaining)
+                finally:
+                    route_class.waiting -= 1
+
+            self._admit(route_class)
+            return True
+
+    def _admit(self, route_class):
+        route_class.active += 1
+        route_class.admitted += 1
+        self.in_flight += 1
+
+    async def acquire_async(self, name, poll_interval=0.05):
+        """try_acquire for the event loop: a queued request waits as a coroutine, never on a thread.
+
+        Releases may come from WSGI threads, which cannot wake an event loop
+        condition, so a queued coroutine polls until it is admitted or its
+        class's queue_timeout runs out.
+        """
+        route_class = self.classes[name]
+        with self._condition:
+            if self._can_run(route_class):
+                self._admit(route_class)
+                return True
+            if route_class.waiting >= route_class.max_queue or route_class.queue_timeout <= 0:
+                route_class.rejected += 1
+                return False
+            route_class.waiting += 1
+
+        deadline = time.monotonic() + route_class.queue_timeout
+        try:
+            while True:
+                await asyncio.sleep(min(poll_interval, max(0.0, deadline - time.monotonic())))
+                with self._condition:
+                    if self._can_run(route_class):
+                        self._admit(route_class)
+                        return True
+                    if time.monotonic() >= deadline:
+                        route_class.timed_out += 1
+                        route_class.rejected += 1
+                        return False
+        finally:
+            with self._condition:
+                route_class.waiting -= 1
+
+    def release(self, name):
+        with self._condition:
+            self.classes[name].active -= 1
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def limit(self, name, on_reject):
+        """Decorator admitting a view under a route class; on_reject builds the 503 response"""
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                if not self.try_acquire(name):
+                    return on_reject(self.classes[name])
+                try:
+                    return f(*args, **kwargs)
+                finally:
+                    self.release(name)
+            return decorated_function
+        return decorator
+
+    def limit_stream(self, name, on_reject):
+        """Like limit, for views returning a streaming Response: the slot is held until the response closes"""
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                if not self.try_acquire(name):
+                    return on_reject(self.classes[name])
+                released = threading.Event()
+
+                def release():
+                    if not released.is_set():
+                        released.set()
+                        self.release(name)
+
+                try:
+                    response = f(*args, **kwargs)
+                    response.call_on_close(release)
+                    return response
+                except BaseException:
+                    release()
+                    raise
+            return decorated_function
+        return decorator
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                'in_flight': self.in_flight,
+                'total_slots': self.total_slots,
+                'classes': {
+                    name: {
+                        'active': route_class.active,
+                        'waiting': route_class.waiting,
+                        'admitted': route_class.admitted,
+                        'rejected': route_class.rejected,
+                        'timed_out': route_class.timed_out,
+                        'max_concurrent': route_class.max_concurrent,
+                    }
+                    for name, route_class in self.classes.items()
+                },
+            }
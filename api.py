@@ -0,0 +1,330 @@
+# api.py
+"""Versioned JSON API for the member mobile app.
+
+    POST /api/v1/login          {"username": ..., "password": ..., "pool": ...}
+    GET  /api/v1/me             profile with contribution and claim totals
+    GET  /api/v1/contributions  ?limit=20&cursor=...&fields=id,amount_cents,status
+    POST /api/v1/contributions  {"amount_cents": 15000, "reference": "<client uuid>"}
+    GET  /api/v1/claims         ?limit=&cursor=&fields=
+    GET  /api/v1/claims/<id>
+    POST /api/v1/claims         {"amount_cents": 250000, "description": ..., "type": ..., "hospital": ...}
+    POST /api/v1/phone          {"phone": "082 123 4567"}
+    POST /api/v1/batch          {"requests": [{"method": "GET", "path": "/api/v1/me"}, ...]}
+
+Built for feature phones on slow, metered networks: each action is one
+request answered with a small JSON body instead of a redirect and a full
+page. Money is integer cents, ?fields= trims objects to the keys a screen
+shows, lists page through keyset cursors (an opaque token for the next
+page), responses carry weak ETags for 304s and are gzipped when the client
+accepts it, and /batch runs several calls in one round trip. The same
+session cookie as the web app authenticates every call; claim documents are
+still uploaded through the web form.
+
+Contributions take an optional client-generated reference, so a client
+retrying after a dropped connection gets the original contribution back
+instead of paying twice.
+"""
+import base64
+import gzip
+import logging
+import uuid
+from functools import wraps
+
+from flask import Blueprint, current_app, jsonify, request, session
+
+from member_forms import start_session
+
+logger = logging.getLogger(__name__)
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_BATCH_REQUESTS = 20
+GZIP_MIN_BYTES = 512
+
+MEMBER_FIELDS = ('id', 'name', 'phone', 'email', 'monthly_amount_cents', 'status',
+                 'total_contributed_cents', 'total_contributions', 'total_claims')
+CONTRIBUTION_FIELDS = ('id', 'amount_cents', 'payment_reference', 'status', 'created_at', 'paid_at')
+# Screening and review-lease columns stay internal
+CLAIM_FIELDS = ('id', 'amount_cents', 'description', 'type', 'hospital', 'priority', 'status',
+                'reviewed_at', 'admin_notes', 'created_at', 'version')
+CLAIM_PRIORITIES = ('normal', 'medium', 'high')
+
+class ApiError(Exception):
+    """Answered as {"error": message, "code": code} with the given status"""
+
+    def __init__(self, status, code, message):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+def init_api(app, db, pools, admission):
+    """Register the API on app, serving from the per-request `db` proxy"""
+    app.extensions['api'] = {'db': db, 'pools': pools, 'admission': admission}
+    app.register_blueprint(api)
+    app.register_error_handler(405, _method_not_allowed)
+
+def _db():
+    return current_app.extensions['api']['db']
+
+def admitted(route_class):
+    """Run the view under an admission class, answering 503 JSON when saturated"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            admission = current_app.extensions['api']['admission']
+            if not admission.try_acquire(route_class):
+                raise ApiError(503, 'busy', 'Server busy, retry shortly')
+            try:
+                return f(*args, **kwargs)
+            finally:
+                admission.release(route_class)
+        return decorated_function
+    return decorator
+
+def member_required(f):
+    """Resolve the logged-in member into the view's first argument"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            raise ApiError(401, 'unauthenticated', 'Log in first')
+        if session.get('user_type') != 'member':
+            raise ApiError(403, 'forbidden', 'Member accounts only')
+        member = _db().get_member_by_user_id(session['user_id'])
+        if not member:
+            raise ApiError(404, 'not_found', 'Member profile not found')
+        return f(member, *args, **kwargs)
+    return decorated_function
+
+def _json_body():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        raise ApiError(400, 'bad_request', 'Expected a JSON object body')
+    return body
+
+def _amount_cents(body):
+    amount_cents = body.get('amount_cents')
+    if not isinstance(amount_cents, int) or isinstance(amount_cents, bool) or amount_cents <= 0:
+        raise ApiError(400, 'invalid', 'amount_cents must be a positive integer')
+    return amount_cents
+
+def _fields(allowed):
+    """The ?fields= selection, defaulting to all allowed fields"""
+    requested = request.args.get('fields')
+    if not requested:
+        return allowed
+    fields = tuple(field.strip() for field in requested.split(',') if field.strip())
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ApiError(400, 'invalid', f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def _project(row, fields):
+    values = row if isinstance(row, dict) else row._asdict()
+    return {field: values[field] for field in fields}
+
+def _encode_cursor(row):
+    return base64.urlsafe_b64encode(f"{row.created_at}|{row.id}".encode()).decode().rstrip('=')
+
+def _decode_cursor(token):
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode().rsplit('|', 1)
+        return created_at, int(row_id)
+    except ValueError:
+        raise ApiError(400, 'invalid', 'Malformed cursor')
+
+def _page(fetch, fields):
+    """One keyset page: fetch(limit, before) must return rows newest first"""
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor')
+    rows = fetch(limit + 1, _decode_cursor(cursor) if cursor else None)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return jsonify({
+        'items': [_project(row, fields) for row in rows],
+        'next_cursor': _encode_cursor(rows[-1]) if has_more else None,
+    })
+
+# ----------------------------------------------------------------------
+# Endpoints
+# ----------------------------------------------------------------------
+
+@api.route('/login', methods=['POST'])
+@admitted('member_read')
+def login():
+    body = _json_body()
+    username = str(body.get('username', '')).strip()
+    password = str(body.get('password', ''))
+    if not username or not password:
+        raise ApiError(400, 'invalid', 'username and password are required')
+
+    pools = current_app.extensions['api']['pools']
+    pool_id = body.get('pool')
+    if pool_id is not None and not isinstance(pool_id, str):
+        raise ApiError(400, 'invalid', 'pool must be a string')
+    pool_id = pool_id if pool_id in pools else pools.default_pool
+    user = pools.get(pool_id).authenticate_user(username, password)
+    if not user:
+        raise ApiError(401, 'unauthenticated', 'Invalid username or password')
+
+    start_session(session, pool_id, user)
+    return jsonify({'user_id': user['id'], 'user_type': user['user_type'], 'name': user['name']})
+
+@api.route('/me')
+@admitted('member_read')
+@member_required
+def me(member):
+    fields = _fields(MEMBER_FIELDS)
+    profile = {key: member[key] for key in ('id', 'name', 'phone', 'email', 'status')}
+    profile['monthly_amount_cents'] = round(member['monthly_amount'] * 100)
+    if {'total_contributed_cents', 'total_contributions', 'total_claims'} & set(fields):
+        profile.update(_db().get_member_totals(member['id']))
+    return jsonify(_project(profile, fields))
+
+@api.route('/contributions')
+@admitted('member_read')
+@member_required
+def list_contributions(member):
+    return _page(lambda limit, before: _db().get_member_contributions(member['id'], limit, before),
+                 _fields(CONTRIBUTION_FIELDS))
+
+@api.route('/contributions', methods=['POST'])
+@admitted('member_write')
+@member_required
+def create_contribution(member):
+    body = _json_body()
+    amount_cents = _amount_cents(body)
+    reference = str(body.get('reference') or uuid.uuid4())[:100]
+
+    # A retried request gets back the contribution its first attempt recorded
+    existing = body.get('reference') and _db().get_contribution_by_reference(member['id'], reference)
+    if existing:
+        return jsonify(_project(existing, CONTRIBUTION_FIELDS))
+    if not _db().record_contribution(member['id'], amount_cents / 100, reference):
+        existing = _db().get_contribution_by_reference(member['id'], reference)
+        if existing:
+            return jsonify(_project(existing, CONTRIBUTION_FIELDS))
+        raise ApiError(500, 'error', 'Could not record the contribution')
+    return jsonify(_project(_db().get_contribution_by_reference(member['id'], reference), CONTRIBUTION_FIELDS)), 201
+
+@api.route('/claims')
+@admitted('member_read')
+@member_required
+def list_claims(member):
+    return _page(lambda limit, before: _db().get_member_claims(member['id'], limit, before),
+                 _fields(CLAIM_FIELDS))
+
+@api.route('/claims/<int:claim_id>')
+@admitted('member_read')
+@member_required
+def get_claim(member, claim_id):
+    claim = _db().get_member_claim(member['id'], claim_id)
+    if claim is None:
+        raise ApiError(404, 'not_found', f'Claim {claim_id} not found')
+    return jsonify(_project(claim, _fields(CLAIM_FIELDS)))
+
+@api.route('/claims', methods=['POST'])
+@admitted('member_write')
+@member_required
+def create_claim(member):
+    body = _json_body()
+    amount_cents = _amount_cents(body)
+    description = str(body.get('description', '')).strip()
+    if not description:
+        raise ApiError(400, 'invalid', 'description is required')
+    priority = body.get('priority', 'normal')
+    if priority not in CLAIM_PRIORITIES:
+        raise ApiError(400, 'invalid', f"priority must be one of {', '.join(CLAIM_PRIORITIES)}")
+
+    claim_id = _db().create_claim(member['id'], amount_cents / 100, description,
+                                  str(body.get('type') or 'General').strip(),
+                                  str(body.get('hospital') or '').strip(), priority)
+    if not claim_id:
+        raise ApiError(500, 'error', 'Could not submit the claim')
+    return jsonify(_project(_db().get_member_claim(member['id'], claim_id), _fields(CLAIM_FIELDS))), 201
+
+@api.route('/phone', methods=['POST'])
+@admitted('member_write')
+@member_required
+def update_phone(member):
+    phone = str(_json_body().get('phone', '')).strip()
+    if not phone or not phone.replace(' ', '').replace('-', '').isdigit():
+        raise ApiError(400, 'invalid', 'Enter a valid phone number')
+    if not _db().update_member_phone(member['id'], phone):
+        raise ApiError(500, 'error', 'Could not update the phone number')
+    session['phone'] = phone
+    return jsonify({'phone': phone})
+
+@api.route('/batch', methods=['POST'])
+def batch():
+    """Run up to MAX_BATCH_REQUESTS API calls in order; returns their statuses and bodies"""
+    calls = _json_body().get('requests')
+    if not isinstance(calls, list) or not 0 < len(calls) <= MAX_BATCH_REQUESTS:
+        raise ApiError(400, 'invalid', f'requests must list 1 to {MAX_BATCH_REQUESTS} calls')
+
+    outer_session = session._get_current_object()
+    responses = []
+    for call in calls:
+        method = str(call.get('method', 'GET')).upper() if isinstance(call, dict) else ''
+        path = str(call.get('path', '')) if isinstance(call, dict) else ''
+        if not path.startswith(api.url_prefix + '/') or path.split('?')[0] in (
+                f"{api.url_prefix}/batch", f"{api.url_prefix}/login"):
+            responses.append({'status': 400, 'body': {'error': 'Not allowed in a batch', 'code': 'invalid'}})
+            continue
+        # Each call runs as its own request, with its own g, starting from this request's
+        # session; changes a call makes (e.g. /phone) are copied back for the batch response
+        with current_app.app_context(), current_app.test_request_context(
+                path, method=method, json=call.get('body')):
+            session.update(outer_session)
+            session.modified = False
+            response = current_app.full_dispatch_request()
+            if session.modified:
+                outer_session.clear()
+                outer_session.update(session)
+        body = response.get_json(silent=True)
+        responses.append({'status': response.status_code, 'body': body})
+    return jsonify({'responses': responses})
+
+# ----------------------------------------------------------------------
+# Errors and response compression
+# ----------------------------------------------------------------------
+
+def is_api_request():
+    return request.path.startswith(api.url_prefix + '/')
+
+def error_response(status, code, message):
+    return jsonify({'error': message, 'code': code}), status
+
+@api.errorhandler(ApiError)
+def api_error(error):
+    return error_response(error.status, error.code, error.message)
+
+@api.errorhandler(500)
+def api_internal_error(error):
+    logger.error(f"API error on {request.path}: {error}")
+    return error_response(500, 'error', 'Internal error')
+
+def _method_not_allowed(error):
+    # Routing errors never reach the blueprint's handlers, so this is app-wide
+    if is_api_request():
+        return error_response(405, 'method_not_allowed', 'Method not allowed')
+    return error
+
+@api.after_request
+def compact_response(response):
+    """Weak ETag for conditional GETs, then gzip bodies worth compressing"""
+    response.headers['Cache-Control'] = 'private, no-cache'
+    if request.method == 'GET' and response.status_code == 200:
+        response.add_etag(weak=True)
+        response.make_conditional(request)
+    if response.status_code in (200, 201) and not response.direct_passthrough \
+            and 'gzip' in request.headers.get('Accept-Encoding', '') \
+            and 'Content-Encoding' not in response.headers:
+        body = response.get_data()
+        if len(body) >= GZIP_MIN_BYTES:
+            response.set_data(gzip.compress(body, compresslevel=6))
+            response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
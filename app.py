@@ -1,12 +1,32 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Flask, Response, abort, g, make_response, send_file, render_template, request, jsonify, redirect, url_for, flash, session, stream_with_context, has_request_context
 import uuid
 import os
+import json
+import time
+import mimetypes
 import logging
 from functools import wraps
 import traceback
-from datetime import datetime
+from datetime import datetime, timedelta
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.local import LocalProxy
+from werkzeug.utils import secure_filename
 
-from database_manager import CommunityPoolManager
+from activity_feed import utc_timestamp
+from admission import AdmissionController
+from api import error_response as api_error_response, init_api, is_api_request
+from asset_pipeline import AssetManifest
+from attachments import AttachmentRequest, AttachmentStore, MAX_ATTACHMENTS_PER_CLAIM, MAX_UPLOAD_BYTES
+from database_manager import EXPORT_QUERIES
+from export_service import EXPORT_FORMATS, iter_export
+from member_forms import home_endpoint, parse_claim, parse_contribution, parse_login, start_session
+from metrics import metrics
+from payout_engine import PayoutEngine
+from pool_registry import PoolRegistry
+from response_cache import RenderedPageCache, is_not_modified, last_modified, page_etag
+from scheduler import JobScheduler
+from template_build import attach_bytecode_cache, warm_templates
+from workload import WorkloadRecorder
 
 # Configure logging
 logging.basicConfig(
@@ -19,8 +39,52 @@ app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['DEBUG'] = False
 
-# Initialize database
-db = CommunityPoolManager()
+# Uploaded files stream straight into the content-addressed attachment store
+attachment_store = AttachmentStore()
+AttachmentRequest.attachment_store = attachment_store
+app.request_class = AttachmentRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+
+# Initialize one database per community pool
+pools = PoolRegistry()
+
+def _requested_pool_id(pool_id=None):
+    """Resolve a pool id, falling back to the default for unknown values"""
+    if not pool_id and has_request_context():
+        pool_id = session.get('pool_id')
+    return pool_id if pool_id in pools else pools.default_pool
+
+def current_pool_manager():
+    """Manager for the logged-in user's pool"""
+    return pools.get(_requested_pool_id())
+
+# Routes keep using `db`; it resolves to the current user's pool per request
+db = LocalProxy(current_pool_manager)
+
+# WAL checkpoints, ANALYZE, lease expiry and stats refresh run here, off the request path;
+# every worker starts one and the per-job lock in each pool's database picks a single runner
+scheduler = JobScheduler(pools)
+if os.getenv('SCHEDULER_ENABLED', '1') != '0':
+    scheduler.start()
+
+@app.context_processor
+def inject_pools():
+    return {
+        'available_pools': [(pool_id, pools.pool_name(pool_id)) for pool_id in pools.pool_ids()],
+        'current_pool_name': pools.pool_name(_requested_pool_id()),
+    }
+
+# Fingerprinted static assets built by asset_pipeline.py
+asset_manifest = AssetManifest()
+
+def asset_url(name):
+    return asset_manifest.url_for(name, lambda filename: url_for('static_asset', filename=filename))
+
+app.jinja_env.globals['asset_url'] = asset_url
+
+# Templates load from the bytecode cache built by template_build.py, all at startup
+attach_bytecode_cache(app)
+warm_templates(app)
 
 def login_required(f):
     @wraps(f)
@@ -40,6 +104,179 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Admission control: member writes keep headroom, heavy admin pages are capped
+admission = AdmissionController(
+    total_slots=int(os.getenv('ADMISSION_TOTAL_SLOTS', '32')),
+    reserved_slots={'member_write': 8, 'member_read': 4}
+)
+admission.add_class('member_write', max_concurrent=32, max_queue=64, queue_timeout=10.0, priority=2)
+admission.add_class('member_read', max_concurrent=24, max_queue=48, queue_timeout=5.0, priority=1)
+admission.add_class('admin_heavy', max_concurrent=int(os.getenv('ADMIN_HEAVY_CONCURRENCY', '2')),
+                    max_queue=4, queue_timeout=2.0, priority=0)
+# Each activity stream holds a worker thread for ACTIVITY_STREAM_SECONDS, so only a few may be open
+admission.add_class('admin_stream', max_concurrent=int(os.getenv('ADMIN_STREAM_CONCURRENCY', '4')),
+                    max_queue=0, priority=0)
+
+RETRY_AFTER_SECONDS = 5
+
+def _reject_busy(route_class):
+    logger.warning(f"Shedding {request.endpoint} request: {route_class.name} saturated "
+                   f"({route_class.active} active, {route_class.waiting} waiting)")
+    metrics.inc('http_errors_total', (('status', '503'),))
+    response = make_response(render_template('503.html', retry_after=RETRY_AFTER_SECONDS), 503)
+    response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return response
+
+def admit(route_class):
+    """Run the view under the given admission class, answering 503 when saturated"""
+    return admission.limit(route_class, _reject_busy)
+
+def admit_stream(route_class):
+    """admit for streaming views: the slot is held until the response body has been sent"""
+    return admission.limit_stream(route_class, _reject_busy)
+
+# Rendered pages keyed by ETag, shared by all requests in this process
+page_cache = RenderedPageCache()
+
+# Per-route latency and status counts for /metrics
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - started,
+                        (('endpoint', endpoint),))
+        metrics.inc('http_requests_total',
+                    (('endpoint', endpoint), ('method', request.method), ('status', str(response.status_code))))
+    return response
+
+# JSON API for the member mobile app, sharing sessions, pools and admission classes with the pages
+init_api(app, db, pools, admission)
+
+# WORKLOAD_CAPTURE=path records every request for workload.py replay
+if os.getenv('WORKLOAD_CAPTURE'):
+    WorkloadRecorder(os.environ['WORKLOAD_CAPTURE']).init_app(app)
+
+metrics.gauge('page_cache_entries', 'Rendered pages held in the page cache', lambda: len(page_cache._entries))
+metrics.gauge('page_cache_hits_total', 'Page cache hits', lambda: page_cache.hits)
+metrics.gauge('page_cache_misses_total', 'Page cache misses', lambda: page_cache.misses)
+metrics.gauge('admission_in_flight', 'Requests admitted and still running', lambda: admission.in_flight)
+
+def _admission_gauge(field):
+    return lambda: {(('class', name),): stats[field] for name, stats in admission.snapshot()['classes'].items()}
+
+metrics.gauge('admission_active', 'Running requests per admission class', _admission_gauge('active'))
+metrics.gauge('admission_waiting', 'Queued requests per admission class', _admission_gauge('waiting'))
+metrics.gauge('admission_rejected_total', 'Requests shed per admission class', _admission_gauge('rejected'))
+
+def conditional_view(*tables, expiry=None):
+    """Serve 304s and cached renders while the given tables are unchanged.
+    
+    The ETag covers the pool, the logged-in user, the view and query
+    arguments and the change counters of the tables the view reads. Pages
+    with pending flash messages are always rendered fresh.
+    
+    Pages that also change with the clock pass expiry, a callable
+    returning (next change, last change) as UTC timestamps: the next
+    change joins the ETag and the last one can move Last-Modified forward.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if session.get('_flashes'):
+                return f(*args, **kwargs)
+            
+            versions = db.get_table_versions(tables)
+            bounds = expiry() if expiry else (None, None)
+            if not versions or bounds is None:
+                return f(*args, **kwargs)
+            
+            next_change, last_change = bounds
+            etag = page_etag(request.endpoint, _requested_pool_id(), session.get('user_id'), kwargs, request.args,
+                             *([next_change] if expiry else []), versions=versions)
+            modified = last_modified(versions, last_change)
+            
+            if is_not_modified(request, etag, modified):
+                response = make_response('', 304)
+            else:
+                body = page_cache.get(etag)
+                if body is None:
+                    response = make_response(f(*args, **kwargs))
+                    if response.status_code != 200 or session.get('_flashes'):
+                        return response
+                    page_cache.set(etag, response.get_data())
+                else:
+                    response = make_response(body)
+            
+            response.set_etag(etag)
+            response.last_modified = modified
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
+
+@app.route('/assets/<path:filename>')
+def static_asset(filename):
+    path, encoding, immutable = asset_manifest.resolve_file(filename, request.headers.get('Accept-Encoding', ''))
+    if not path:
+        abort(404)
+    
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0], conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = asset_manifest.IMMUTABLE_CACHE_CONTROL if immutable else 'public, no-cache'
+    return response
+
+@app.route('/admin/attachments/<int:attachment_id>')
+@login_required
+@admin_required
+def claim_attachment(attachment_id):
+    """Serve a claim document from disk; send_file handles Range requests and sendfile"""
+    attachment = db.get_attachment(attachment_id)
+    path = attachment_store.path_for(attachment.sha256) if attachment else None
+    if not path or not os.path.exists(path):
+        abort(404)
+    
+    response = send_file(path, mimetype=attachment.content_type, download_name=attachment.filename,
+                         as_attachment=request.args.get('download') == '1', conditional=True,
+                         etag=attachment.sha256)
+    # Content-addressed, so the bytes behind this id never change
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+@app.route('/admin/attachments/<int:attachment_id>/thumbnail')
+@login_required
+@admin_required
+def claim_attachment_thumbnail(attachment_id):
+    attachment = db.get_attachment(attachment_id)
+    path = attachment_store.thumbnail_path(attachment.sha256) if attachment else None
+    if not path or not os.path.exists(path):
+        abort(404)
+    response = send_file(path, mimetype='image/jpeg', conditional=True, etag=f"thumb-{attachment.sha256}")
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text exposition; reads only in-memory counters"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/healthz')
+def healthz():
+    """Liveness probe: one trivial query per pool, no admission queue, no heavy queries"""
+    checks = {pool_id: 'ok' if pools.get(pool_id).ping() else 'unavailable' for pool_id in pools.pool_ids()}
+    healthy = all(status == 'ok' for status in checks.values())
+    response = jsonify({'status': 'ok' if healthy else 'unavailable', 'pools': checks})
+    response.status_code = 200 if healthy else 503
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 @app.route('/')
 def index():
     if 'user_id' in session:
@@ -50,32 +287,21 @@ def index():
     return render_template('login.html')
 
 @app.route('/login', methods=['GET', 'POST'])
+@admit('member_read')
 def login():
     try:
         if request.method == 'POST':
-            username = request.form.get('username', '').strip()
-            password = request.form.get('password', '')
-            
-            if not username or not password:
-                flash('Username and password are required.', 'danger')
+            username, password, error = parse_login(request.form)
+            if error:
+                flash(error, 'danger')
                 return render_template('login.html')
             
-            user = db.authenticate_user(username, password)
+            pool_id = _requested_pool_id(request.form.get('pool'))
+            user = pools.get(pool_id).authenticate_user(username, password)
             if user:
-                session['user_id'] = user['id']
-                session['username'] = user['username']
-                session['user_type'] = user['user_type']
-                session['member_id'] = user['member_id']
-                session['name'] = user['name']
-                session['phone'] = user['phone']
-                session['email'] = user['email']
-                
+                start_session(session, pool_id, user)
                 flash(f'Welcome back, {user["name"]}!', 'success')
-                
-                if user['user_type'] == 'admin':
-                    return redirect(url_for('dashboard'))
-                else:
-                    return redirect(url_for('member_dashboard'))
+                return redirect(url_for(home_endpoint(user['user_type'])))
             else:
                 flash('Invalid username or password.', 'danger')
         
@@ -102,7 +328,13 @@ def register():
                 flash('Please enter a valid phone number.', 'danger')
                 return render_template('register.html')
 
-            member_id = db.create_user(username, password, phone, email)
+            pool_id = _requested_pool_id(request.form.get('pool'))
+            conflict = pools.get(pool_id).registration_conflict(username, phone, email)
+            if conflict:
+                flash(f'That {conflict} is already registered.', 'danger')
+                return render_template('register.html')
+            
+            member_id = pools.get(pool_id).create_user(username, password, phone, email)
             if member_id:
                 flash('Registration successful! Please log in.', 'success')
                 return redirect(url_for('login'))
@@ -125,6 +357,8 @@ def logout():
 @app.route('/dashboard')
 @login_required
 @admin_required
+@conditional_view('members', 'contributions', 'claims', 'payouts', 'archive_ledger')
+@admit('admin_heavy')
 def dashboard():
     try:
         stats = db.get_pool_stats()
@@ -142,30 +376,147 @@ def dashboard():
         flash('Error loading dashboard.', 'danger')
         return redirect(url_for('index'))
 
+ACTIVITY_STREAM_SECONDS = 300
+ACTIVITY_KEEPALIVE_SECONDS = 15
+
+@app.route('/admin/activity/stream')
+@login_required
+@admin_required
+@admit_stream('admin_stream')
+def activity_stream():
+    """Server-sent events from the activity feed; browsers reconnect after each stream ends"""
+    feed = db.activity
+    after = request.headers.get('Last-Event-ID', type=int)
+    if after is None:
+        after = request.args.get('after', feed.last_seq, type=int)
+    
+    def generate():
+        seq = after
+        deadline = time.monotonic() + ACTIVITY_STREAM_SECONDS
+        yield 'retry: 3000\n\n'
+        while time.monotonic() < deadline:
+            events = feed.wait_for(seq, ACTIVITY_KEEPALIVE_SECONDS)
+            if not events:
+                yield ': keepalive\n\n'
+                continue
+            for event in events:
+                seq = event.seq
+                yield f"id: {event.seq}\nevent: activity\ndata: {json.dumps(event.to_dict())}\n\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/admin/members')
 @login_required
 @admin_required
+@conditional_view('members', 'contributions', 'claims')
+@admit('admin_heavy')
 def admin_members():
     try:
-        members = db.get_all_members()
-        return render_template('admin_members.html', members=members)
+        query = request.args.get('q', '').strip()
+        members = db.search_members(query) if query else db.get_all_members()
+        return render_template('admin_members.html', members=members, query=query)
     except Exception as e:
         logger.error(f"Admin members error: {e}\n{traceback.format_exc()}")
         flash('Error loading members.', 'danger')
         return redirect(url_for('dashboard'))
 
+@app.route('/admin/members/search')
+@login_required
+@admin_required
+def search_members():
+    """Member search by name, phone or email fragment, as JSON"""
+    query = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    members = db.search_members(query, limit=limit)
+    return jsonify([
+        {
+            'id': member.id,
+            'name': member.name,
+            'phone': member.phone,
+            'email': member.email,
+            'status': member.status,
+            'total_claims': member.total_claims,
+        }
+        for member in members
+    ])
+
 @app.route('/admin/claims')
 @login_required
 @admin_required
+@conditional_view('claims', 'members', 'users', 'claim_attachments',
+                  expiry=lambda: db.get_lease_expiry_bounds())
+@admit('admin_heavy')
 def admin_claims():
     try:
         claims = db.get_all_claims()
-        return render_template('admin_claims.html', claims=claims)
+        attachments = db.get_claim_attachments(claim.id for claim in claims)
+        history = db.get_claim_history(claim.id for claim in claims if claim.status != 'pending')
+        return render_template('admin_claims.html', claims=claims, attachments=attachments, history=history,
+                               now=utc_timestamp())
     except Exception as e:
         logger.error(f"Admin claims error: {e}\n{traceback.format_exc()}")
         flash('Error loading claims.', 'danger')
         return redirect(url_for('dashboard'))
 
+CLAIM_LEASE_SECONDS = int(os.getenv('CLAIM_LEASE_SECONDS', '900'))
+CLAIM_CHECKOUT_SIZE = 10
+
+def _claims_return_url():
+    """Send reviewers back to their queue when they acted from it"""
+    return url_for('claim_queue') if request.form.get('from_queue') else url_for('admin_claims')
+
+@app.route('/admin/claims/queue')
+@login_required
+@admin_required
+def claim_queue():
+    """Claims leased to the current admin for review"""
+    try:
+        claims = db.get_leased_claims(session['user_id'])
+        attachments = db.get_claim_attachments(claim.id for claim in claims)
+        return render_template('admin_claims.html', claims=claims, attachments=attachments, queue=True, now=utc_timestamp(),
+                               checkout_size=CLAIM_CHECKOUT_SIZE, lease_minutes=CLAIM_LEASE_SECONDS // 60)
+    except Exception as e:
+        logger.error(f"Claim queue error: {e}\n{traceback.format_exc()}")
+        flash('Error loading your review queue.', 'danger')
+        return redirect(url_for('admin_claims'))
+
+@app.route('/admin/claims/checkout', methods=['POST'])
+@login_required
+@admin_required
+def checkout_claims():
+    count = min(request.form.get('count', CLAIM_CHECKOUT_SIZE, type=int), 50)
+    claims = db.checkout_claims(session['user_id'], count, CLAIM_LEASE_SECONDS)
+    if claims:
+        flash(f'{len(claims)} claims reserved for you for {CLAIM_LEASE_SECONDS // 60} minutes.', 'success')
+    else:
+        flash('No unreserved pending claims left.', 'info')
+    return redirect(url_for('claim_queue'))
+
+@app.route('/admin/claims/release', methods=['POST'])
+@login_required
+@admin_required
+def release_claims():
+    released = db.release_claim_leases(session['user_id'])
+    flash(f'Returned {released} claims to the queue.', 'info')
+    return redirect(url_for('admin_claims'))
+
+def _flash_claim_transition(claim_id, result, done_message):
+    """Tell the reviewer how their approve/decline went"""
+    if result.outcome == 'ok':
+        flash(done_message, 'success')
+    elif result.outcome == 'conflict':
+        flash(f'Claim #{claim_id} was changed by another admin while you were reviewing it and is now '
+              f'{result.status}. Check it again before acting.', 'warning')
+    elif result.outcome == 'invalid':
+        flash(f'Claim #{claim_id} is already {result.status}.', 'warning')
+    elif result.outcome == 'leased':
+        flash(f'Claim #{claim_id} is reserved by another admin.', 'warning')
+    elif result.outcome == 'missing':
+        flash(f'Claim #{claim_id} does not exist.', 'danger')
+    else:
+        flash('Error updating claim.', 'danger')
+
 @app.route('/admin/approve_claim/<int:claim_id>', methods=['POST'])
 @login_required
 @admin_required
@@ -174,14 +525,13 @@ def approve_claim(claim_id):
         admin_notes = request.form.get('admin_notes', '').strip()
         admin_user_id = session['user_id']
         
-        if db.update_claim_status(claim_id, 'approved', admin_user_id, admin_notes):
-            flash('Claim approved successfully!', 'success')
-        else:
-            flash('Error approving claim.', 'danger')
+        result = db.update_claim_status(claim_id, 'approved', admin_user_id, admin_notes,
+                                        expected_version=request.form.get('version', type=int))
+        _flash_claim_transition(claim_id, result, 'Claim approved successfully!')
     except Exception as e:
         logger.error(f"Approve claim error: {e}\n{traceback.format_exc()}")
         flash('Error approving claim.', 'danger')
-    return redirect(url_for('admin_claims'))
+    return redirect(_claims_return_url())
 
 @app.route('/admin/decline_claim/<int:claim_id>', methods=['POST'])
 @login_required
@@ -191,21 +541,104 @@ def decline_claim(claim_id):
         admin_notes = request.form.get('admin_notes', '').strip()
         if not admin_notes:
             flash('Please provide a reason for declining the claim.', 'warning')
-            return redirect(url_for('admin_claims'))
+            return redirect(_claims_return_url())
             
         admin_user_id = session['user_id']
             
-        if db.update_claim_status(claim_id, 'declined', admin_user_id, admin_notes):
-            flash('Claim declined successfully!', 'success')
-        else:
-            flash('Error declining claim.', 'danger')
+        result = db.update_claim_status(claim_id, 'declined', admin_user_id, admin_notes,
+                                        expected_version=request.form.get('version', type=int))
+        _flash_claim_transition(claim_id, result, 'Claim declined successfully!')
     except Exception as e:
         logger.error(f"Decline claim error: {e}\n{traceback.format_exc()}")
         flash('Error declining claim.', 'danger')
+    return redirect(_claims_return_url())
+
+@app.route('/admin/pools')
+@login_required
+@admin_required
+@admit('admin_heavy')
+def admin_pools():
+    """Stats for every community pool, queried in parallel"""
+    try:
+        per_pool, totals = pools.aggregate_stats()
+        pool_rows = [
+            (pool_id, pools.pool_name(pool_id), stats)
+            for pool_id, stats in per_pool.items()
+        ]
+        return render_template('admin_pools.html', pool_rows=pool_rows, totals=totals)
+    except Exception as e:
+        logger.error(f"Admin pools error: {e}\n{traceback.format_exc()}")
+        flash('Error loading pool overview.', 'danger')
+        return redirect(url_for('dashboard'))
+
+@app.route('/admin/claims/rescreen', methods=['POST'])
+@login_required
+@admin_required
+@admit('admin_heavy')
+def rescreen_claims():
+    try:
+        flagged_count = db.rescreen_pending_claims()
+        if flagged_count is None:
+            flash('Error screening pending claims.', 'danger')
+        else:
+            flash(f'Screening complete: {flagged_count} pending claim(s) flagged.', 'info')
+    except Exception as e:
+        logger.error(f"Rescreen claims error: {e}\n{traceback.format_exc()}")
+        flash('Error screening pending claims.', 'danger')
     return redirect(url_for('admin_claims'))
 
+@app.route('/admin/payouts/run', methods=['POST'])
+@login_required
+@admin_required
+@admit('admin_heavy')
+def run_payouts():
+    try:
+        summary = PayoutEngine(db._get_current_object()).run()
+        if summary is None:
+            flash('Error running payouts.', 'danger')
+        else:
+            flash(f"Payout run complete: {summary['paid']} paid, {summary['failed']} failed "
+                  f"in {summary['batches']} batch(es).", 'success' if not summary['failed'] else 'warning')
+    except Exception as e:
+        logger.error(f"Run payouts error: {e}\n{traceback.format_exc()}")
+        flash('Error running payouts.', 'danger')
+    return redirect(url_for('admin_claims'))
+
+@app.route('/admin/export/<entity>.<fmt>')
+@login_required
+@admin_required
+@admit_stream('admin_heavy')
+def export_data(entity, fmt):
+    """Stream members, claims or contributions as CSV or JSON Lines"""
+    if entity not in EXPORT_QUERIES or fmt not in EXPORT_FORMATS:
+        return make_response(render_template('404.html'), 404)
+    
+    try:
+        start = request.args.get('start', '').strip()
+        end = request.args.get('end', '').strip()
+        start_date = datetime.strptime(start, '%Y-%m-%d').strftime('%Y-%m-%d') if start else None
+        # The end date is inclusive for the user, so compare against the following day
+        end_date = (datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d') if end else None
+    except ValueError:
+        flash('Dates must be in YYYY-MM-DD format.', 'danger')
+        return redirect(url_for('dashboard'))
+    
+    logger.info(f"Exporting {entity} as {fmt} (start={start or '-'}, end={end or '-'})")
+    batches = db.iter_export_rows(entity, start_date, end_date)
+    filename = f"{entity}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    return Response(
+        stream_with_context(iter_export(batches, fmt)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+# Tables the member dashboard reads, shared with the async view in asgi.py
+MEMBER_DASHBOARD_TABLES = ('members', 'users', 'contributions', 'claims')
+
 @app.route('/member_dashboard')
 @login_required
+@conditional_view(*MEMBER_DASHBOARD_TABLES)
+@admit('member_read')
 def member_dashboard():
     try:
         if session.get('user_type') == 'admin':
@@ -230,6 +663,7 @@ def member_dashboard():
 
 @app.route('/contribute', methods=['GET', 'POST'])
 @login_required
+@admit('member_write')
 def contribute():
     try:
         if session.get('user_type') == 'admin':
@@ -242,14 +676,9 @@ def contribute():
             return redirect(url_for('member_dashboard'))
         
         if request.method == 'POST':
-            try:
-                amount = float(request.form.get('amount', 0))
-            except ValueError:
-                flash('Please enter a valid amount.', 'danger')
-                return redirect(url_for('contribute'))
-            
-            if amount <= 0:
-                flash('Please enter a valid amount.', 'danger')
+            amount, error = parse_contribution(request.form)
+            if error:
+                flash(error, 'danger')
                 return redirect(url_for('contribute'))
             
             reference_id = str(uuid.uuid4())
@@ -268,6 +697,7 @@ def contribute():
 
 @app.route('/submit_claim', methods=['GET', 'POST'])
 @login_required
+@admit('member_write')
 def submit_claim():
     try:
         if session.get('user_type') == 'admin':
@@ -280,34 +710,38 @@ def submit_claim():
             return redirect(url_for('member_dashboard'))
         
         if request.method == 'POST':
-            description = request.form.get('description', '').strip()
-            claim_type = request.form.get('type', 'General').strip()
-            hospital = request.form.get('hospital', '').strip()
-            priority = request.form.get('priority', 'normal')
-            
-            try:
-                amount = float(request.form.get('amount', 0))
-            except ValueError:
-                flash('Please enter a valid amount.', 'danger')
+            claim, error = parse_claim(request.form)
+            if error:
+                flash(error, 'danger')
                 return redirect(url_for('submit_claim'))
             
-            if not all([description]):
-                flash('Description is required.', 'danger')
+            uploads = [upload for upload in request.files.getlist('attachments') if upload.filename]
+            if len(uploads) > MAX_ATTACHMENTS_PER_CLAIM:
+                flash(f'Attach at most {MAX_ATTACHMENTS_PER_CLAIM} documents.', 'danger')
                 return redirect(url_for('submit_claim'))
             
-            if amount <= 0:
-                flash('Please enter a valid amount.', 'danger')
-                return redirect(url_for('submit_claim'))
+            for upload in uploads:
+                if not upload.stream.content_type:
+                    flash(f'{upload.filename} is not a PDF, JPEG, PNG or WebP file.', 'danger')
+                    return redirect(url_for('submit_claim'))
             
-            claim_id = db.create_claim(member['id'], amount, description, claim_type, hospital, priority)
+            attachments = [(attachment_store.commit(upload.stream), secure_filename(upload.filename) or 'attachment',
+                            upload.stream.content_type, upload.stream.size) for upload in uploads]
+            claim_id = db.create_claim(member['id'], **claim, attachments=attachments, uploaded_by=session['user_id'])
             
             if claim_id:
+                for sha256, _, content_type, _ in attachments:
+                    attachment_store.schedule_thumbnail(sha256, content_type)
                 flash('Claim submitted successfully!', 'success')
                 return redirect(url_for('member_dashboard'))
             else:
                 flash('Error submitting claim.', 'danger')
         
-        return render_template('submit_claim.html', member=member)
+        return render_template('submit_claim.html', member=member,
+                               max_attachments=MAX_ATTACHMENTS_PER_CLAIM, max_upload_mb=MAX_UPLOAD_BYTES // (1024 * 1024))
+    except RequestEntityTooLarge:
+        flash(f'Attachments are too large; the limit is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB per claim.', 'danger')
+        return redirect(url_for('submit_claim'))
     except Exception as e:
         logger.error(f"Submit claim error: {e}\n{traceback.format_exc()}")
         flash('An error occurred.', 'danger')
@@ -315,6 +749,7 @@ def submit_claim():
 
 @app.route('/update_phone', methods=['GET', 'POST'])
 @login_required
+@admit('member_write')
 def update_phone():
     try:
         if session.get('user_type') == 'admin':
@@ -353,6 +788,7 @@ def update_phone():
 @app.route('/debug/admin')
 @login_required
 @admin_required
+@admit('admin_heavy')
 def debug_admin():
     """Debug admin functionality"""
     try:
@@ -366,6 +802,7 @@ def debug_admin():
             'total_pending_claims': len(pending_claims),
             'pool_stats': stats,
             'total_members': len(members),
+            'admission': admission.snapshot(),
             'session_data': dict(session)
         }
         
@@ -375,10 +812,14 @@ def debug_admin():
 
 @app.errorhandler(404)
 def not_found_error(error):
+    metrics.inc('http_errors_total', (('status', '404'),))
+    if is_api_request():
+        return api_error_response(404, 'not_found', 'No such endpoint')
     return render_template('404.html'), 404
 
 @app.errorhandler(500)
 def internal_error(error):
+    metrics.inc('http_errors_total', (('status', '500'),))
     logger.error(f"500 error: {error}\n{traceback.format_exc()}")
     return render_template('500.html'), 500
 
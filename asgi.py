@@ -0,0 +1,310 @@
+# asgi.py
+"""ASGI serving mode.
+
+    uvicorn asgi:application --workers 2
+
+Requires quart and asgiref. The member-facing routes that spend most of
+their time waiting (login with its password hash, the member dashboard,
+contributions and claim submission) are async Quart views. Their
+CommunityPoolManager calls run on a dedicated, bounded thread pool, so a
+handful of processes can hold thousands of slow mobile connections without
+a thread per connection. Every other path falls through to the Flask app
+in app.py via WsgiToAsgi, so behaviour there is unchanged.
+"""
+import asyncio
+import logging
+import os
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart, flash, g, make_response, redirect, render_template, request, session, url_for
+from werkzeug.exceptions import HTTPException
+
+from app import (app as flask_app, admission, asset_manifest, pools, page_cache, MEMBER_DASHBOARD_TABLES,
+                 RETRY_AFTER_SECONDS)
+from member_forms import home_endpoint, parse_claim, parse_contribution, parse_login, start_session
+from metrics import metrics
+from response_cache import is_not_modified, last_modified, page_etag
+from template_build import attach_bytecode_cache, warm_templates
+
+logger = logging.getLogger(__name__)
+
+DB_EXECUTOR_WORKERS = int(os.getenv('DB_EXECUTOR_WORKERS', '8'))
+DB_MAX_PENDING = int(os.getenv('DB_MAX_PENDING', '512'))
+
+class AsyncPoolManager:
+    """Awaitable access to CommunityPoolManager on a bounded executor.
+
+    At most max_workers calls run at once; up to max_pending more wait as
+    cheap coroutines rather than threads.
+    """
+
+    def __init__(self, max_workers=DB_EXECUTOR_WORKERS, max_pending=DB_MAX_PENDING):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pool-db')
+        self._pending = asyncio.Semaphore(max_workers + max_pending)
+
+    async def call(self, pool_id, method_name, *args, **kwargs):
+        method = getattr(pools.get(pool_id), method_name)
+        async with self._pending:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(method, *args, **kwargs))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+async_app = Quart(__name__, template_folder=flask_app.template_folder, static_folder=None)
+async_app.secret_key = flask_app.secret_key
+async_db = AsyncPoolManager()
+
+def _pool_id(pool_id=None):
+    pool_id = pool_id or session.get('pool_id')
+    return pool_id if pool_id in pools else pools.default_pool
+
+@async_app.context_processor
+async def inject_pools():
+    return {
+        'available_pools': [(pool_id, pools.pool_name(pool_id)) for pool_id in pools.pool_ids()],
+        'current_pool_name': pools.pool_name(_pool_id()),
+    }
+
+def asset_url(name):
+    return asset_manifest.url_for(name, lambda filename: url_for('static_asset', filename=filename))
+
+async_app.jinja_env.globals['asset_url'] = asset_url
+attach_bytecode_cache(async_app)
+warm_templates(async_app)
+
+@async_app.after_serving
+async def shutdown_executor():
+    async_db.shutdown()
+
+# Same series as the Flask hooks in app.py, so /metrics covers both halves
+@async_app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@async_app.after_request
+async def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - started,
+                        (('endpoint', endpoint),))
+        metrics.inc('http_requests_total',
+                    (('endpoint', endpoint), ('method', request.method), ('status', str(response.status_code))))
+    return response
+
+def login_required(f):
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            await flash('Please log in to access this page.', 'warning')
+            return redirect(url_for('login'))
+        return await f(*args, **kwargs)
+    return decorated_function
+
+def admit(route_class):
+    """Run the view under the app's admission class, answering 503 when saturated"""
+    def decorator(f):
+        @wraps(f)
+        async def decorated_function(*args, **kwargs):
+            if not await admission.acquire_async(route_class):
+                return await _reject_busy(admission.classes[route_class])
+            try:
+                return await f(*args, **kwargs)
+            finally:
+                admission.release(route_class)
+        return decorated_function
+    return decorator
+
+async def _reject_busy(route_class):
+    logger.warning(f"Shedding {request.endpoint} request: {route_class.name} saturated "
+                   f"({route_class.active} active, {route_class.waiting} waiting)")
+    metrics.inc('http_errors_total', (('status', '503'),))
+    response = await make_response(await render_template('503.html', retry_after=RETRY_AFTER_SECONDS), 503)
+    response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return response
+
+async def _current_member():
+    return await async_db.call(_pool_id(), 'get_member_by_user_id', session['user_id'])
+
+@async_app.route('/login', methods=['GET', 'POST'])
+@admit('member_read')
+async def login():
+    try:
+        if request.method == 'POST':
+            form = await request.form
+            username, password, error = parse_login(form)
+            if error:
+                await flash(error, 'danger')
+                return await render_template('login.html')
+
+            pool_id = _pool_id(form.get('pool'))
+            user = await async_db.call(pool_id, 'authenticate_user', username, password)
+            if user:
+                start_session(session, pool_id, user)
+                await flash(f'Welcome back, {user["name"]}!', 'success')
+                return redirect(url_for(home_endpoint(user['user_type'])))
+            else:
+                await flash('Invalid username or password.', 'danger')
+
+        return await render_template('login.html')
+    except Exception as e:
+        logger.error(f"Login error: {e}\n{traceback.format_exc()}")
+        await flash('An error occurred during login.', 'danger')
+        return await render_template('login.html')
+
+@async_app.route('/member_dashboard')
+@login_required
+async def member_dashboard():
+    try:
+        if session.get('user_type') == 'admin':
+            return redirect(url_for('dashboard'))
+
+        pool_id = _pool_id()
+        etag = versions = None
+        if not session.get('_flashes'):
+            versions = await async_db.call(pool_id, 'get_table_versions', MEMBER_DASHBOARD_TABLES)
+            if versions:
+                # Same key as app.conditional_view, so both serving modes share cached pages
+                etag = page_etag(request.endpoint, pool_id, session.get('user_id'), request.view_args or {},
+                                 request.args, versions=versions)
+                modified = last_modified(versions)
+                if is_not_modified(request, etag, modified):
+                    return _conditional_headers(await make_response('', 304), etag, modified)
+                body = page_cache.get(etag)
+                if body is not None:
+                    return _conditional_headers(await make_response(body), etag, modified)
+
+        # Like app.py, only a render is admitted; 304s and cached pages are not
+        return await _render_member_dashboard(pool_id, etag, versions)
+    except Exception as e:
+        logger.error(f"Member dashboard error: {e}\n{traceback.format_exc()}")
+        await flash('Error loading your dashboard.', 'danger')
+        return redirect(url_for('index'))
+
+def _conditional_headers(response, etag, modified):
+    response.set_etag(etag)
+    response.last_modified = modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@admit('member_read')
+async def _render_member_dashboard(pool_id, etag, versions):
+    member = await _current_member()
+    if not member:
+        await flash('Member profile not found.', 'danger')
+        return redirect(url_for('logout'))
+
+    contributions, claims = await asyncio.gather(
+        async_db.call(pool_id, 'get_member_contributions', member['id']),
+        async_db.call(pool_id, 'get_member_claims', member['id']),
+    )
+
+    body = await render_template('member_dashboard.html',
+                                 member=member,
+                                 contributions=contributions,
+                                 claims=claims)
+    response = await make_response(body)
+    if etag and not session.get('_flashes'):
+        page_cache.set(etag, body.encode('utf-8'))
+        _conditional_headers(response, etag, last_modified(versions))
+    return response
+
+@async_app.route('/contribute', methods=['GET', 'POST'])
+@login_required
+@admit('member_write')
+async def contribute():
+    try:
+        if session.get('user_type') == 'admin':
+            await flash('Admins cannot make contributions.', 'warning')
+            return redirect(url_for('dashboard'))
+
+        member = await _current_member()
+        if not member:
+            await flash('Member profile not found.', 'danger')
+            return redirect(url_for('member_dashboard'))
+
+        if request.method == 'POST':
+            amount, error = parse_contribution(await request.form)
+            if error:
+                await flash(error, 'danger')
+                return redirect(url_for('contribute'))
+
+            reference_id = str(uuid.uuid4())
+
+            if await async_db.call(_pool_id(), 'record_contribution', member['id'], amount, reference_id):
+                await flash(f'Contribution of R{amount:.2f} successful!', 'success')
+                return redirect(url_for('member_dashboard'))
+            else:
+                await flash('Error processing contribution.', 'danger')
+
+        return await render_template('contribute.html', member=member)
+    except Exception as e:
+        logger.error(f"Contribute error: {e}\n{traceback.format_exc()}")
+        await flash('An error occurred.', 'danger')
+        return redirect(url_for('member_dashboard'))
+
+@async_app.route('/submit_claim', methods=['GET', 'POST'])
+@login_required
+@admit('member_write')
+async def submit_claim():
+    try:
+        if session.get('user_type') == 'admin':
+            await flash('Admins cannot submit claims.', 'warning')
+            return redirect(url_for('dashboard'))
+
+        member = await _current_member()
+        if not member:
+            await flash('Member profile not found.', 'danger')
+            return redirect(url_for('member_dashboard'))
+
+        if request.method == 'POST':
+            claim, error = parse_claim(await request.form)
+            if error:
+                await flash(error, 'danger')
+                return redirect(url_for('submit_claim'))
+
+            claim_id = await async_db.call(_pool_id(), 'create_claim', member['id'], **claim)
+
+            if claim_id:
+                await flash('Claim submitted successfully!', 'success')
+                return redirect(url_for('member_dashboard'))
+            else:
+                await flash('Error submitting claim.', 'danger')
+
+        return await render_template('submit_claim.html', member=member)
+    except Exception as e:
+        logger.error(f"Submit claim error: {e}\n{traceback.format_exc()}")
+        await flash('An error occurred.', 'danger')
+        return redirect(url_for('member_dashboard'))
+
+# Build-only rules so url_for() in shared templates resolves Flask endpoints too
+for rule in flask_app.url_map.iter_rules():
+    if rule.endpoint not in async_app.view_functions:
+        async_app.add_url_rule(rule.rule, endpoint=rule.endpoint, methods=rule.methods)
+
+ASYNC_ENDPOINTS = {'login', 'member_dashboard', 'contribute', 'submit_claim'}
+wsgi_application = WsgiToAsgi(flask_app)
+
+def _is_async_route(scope):
+    # Uploads go to Flask, whose multipart parser streams files into the attachment store
+    if any(name == b'content-type' and value.startswith(b'multipart/') for name, value in scope['headers']):
+        return False
+    adapter = async_app.url_map.bind('localhost')
+    try:
+        endpoint, _ = adapter.match(scope['path'], method=scope['method'])
+    except HTTPException:
+        return False
+    return endpoint in ASYNC_ENDPOINTS
+
+async def application(scope, receive, send):
+    """Dispatch to the async views where they exist, otherwise to the Flask app"""
+    if scope['type'] == 'http' and not _is_async_route(scope):
+        await wsgi_application(scope, receive, send)
+    else:
+        await async_app(scope, receive, send)
@@ -0,0 +1,187 @@
+# asset_pipeline.py
+"""Build and resolve fingerprinted static assets.
+
+    python asset_pipeline.py
+
+Vendors Bootstrap and Font Awesome into assets/vendor/ (downloaded once,
+then reused offline), minifies our own CSS from assets/css/, and writes
+content-hashed copies plus .gz/.br variants into static/dist/ together
+with a manifest.json. At runtime AssetManifest maps logical names such as
+'app.css' to their fingerprinted URLs.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import urllib.parse
+import urllib.request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(BASE_DIR, 'assets')
+VENDOR_DIR = os.path.join(SOURCE_DIR, 'vendor')
+DIST_DIR = os.path.join(BASE_DIR, 'static', 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+# Third-party assets: logical name -> upstream URL (also the fallback before a build)
+VENDOR_ASSETS = {
+    'bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'bootstrap.bundle.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+    'fontawesome.min.css': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
+}
+
+# Our own assets: logical name -> path under assets/
+SOURCE_ASSETS = {
+    'app.css': os.path.join('css', 'app.css'),
+    'admin_claims.css': os.path.join('css', 'admin_claims.css'),
+}
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.ttf', '.json')
+CSS_URL_PATTERN = re.compile(r'url\(\s*[\'"]?([^\'")]+)[\'"]?\s*\)')
+
+def minify_css(css):
+    """Conservative CSS minifier: drops comments and redundant whitespace"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    css = css.replace(';}', '}')
+    return css.strip()
+
+def fingerprint(name, content):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(content).hexdigest()[:10]}{ext}"
+
+def _download(url, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    logger.info(f"Downloading {url}")
+    with urllib.request.urlopen(url, timeout=60) as response, open(path + '.part', 'wb') as f:
+        shutil.copyfileobj(response, f)
+    os.replace(path + '.part', path)
+
+def _vendor_file(name, url):
+    """Local copy of a vendored file, downloading it on first build"""
+    path = os.path.join(VENDOR_DIR, name)
+    if not os.path.exists(path):
+        _download(url, path)
+    with open(path, 'rb') as f:
+        return f.read()
+
+def _write_dist(name, content, manifest):
+    """Write a fingerprinted file and its compressed variants; record it in the manifest"""
+    hashed = fingerprint(name, content)
+    path = os.path.join(DIST_DIR, hashed)
+    with open(path, 'wb') as f:
+        f.write(content)
+    if name.endswith(COMPRESSIBLE):
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(content, quality=11))
+    manifest[name] = hashed
+    return hashed
+
+def _bundle_css_with_urls(css, base_url, manifest):
+    """Vendor files referenced by url(...) in a stylesheet and point it at their fingerprinted copies"""
+    def replace(match):
+        reference = match.group(1)
+        if reference.startswith(('data:', '#')):
+            return match.group(0)
+        clean = reference.split('?')[0].split('#')[0]
+        dependency = os.path.basename(clean)
+        if dependency not in manifest:
+            content = _vendor_file(os.path.join('files', dependency), urllib.parse.urljoin(base_url, clean))
+            _write_dist(dependency, content, manifest)
+        return f"url({manifest[dependency]})"
+    return CSS_URL_PATTERN.sub(replace, css)
+
+def build():
+    """Build static/dist/ and return the manifest"""
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+    manifest = {}
+
+    for name, url in VENDOR_ASSETS.items():
+        content = _vendor_file(name, url)
+        if name.endswith('.css'):
+            content = _bundle_css_with_urls(content.decode('utf-8'), url, manifest).encode('utf-8')
+        _write_dist(name, content, manifest)
+
+    for name, relative_path in SOURCE_ASSETS.items():
+        with open(os.path.join(SOURCE_DIR, relative_path), encoding='utf-8') as f:
+            source = f.read()
+        if name.endswith('.css'):
+            source = minify_css(source)
+        _write_dist(name, source.encode('utf-8'), manifest)
+
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    logger.info(f"Built {len(manifest)} assets into {DIST_DIR}")
+    return manifest
+
+class AssetManifest:
+    """Resolves logical asset names to fingerprinted URLs and files on disk"""
+
+    IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+    def __init__(self, manifest_path=MANIFEST_PATH):
+        self.manifest_path = manifest_path
+        self.entries = {}
+        self.fingerprinted = set()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            logger.warning("No asset manifest found; run asset_pipeline.py. Serving unbuilt assets.")
+            self.entries = {}
+        self.fingerprinted = set(self.entries.values())
+
+    def url_for(self, name, url_builder):
+        """URL for a logical asset; url_builder(filename) builds the route URL"""
+        hashed = self.entries.get(name)
+        if hashed:
+            return url_builder(hashed)
+        if name in VENDOR_ASSETS and not os.path.exists(os.path.join(VENDOR_DIR, name)):
+            return VENDOR_ASSETS[name]
+        return url_builder(name)
+
+    def resolve_file(self, filename, accept_encoding=''):
+        """Return (path, content_encoding, immutable) for a request, or (None, None, False)"""
+        if filename in self.fingerprinted:
+            path = os.path.join(DIST_DIR, filename)
+            accepted = {token.split(';')[0].strip() for token in accept_encoding.split(',')}
+            for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+                if encoding in accepted and os.path.exists(path + suffix):
+                    return path + suffix, encoding, True
+            return path, None, True
+
+        # Unbuilt fallback for development: serve sources directly, without long caching
+        if filename in SOURCE_ASSETS:
+            return os.path.join(SOURCE_DIR, SOURCE_ASSETS[filename]), None, False
+        if filename in VENDOR_ASSETS and os.path.exists(os.path.join(VENDOR_DIR, filename)):
+            return os.path.join(VENDOR_DIR, filename), None, False
+        return None, None, False
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    argparse.ArgumentParser(description="Build fingerprinted static assets").parse_args()
+    build()
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
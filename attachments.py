@@ -0,0 +1,193 @@
+# attachments.py
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Request
+
+try:
+    from PIL import Image
+except ImportError:  # thumbnails are optional
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+ATTACHMENT_DIR = os.getenv('ATTACHMENT_DIR', 'attachments')
+
+# Largest request body accepted, so the largest set of files on one claim
+MAX_UPLOAD_BYTES = int(os.getenv('ATTACHMENT_MAX_BYTES', str(25 * 1024 * 1024)))
+MAX_ATTACHMENTS_PER_CLAIM = 10
+
+CHUNK_SIZE = 64 * 1024
+# Files are committed before their claim row is written, so unreferenced ones stay this long
+GC_MIN_AGE = 24 * 3600
+THUMBNAIL_SIZE = (320, 320)
+
+# Leading bytes of the formats members send: scanned invoices and phone photos
+SIGNATURES = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+)
+
+def sniff_content_type(head):
+    """Content type from a file's first bytes; None for anything not accepted"""
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+class HashingUpload:
+    """File object the multipart parser writes an upload into.
+
+    Each chunk goes straight to a temporary file inside the store (so the
+    final move is a rename on the same filesystem) while its SHA-256 and
+    size are updated, so nothing is buffered in memory and the file is not
+    read again to find its address. The temporary file deletes itself when
+    the request closes its files.
+    """
+
+    def __init__(self, directory):
+        self._file = tempfile.NamedTemporaryFile(dir=directory, prefix='upload-', suffix='.partial')
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self.head = b''
+
+    def write(self, data):
+        if len(self.head) < 16:
+            self.head += bytes(data[:16 - len(self.head)])
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    @property
+    def content_type(self):
+        return sniff_content_type(self.head)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+class AttachmentStore:
+    """Content-addressed files on disk: <root>/ab/cd/<sha256>.
+
+    Identical scans uploaded twice (a member resubmitting, or the same
+    invoice on two claims) are stored once. Thumbnails for images are made
+    on a background thread after the upload is committed.
+    """
+
+    def __init__(self, root=ATTACHMENT_DIR):
+        self.root = root
+        self.tmp_dir = os.path.join(root, 'tmp')
+        self.thumb_dir = os.path.join(root, 'thumbs')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        os.makedirs(self.thumb_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thumbnails')
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def path_for(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def thumbnail_path(self, sha256):
+        return os.path.join(self.thumb_dir, f"{sha256}.jpg")
+
+    def new_upload(self):
+        return HashingUpload(self.tmp_dir)
+
+    def commit(self, upload):
+        """Give an upload its permanent content address; returns the sha256"""
+        upload.flush()
+        sha256 = upload.sha256
+        path = self.path_for(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                os.link(upload.name, path)
+                return sha256
+            except FileExistsError:
+                pass  # the same file was committed concurrently
+        try:
+            # Restart collect_garbage's grace period: the file may be an old orphan about to be claimed again
+            os.utime(path)
+        except FileNotFoundError:
+            os.link(upload.name, path)  # collected between the check and now
+        return sha256
+
+    def schedule_thumbnail(self, sha256, content_type):
+        """Queue thumbnail generation for an image; returns immediately"""
+        if Image is None or not content_type.startswith('image/'):
+            return False
+        with self._lock:
+            if sha256 in self._pending or os.path.exists(self.thumbnail_path(sha256)):
+                return False
+            self._pending.add(sha256)
+        self._executor.submit(self._make_thumbnail, sha256)
+        return True
+
+    def _make_thumbnail(self, sha256):
+        target = self.thumbnail_path(sha256)
+        try:
+            with Image.open(self.path_for(sha256)) as image:
+                # Lets the JPEG decoder scale down while decoding large phone photos
+                image.draft('RGB', THUMBNAIL_SIZE)
+                image.thumbnail(THUMBNAIL_SIZE)
+                image.convert('RGB').save(target + '.partial', 'JPEG', quality=80)
+            os.replace(target + '.partial', target)
+        except Exception as e:
+            logger.error(f"Thumbnail for {sha256} failed: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(sha256)
+
+    def collect_garbage(self, referenced, min_age=GC_MIN_AGE):
+        """Delete files no claim refers to, with their thumbnails, and abandoned uploads; returns the count.
+
+        referenced must hold every sha256 in use across all pools and their
+        archives. Anything newer than min_age is kept, which covers an upload
+        whose claim is still being written.
+        """
+        cutoff = time.time() - min_age
+        removed = 0
+        for directory, subdirs, files in os.walk(self.root):
+            if directory == self.root:
+                subdirs[:] = [name for name in subdirs if len(name) == 2]
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    if name in referenced or os.path.getmtime(path) > cutoff:
+                        continue
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+                thumbnail = self.thumbnail_path(name)
+                if os.path.exists(thumbnail):
+                    os.remove(thumbnail)
+        for name in os.listdir(self.tmp_dir):
+            path = os.path.join(self.tmp_dir, name)
+            try:
+                if os.path.getmtime(path) <= cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+        logger.info(f"Removed {removed} unreferenced attachment files from {self.root}")
+        return removed
+
+class AttachmentRequest(Request):
+    """Request whose file uploads stream into the attachment store"""
+    attachment_store = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.attachment_store is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return self.attachment_store.new_upload()
@@ -0,0 +1,283 @@
+# backup_manager.py
+import argparse
+import glob
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Tables moved to the archive databases, with the condition a row must meet
+# (besides being older than the horizon) to be considered closed
+ARCHIVE_TABLES = {
+    'contributions': "1 = 1",
+    'claims': "status IN ('declined', 'paid')",
+}
+
+# Rows that reference an archived claim and must travel with it
+CLAIM_CHILD_TABLES = [
+    ('payouts', 'claim_id'),
+    ('claim_status_history', 'claim_id'),
+    ('claim_attachments', 'claim_id'),
+]
+
+# Tables whose archived amounts are kept as running totals in archive_ledger
+LEDGER_TABLES = ('contributions', 'claims', 'payouts')
+
+class BackupManager:
+    """Online backups via the SQLite backup API and per-year archival of aged rows"""
+
+    def __init__(self, db_path="health_pool.db", backup_dir="backups", archive_dir="archive",
+                 pages=256, step_delay=0.05, keep=7, batch_size=1000):
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.archive_dir = archive_dir
+        self.pages = pages
+        self.step_delay = step_delay
+        self.keep = keep
+        self.batch_size = batch_size
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    @property
+    def _stem(self):
+        return os.path.splitext(os.path.basename(self.db_path))[0]
+
+    # ------------------------------------------------------------------
+    # Online backup
+    # ------------------------------------------------------------------
+
+    def _throttle(self, status, remaining, total):
+        """Backup progress callback: log and yield to live traffic between steps"""
+        logger.debug(f"Backup progress: {total - remaining}/{total} pages")
+        if remaining and self.step_delay:
+            time.sleep(self.step_delay)
+
+    def backup(self, target_path=None):
+        """Copy the live database in paged steps; returns the backup path or None"""
+        os.makedirs(self.backup_dir, exist_ok=True)
+        if target_path is None:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            target_path = os.path.join(self.backup_dir, f"{self._stem}_{timestamp}.db")
+        partial_path = target_path + '.partial'
+
+        started = time.perf_counter()
+        try:
+            source = self._connect()
+            destination = sqlite3.connect(partial_path)
+            try:
+                source.backup(destination, pages=self.pages, progress=self._throttle)
+                check = destination.execute('PRAGMA quick_check').fetchone()[0]
+            finally:
+                destination.close()
+                source.close()
+
+            if check != 'ok':
+                logger.error(f"Backup failed integrity check: {check}")
+                os.remove(partial_path)
+                return None
+
+            os.replace(partial_path, target_path)
+            logger.info(f"Backup written to {target_path} in {time.perf_counter() - started:.1f}s")
+            self._prune_backups()
+            return target_path
+        except Exception as e:
+            logger.error(f"Backup error: {e}")
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            return None
+
+    def _prune_backups(self):
+        backups = sorted(glob.glob(os.path.join(self.backup_dir, f"{self._stem}_*.db")))
+        for old_backup in backups[:-self.keep] if self.keep else []:
+            os.remove(old_backup)
+            logger.info(f"Removed old backup {old_backup}")
+
+    # ------------------------------------------------------------------
+    # Archival
+    # ------------------------------------------------------------------
+
+    def archive_path(self, year):
+        return os.path.join(self.archive_dir, f"{self._stem}_{year}.db")
+
+    def archive_paths(self):
+        """Existing archive databases keyed by year"""
+        paths = {}
+        for path in glob.glob(os.path.join(self.archive_dir, f"{self._stem}_*.db")):
+            year = os.path.splitext(path)[0].rsplit('_', 1)[-1]
+            if year.isdigit():
+                paths[int(year)] = path
+        return dict(sorted(paths.items()))
+
+    @staticmethod
+    def _table_columns(conn, schema, table):
+        return [(row[1], row[2]) for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+    def _ensure_archive_table(self, conn, table):
+        """Mirror a main table into the attached archive, adding any new columns"""
+        columns = self._table_columns(conn, 'main', table)
+        existing = {name for name, _ in self._table_columns(conn, 'archive', table)}
+        if not existing:
+            definitions = ', '.join(
+                f"{name} INTEGER PRIMARY KEY" if name == 'id' else f"{name} {col_type}"
+                for name, col_type in columns
+            )
+            conn.execute(f"CREATE TABLE archive.{table} ({definitions})")
+            if 'created_at' in dict(columns):
+                conn.execute(f"CREATE INDEX IF NOT EXISTS archive.idx_{table}_created_at ON {table} (created_at)")
+        else:
+            for name, col_type in columns:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE archive.{table} ADD COLUMN {name} {col_type}")
+        return [name for name, _ in columns]
+
+    def _move_rows(self, conn, table, key, ids, columns):
+        """Copy rows into the archive, record them in the ledger and delete them from main"""
+        placeholders = ', '.join('?' * len(ids))
+        column_list = ', '.join(columns)
+        if table in LEDGER_TABLES:
+            conn.execute(f'''
+                INSERT INTO main.archive_ledger (entity, status, row_count, total_amount)
+                SELECT ?, COALESCE(status, ''), COUNT(*), COALESCE(SUM(amount), 0)
+                FROM main.{table} WHERE {key} IN ({placeholders})
+                GROUP BY status
+                ON CONFLICT (entity, status) DO UPDATE SET
+                    row_count = row_count + excluded.row_count,
+                    total_amount = total_amount + excluded.total_amount
+            ''', [table] + ids)
+        conn.execute(f'''
+            INSERT OR IGNORE INTO archive.{table} ({column_list})
+            SELECT {column_list} FROM main.{table} WHERE {key} IN ({placeholders})
+        ''', ids)
+        return conn.execute(f"DELETE FROM main.{table} WHERE {key} IN ({placeholders})", ids).rowcount
+
+    def _archive_year(self, conn, year, cutoff):
+        start = f"{year}-01-01"
+        end = min(f"{year + 1}-01-01", cutoff)
+        moved = {}
+
+        conn.execute("ATTACH DATABASE ? AS archive", (self.archive_path(year),))
+        try:
+            columns = {
+                table: self._ensure_archive_table(conn, table)
+                for table in list(ARCHIVE_TABLES) + [child for child, _ in CLAIM_CHILD_TABLES]
+            }
+            conn.commit()
+
+            for table, condition in ARCHIVE_TABLES.items():
+                while True:
+                    ids = [row[0] for row in conn.execute(f'''
+                        SELECT id FROM main.{table}
+                        WHERE created_at >= ? AND created_at < ? AND {condition}
+                        ORDER BY id LIMIT ?
+                    ''', (start, end, self.batch_size))]
+                    if not ids:
+                        break
+
+                    with conn:
+                        if table == 'claims':
+                            for child, key in CLAIM_CHILD_TABLES:
+                                moved[child] = moved.get(child, 0) + self._move_rows(
+                                    conn, child, key, ids, columns[child])
+                        moved[table] = moved.get(table, 0) + self._move_rows(
+                            conn, table, 'id', ids, columns[table])
+
+                    # Give live writers a turn between batches
+                    time.sleep(self.step_delay)
+        finally:
+            conn.execute("DETACH DATABASE archive")
+
+        return moved
+
+    def archive(self, horizon_days=365):
+        """Move contributions and closed claims older than the horizon into per-year archives"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        try:
+            conn = self._connect()
+            cutoff = conn.execute(
+                "SELECT datetime('now', ?)", (f'-{int(horizon_days)} days',)
+            ).fetchone()[0]
+
+            years = set()
+            for table, condition in ARCHIVE_TABLES.items():
+                years.update(int(row[0]) for row in conn.execute(f'''
+                    SELECT DISTINCT strftime('%Y', created_at) FROM {table}
+                    WHERE created_at < ? AND {condition}
+                ''', (cutoff,)) if row[0])
+
+            summary = {}
+            for year in sorted(years):
+                summary[year] = self._archive_year(conn, year, cutoff)
+                logger.info(f"Archived {summary[year]} into {self.archive_path(year)}")
+
+            conn.close()
+            return summary
+        except Exception as e:
+            logger.error(f"Archive error: {e}")
+            return None
+
+    def archived_attachment_hashes(self):
+        """sha256 of every attachment in the archive databases; raises if one cannot be read"""
+        hashes = set()
+        for path in self.archive_paths().values():
+            conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+            try:
+                if self._table_columns(conn, 'main', 'claim_attachments'):
+                    hashes.update(row[0] for row in conn.execute('SELECT DISTINCT sha256 FROM claim_attachments'))
+            finally:
+                conn.close()
+        return hashes
+
+    def connect_with_archives(self, max_archives=9):
+        """Open a read connection with the newest archives attached.
+
+        Temporary views all_contributions, all_claims and all_payouts union
+        the live table with each attached archive.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30.0, uri=True)
+        archives = list(self.archive_paths().items())[-max_archives:]
+        for year, path in archives:
+            conn.execute("ATTACH DATABASE ? AS ?", (f"file:{os.path.abspath(path)}?mode=ro", f"archive_{year}"))
+
+        for table in list(ARCHIVE_TABLES) + [child for child, _ in CLAIM_CHILD_TABLES]:
+            columns = [name for name, _ in self._table_columns(conn, 'main', table)]
+            selects = [f"SELECT {', '.join(columns)} FROM main.{table}"]
+            for year, _ in archives:
+                archived = {name for name, _ in self._table_columns(conn, f"archive_{year}", table)}
+                if archived:
+                    selects.append("SELECT " + ', '.join(
+                        name if name in archived else f"NULL AS {name}" for name in columns
+                    ) + f" FROM archive_{year}.{table}")
+            conn.execute(f"CREATE TEMP VIEW all_{table} AS " + " UNION ALL ".join(selects))
+        return conn
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Back up and archive the health pool database")
+    parser.add_argument('--db', default='health_pool.db', help='database file')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    backup_parser = subparsers.add_parser('backup', help='take an online backup')
+    backup_parser.add_argument('--dir', default='backups')
+    backup_parser.add_argument('--keep', type=int, default=7)
+
+    archive_parser = subparsers.add_parser('archive', help='move aged rows to per-year archives')
+    archive_parser.add_argument('--dir', default='archive')
+    archive_parser.add_argument('--days', type=int, default=365)
+
+    args = parser.parse_args()
+    if args.command == 'backup':
+        manager = BackupManager(args.db, backup_dir=args.dir, keep=args.keep)
+        return 0 if manager.backup() else 1
+
+    manager = BackupManager(args.db, archive_dir=args.dir)
+    return 0 if manager.archive(args.days) is not None else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,103 @@
+# claim_screening.py
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+class ClaimScreener:
+    """Scores claims against the same member's recent claims to catch near-duplicates.
+
+    Lookups go through the (member_id, created_at) index on claims, so the cost
+    depends on how many claims one member filed inside the window, not on the
+    size of the claims table.
+    """
+
+    def __init__(self, window_days=14, amount_tolerance=0.05, flag_threshold=60, velocity_limit=3):
+        self.window_days = window_days
+        self.amount_tolerance = amount_tolerance
+        self.flag_threshold = flag_threshold
+        self.velocity_limit = velocity_limit
+
+    @staticmethod
+    def _normalize(value):
+        return ' '.join((value or '').lower().split())
+
+    def _amounts_match(self, first, second):
+        first, second = float(first), float(second)
+        largest = max(abs(first), abs(second)) or 1.0
+        return abs(first - second) / largest <= self.amount_tolerance
+
+    def score(self, amount, claim_type, hospital, recent_claims):
+        """Score a claim against earlier claims given as (id, amount, type, hospital) tuples"""
+        hospital = self._normalize(hospital)
+        claim_type = self._normalize(claim_type)
+        best_score = 0
+        reasons = []
+
+        for claim_id, other_amount, other_type, other_hospital in recent_claims:
+            matches = []
+            pair_score = 0
+            if hospital and hospital == self._normalize(other_hospital):
+                pair_score += 30
+                matches.append('hospital')
+            if claim_type and claim_type == self._normalize(other_type):
+                pair_score += 20
+                matches.append('type')
+            if self._amounts_match(amount, other_amount):
+                pair_score += 40
+                matches.append('amount')
+            if pair_score > best_score:
+                best_score = pair_score
+                reasons = [f"Similar to claim #{claim_id} (same {', '.join(matches)})"]
+
+        if len(recent_claims) >= self.velocity_limit:
+            best_score += 20
+            reasons.append(f"{len(recent_claims)} claims in the last {self.window_days} days")
+
+        score = min(best_score, 100)
+        return score, '; '.join(reasons) or None
+
+    def is_suspicious(self, score):
+        return score >= self.flag_threshold
+
+    def screen(self, cursor, member_id, amount, claim_type, hospital):
+        """Screen a new claim at submission time using the caller's cursor"""
+        cursor.execute('''
+            SELECT id, amount, type, hospital
+            FROM claims
+            WHERE member_id = ? AND created_at >= datetime('now', ?)
+        ''', (member_id, f'-{self.window_days} days'))
+        return self.score(amount, claim_type, hospital, cursor.fetchall())
+
+    def screen_pending(self, cursor):
+        """Score the whole pending queue in one ordered pass.
+
+        Returns (risk_score, flag_reason, flagged, claim_id) tuples ready for
+        executemany. Each pending claim is compared with the same member's
+        claims filed up to window_days before it.
+        """
+        cursor.execute('''
+            SELECT c.id, c.member_id, c.amount, c.type, c.hospital, c.created_at, c.status
+            FROM claims c
+            WHERE c.member_id IN (SELECT member_id FROM claims WHERE status = 'pending')
+            ORDER BY c.member_id, c.created_at, c.id
+        ''')
+
+        window = timedelta(days=self.window_days)
+        results = []
+        current_member = None
+        history = []
+        for claim_id, member_id, amount, claim_type, hospital, created_at, status in cursor:
+            if member_id != current_member:
+                current_member = member_id
+                history = []
+            created = datetime.strptime(created_at, TIMESTAMP_FORMAT)
+            history = [entry for entry in history if created - entry[0] <= window]
+            if status == 'pending':
+                score, reason = self.score(amount, claim_type, hospital, [entry[1] for entry in history])
+                results.append((score, reason, int(self.is_suspicious(score)), claim_id))
+            history.append((created, (claim_id, amount, claim_type, hospital)))
+
+        return results
@@ -14,19 +14,9 @@ templates['base.html'] = '''<!DOCTYPE html>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{% block title %}Community Health Pool{% endblock %}</title>
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
-    <style>
-        body {
-            min-height: 100vh;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        }
-        .navbar { background: rgba(255,255,255,0.95)!important; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
-        .content-wrapper { margin-top: 80px; margin-bottom: 40px; }
-        .card { border: none; border-radius: 15px; box-shadow: 0 10px 30px rgba(0,0,0,0.1); }
-        .stat-card { background: white; border-radius: 15px; padding: 25px; margin-bottom: 20px; box-shadow: 0 5px 20px rgba(0,0,0,0.08); }
-        .stat-icon { width: 60px; height: 60px; border-radius: 12px; display: flex; align-items: center; justify-content: center; font-size: 24px; margin-bottom: 15px; }
-    </style>
+    <link href="{{ asset_url('bootstrap.min.css') }}" rel="stylesheet">
+    <link rel="stylesheet" href="{{ asset_url('fontawesome.min.css') }}">
+    <link rel="stylesheet" href="{{ asset_url('app.css') }}">
 </head>
 <body>
     <nav class="navbar navbar-expand-lg navbar-light fixed-top">
@@ -54,7 +44,7 @@ templates['base.html'] = '''<!DOCTYPE html>
         {% endwith %}
         {% block content %}{% endblock %}
     </div>
-    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
+    <script src="{{ asset_url('bootstrap.bundle.min.js') }}"></script>
 </body>
 </html>'''
 
@@ -205,7 +195,7 @@ templates['submit_claim.html'] = '''{% extends "base.html" %}
         <div class="card">
             <div class="card-body p-4">
                 <h2 class="mb-4">Submit Medical Claim</h2>
-                <form method="POST">
+                <form method="POST" enctype="multipart/form-data">
                     <div class="mb-3">
                         <label>Claim Type</label>
                         <select class="form-select" name="type" required>
@@ -236,6 +226,11 @@ templates['submit_claim.html'] = '''{% extends "base.html" %}
                             <option value="emergency">Emergency</option>
                         </select>
                     </div>
+                    <div class="mb-3">
+                        <label>Invoices and scripts (PDF or photo)</label>
+                        <input type="file" class="form-control" name="attachments" multiple
+                               accept="application/pdf,image/jpeg,image/png,image/webp">
+                    </div>
                     <button type="submit" class="btn btn-success w-100">Submit Claim</button>
                     <a href="/member_dashboard" class="btn btn-outline-secondary w-100 mt-2">Back</a>
                 </form>
@@ -287,4 +282,5 @@ for filename, content in templates.items():
     print(f"✓ Created {filename}")
 
 print(f"\n✓ Successfully created {len(templates)} template files!")
-print("\nYou can now run: python app.py")
\ No newline at end of file
+print("\nPrecompile them with: python template_build.py")
+print("You can now run: python app.py")
\ No newline at end of file
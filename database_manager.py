@@ -1,28 +1,109 @@
 import sqlite3
 import os
+import json
 import time
 import threading
+from collections import namedtuple
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 import logging
 
+from activity_feed import ActivityFeed
+from claim_screening import ClaimScreener
+from member_search import MemberSearchPlan, normalize_email, normalize_phone
+from metrics import MeteredConnection
+from row_types import MemberRow, ClaimRow, ContributionRow, AttachmentRow, row_factory
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Tables whose changes invalidate the cached pool stats
+STATS_TABLES = ('members', 'contributions', 'claims', 'payouts', 'archive_ledger')
+
+# Tables whose writes bump a change counter, used for conditional GETs
+VERSIONED_TABLES = ('members', 'users', 'contributions', 'claims', 'payouts', 'archive_ledger', 'claim_attachments')
+
+# Tables the activity feed is built from; a change to any of them re-warms it
+ACTIVITY_TABLES = ('members', 'contributions', 'claims')
+
+# Claim columns in ClaimRow order, with money as integer cents
+CLAIM_COLUMNS = '''
+    c.id, c.member_id, CAST(ROUND(c.amount * 100) AS INTEGER) AS amount_cents,
+    c.description, c.type, c.hospital, c.priority, c.status, c.reviewed_by,
+    c.reviewed_at, c.admin_notes, c.created_at, c.risk_score, c.flag_reason, c.flagged,
+    c.leased_by, c.lease_expires_at, c.version
+'''
+
+# Allowed claim status changes; anything not listed is refused
+CLAIM_TRANSITIONS = {
+    'pending': ('approved', 'declined'),
+    'approved': ('paid',),
+    'declined': (),
+    'paid': (),
+}
+
+# Result of a claim status change. outcome is 'ok', 'conflict' (changed since
+# the caller read it), 'invalid' (not allowed from the current status),
+# 'leased' (reserved by another reviewer), 'missing' or 'error'; status and
+# version are the claim's as of the attempt
+ClaimTransition = namedtuple('ClaimTransition', ['outcome', 'status', 'version'])
+
+# Member columns in MemberRow order, with per-member claim and contribution totals
+MEMBER_COLUMNS = '''
+    m.id, m.name, m.phone, m.email,
+    CAST(ROUND(m.monthly_amount * 100) AS INTEGER) AS monthly_amount_cents,
+    m.status, m.created_at,
+    (SELECT COUNT(*) FROM claims WHERE member_id = m.id) AS total_claims,
+    (SELECT COUNT(*) FROM contributions WHERE member_id = m.id) AS total_contributions,
+    (SELECT CAST(ROUND(COALESCE(SUM(amount), 0) * 100) AS INTEGER)
+     FROM contributions WHERE member_id = m.id AND status = 'paid') AS total_contributed_cents
+'''
+
+# Column lists for streaming exports, keyed by entity name
+EXPORT_QUERIES = {
+    'members': '''
+        SELECT id, name, phone, email, monthly_amount, status, created_at
+        FROM members
+    ''',
+    'contributions': '''
+        SELECT id, member_id, amount, payment_reference, status, created_at, paid_at
+        FROM contributions
+    ''',
+    'claims': '''
+        SELECT id, member_id, amount, description, type, hospital, priority, status,
+               reviewed_by, reviewed_at, admin_notes, risk_score, flagged, created_at
+        FROM claims
+    ''',
+}
+
 class CommunityPoolManager:
     def __init__(self, db_path="health_pool.db"):
         self.db_path = db_path
         self._lock = threading.Lock()
+        self.screener = ClaimScreener()
+        self.has_member_fts = False
+        self.activity = ActivityFeed()
+        self._stats_cache = None
+        self._activity_versions = None
         self._init_db()
+        self._refresh_activity()
     
     def _connect(self):
         """Create database connection with better settings"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30.0)
-        conn.execute("PRAGMA busy_timeout = 30000")
+        # Lock waits are counted by MeteredConnection, which applies the busy timeout itself
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=0,
+                               factory=MeteredConnection)
         conn.execute("PRAGMA journal_mode = WAL")
         conn.execute("PRAGMA foreign_keys = ON")
         return conn
     
+    def _ensure_column(self, cursor, table, column, definition):
+        """Add a column to an existing table if an older database lacks it"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            logger.info(f"Added column {table}.{column}")
+    
     def _init_db(self):
         """Initialize database tables"""
         conn = self._connect()
@@ -95,6 +176,163 @@ class CommunityPoolManager:
                 )
             ''')
             
+            # Documents attached to claims; files live in the content-addressed AttachmentStore
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS claim_attachments (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    claim_id INTEGER NOT NULL REFERENCES claims(id) ON DELETE CASCADE,
+                    sha256 CHAR(64) NOT NULL,
+                    filename VARCHAR(255) NOT NULL,
+                    content_type VARCHAR(100) NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    uploaded_by INTEGER REFERENCES users(id),
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_claim_attachments_claim ON claim_attachments (claim_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_claim_attachments_sha ON claim_attachments (sha256)')
+            
+            # Audit trail of claim status changes, one row per version
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS claim_status_history (
+                    id INTEGER PRIMARY KEY,
+                    claim_id INTEGER NOT NULL REFERENCES claims(id) ON DELETE CASCADE,
+                    version INTEGER NOT NULL,
+                    from_status VARCHAR(20) NOT NULL,
+                    to_status VARCHAR(20) NOT NULL,
+                    changed_by INTEGER REFERENCES users(id),
+                    notes TEXT,
+                    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_claim_history_claim
+                ON claim_status_history (claim_id, version)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_claim_history_changed_by
+                ON claim_status_history (changed_by, changed_at)
+            ''')
+            
+            # Running totals of rows moved out to the per-year archive databases
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS archive_ledger (
+                    entity VARCHAR(20) NOT NULL,
+                    status VARCHAR(20) NOT NULL,
+                    row_count INTEGER NOT NULL DEFAULT 0,
+                    total_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+                    PRIMARY KEY (entity, status)
+                )
+            ''')
+            
+            # Transactional outbox: every write appends its change event in the same transaction
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS outbox_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event_type VARCHAR(50) NOT NULL,
+                    entity VARCHAR(20) NOT NULL,
+                    entity_id INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS outbox_consumers (
+                    name VARCHAR(50) PRIMARY KEY,
+                    last_event_id INTEGER NOT NULL DEFAULT 0,
+                    acked_at TIMESTAMP NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Scheduler state: one row per maintenance job, doubling as its cross-process lock
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scheduled_jobs (
+                    name VARCHAR(50) PRIMARY KEY,
+                    next_run_at TIMESTAMP NOT NULL,
+                    lock_owner VARCHAR(100),
+                    lock_expires_at TIMESTAMP NULL,
+                    last_started_at TIMESTAMP NULL,
+                    last_finished_at TIMESTAMP NULL,
+                    last_status VARCHAR(20),
+                    last_error TEXT,
+                    last_duration_ms INTEGER,
+                    run_count INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            
+            # Per-table change counters, bumped by triggers on every write
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS table_versions (
+                    table_name VARCHAR(50) PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            for table in VERSIONED_TABLES:
+                cursor.execute('INSERT OR IGNORE INTO table_versions (table_name) VALUES (?)', (table,))
+                for event in ('INSERT', 'UPDATE', 'DELETE'):
+                    cursor.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version
+                        AFTER {event} ON {table}
+                        BEGIN
+                            UPDATE table_versions
+                            SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+                            WHERE table_name = '{table}';
+                        END
+                    ''')
+            
+            # Last computed pool stats, shared by every worker process; versions holds the STATS_TABLES counters
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS pool_stats_cache (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    versions TEXT NOT NULL,
+                    stats TEXT NOT NULL,
+                    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Claim screening results
+            self._ensure_column(cursor, 'claims', 'risk_score', 'INTEGER DEFAULT 0')
+            self._ensure_column(cursor, 'claims', 'flag_reason', 'TEXT')
+            self._ensure_column(cursor, 'claims', 'flagged', 'INTEGER DEFAULT 0')
+            
+            # Review leases: a pending claim checked out by one admin until it expires
+            self._ensure_column(cursor, 'claims', 'leased_by', 'INTEGER')
+            self._ensure_column(cursor, 'claims', 'lease_expires_at', 'TIMESTAMP NULL')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_claims_lease ON claims (leased_by, lease_expires_at)')
+            
+            # Optimistic concurrency: each status change is checked against, and bumps, the version
+            self._ensure_column(cursor, 'claims', 'version', 'INTEGER NOT NULL DEFAULT 0')
+            
+            # Payout batching and provider tracking
+            self._ensure_column(cursor, 'payouts', 'batch_id', 'VARCHAR(50)')
+            self._ensure_column(cursor, 'payouts', 'provider', 'VARCHAR(100)')
+            self._ensure_column(cursor, 'payouts', 'provider_reference', 'VARCHAR(100)')
+            self._ensure_column(cursor, 'payouts', 'failure_reason', 'TEXT')
+            self._ensure_column(cursor, 'payouts', 'submitted_at', 'TIMESTAMP NULL')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_payouts_claim ON payouts (claim_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_payouts_status ON payouts (status)')
+            
+            # Indexes for date-range exports and recent-activity lookups
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_members_created_at ON members (created_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_contributions_created_at ON contributions (created_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_claims_created_at ON claims (created_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_contributions_member_status ON contributions (member_id, status)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_contributions_member_created ON contributions (member_id, created_at)')
+            
+            # Indexes for claim screening and the pending queue
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_claims_member_created ON claims (member_id, created_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_claims_status_created ON claims (status, created_at)')
+            
+            # Normalized contact keys for exact lookups, uniqueness checks and search
+            self._ensure_column(cursor, 'members', 'phone_e164', 'VARCHAR(16)')
+            self._ensure_column(cursor, 'members', 'email_lower', 'VARCHAR(100)')
+            self._backfill_contact_keys(cursor)
+            self._create_unique_index(cursor, 'idx_members_phone_e164', 'members', 'phone_e164')
+            self._create_unique_index(cursor, 'idx_members_email_lower', 'members', 'email_lower')
+            self._init_member_search(cursor)
+            
             # Create default admin user
             cursor.execute("SELECT id FROM users WHERE username = 'admin'")
             if not cursor.fetchone():
@@ -114,17 +352,88 @@ class CommunityPoolManager:
         finally:
             conn.close()
     
+    def _backfill_contact_keys(self, cursor):
+        """Fill phone_e164/email_lower for rows written before the columns existed"""
+        cursor.execute('''
+            SELECT id, phone, email FROM members
+            WHERE phone_e164 IS NULL OR email_lower IS NULL
+        ''')
+        rows = [(normalize_phone(phone), normalize_email(email), member_id)
+                for member_id, phone, email in cursor.fetchall()]
+        if rows:
+            cursor.executemany('UPDATE members SET phone_e164 = ?, email_lower = ? WHERE id = ?', rows)
+            logger.info(f"Normalized contact details for {len(rows)} members")
+    
+    def _create_unique_index(self, cursor, name, table, column):
+        """Unique index on column, or a plain one while older duplicate rows remain"""
+        try:
+            cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({column})')
+        except sqlite3.IntegrityError:
+            logger.warning(f"Duplicate {table}.{column} values exist; creating {name} without UNIQUE")
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})')
+    
+    def _init_member_search(self, cursor):
+        """Trigram full-text index over name, phone and email, kept in sync by triggers"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'members_fts'")
+        exists = cursor.fetchone() is not None
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS members_fts USING fts5(
+                    name, phone_e164, email_lower,
+                    content='members', content_rowid='id', tokenize='trigram'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Trigram search unavailable, falling back to prefix search: {e}")
+            self.has_member_fts = False
+            return
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_members_fts_insert AFTER INSERT ON members
+            BEGIN
+                INSERT INTO members_fts (rowid, name, phone_e164, email_lower)
+                VALUES (new.id, new.name, new.phone_e164, new.email_lower);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_members_fts_delete AFTER DELETE ON members
+            BEGIN
+                INSERT INTO members_fts (members_fts, rowid, name, phone_e164, email_lower)
+                VALUES ('delete', old.id, old.name, old.phone_e164, old.email_lower);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_members_fts_update
+            AFTER UPDATE OF name, phone_e164, email_lower ON members
+            BEGIN
+                INSERT INTO members_fts (members_fts, rowid, name, phone_e164, email_lower)
+                VALUES ('delete', old.id, old.name, old.phone_e164, old.email_lower);
+                INSERT INTO members_fts (rowid, name, phone_e164, email_lower)
+                VALUES (new.id, new.name, new.phone_e164, new.email_lower);
+            END
+        ''')
+        if not exists:
+            cursor.execute("INSERT INTO members_fts (members_fts) VALUES ('rebuild')")
+            logger.info("Built member search index")
+        self.has_member_fts = True
+    
     def create_user(self, username, password, phone, email, user_type='member'):
         """Create new user account"""
         try:
             conn = self._connect()
             cursor = conn.cursor()
             
+            conflict = self._registration_conflict(cursor, username, phone, email)
+            if conflict:
+                conn.close()
+                logger.error(f"User creation failed: {conflict} already registered")
+                return None
+            
             # First create member
             cursor.execute('''
-                INSERT INTO members (name, phone, email, monthly_amount)
-                VALUES (?, ?, ?, ?)
-            ''', (username, phone, email, 50.00))
+                INSERT INTO members (name, phone, email, monthly_amount, phone_e164, email_lower)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (username, phone, email, 50.00, normalize_phone(phone), normalize_email(email)))
             
             member_id = cursor.lastrowid
             
@@ -134,6 +443,11 @@ class CommunityPoolManager:
                 INSERT INTO users (username, password_hash, user_type, member_id)
                 VALUES (?, ?, ?, ?)
             ''', (username, password_hash, user_type, member_id))
+            self._append_outbox(cursor, 'member.registered', 'member', member_id, {
+                'member_id': member_id, 'user_id': cursor.lastrowid, 'username': username,
+                'user_type': user_type, 'phone': normalize_phone(phone), 'email': normalize_email(email),
+                'monthly_amount_cents': 5000,
+            })
             
             conn.commit()
             conn.close()
@@ -147,6 +461,30 @@ class CommunityPoolManager:
             logger.error(f"Unexpected error in create_user: {e}")
             return None
     
+    def _registration_conflict(self, cursor, username, phone, email):
+        """Which of username, phone or email is taken; each check reads only an index"""
+        checks = (
+            ('username', 'SELECT 1 FROM users WHERE username = ?', username),
+            ('phone', 'SELECT 1 FROM members WHERE phone_e164 = ?', normalize_phone(phone)),
+            ('email', 'SELECT 1 FROM members WHERE email_lower = ?', normalize_email(email)),
+        )
+        for field, sql, value in checks:
+            cursor.execute(sql, (value,))
+            if cursor.fetchone():
+                return field
+        return None
+    
+    def registration_conflict(self, username, phone, email):
+        """Return 'username', 'phone' or 'email' if already registered, else None"""
+        try:
+            conn = self._connect()
+            conflict = self._registration_conflict(conn.cursor(), username, phone, email)
+            conn.close()
+            return conflict
+        except Exception as e:
+            logger.error(f"Error checking registration: {e}")
+            return None
+    
     def authenticate_user(self, username, password):
         """Authenticate user login"""
         try:
@@ -195,11 +533,59 @@ class CommunityPoolManager:
             logger.error(f"Authentication error: {e}")
             return None
 
+    def ping(self):
+        """Cheap liveness check: open a connection and run a trivial query"""
+        try:
+            conn = self._connect()
+            conn.execute('SELECT 1').fetchone()
+            conn.close()
+            return True
+        except Exception as e:
+            logger.error(f"Database ping failed: {e}")
+            return False
+    
+    def get_table_versions(self, tables):
+        """Return {table: (version, updated_at)} for the given tables"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            placeholders = ', '.join('?' * len(tables))
+            cursor.execute(f'''
+                SELECT table_name, version, updated_at
+                FROM table_versions
+                WHERE table_name IN ({placeholders})
+            ''', list(tables))
+            versions = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+            conn.close()
+            return versions
+        except Exception as e:
+            logger.error(f"Error getting table versions: {e}")
+            return None
+    
     def get_pool_stats(self):
-        """Get pool statistics"""
+        """Get pool statistics, recomputed only when one of STATS_TABLES has changed.
+
+        Results are kept in pool_stats_cache keyed by the table versions, so
+        one computation serves every worker process until the next write.
+        """
         try:
+            versions = self.get_table_versions(STATS_TABLES)
+            key = json.dumps(sorted((table, version) for table, (version, _) in versions.items())) if versions else None
+            cached = self._stats_cache
+            if key and cached and cached[0] == key:
+                return dict(cached[1])
+            
             conn = self._connect()
             cursor = conn.cursor()
+            
+            if key:
+                cursor.execute('SELECT stats FROM pool_stats_cache WHERE id = 1 AND versions = ?', (key,))
+                row = cursor.fetchone()
+                if row:
+                    conn.close()
+                    stats = json.loads(row[0])
+                    self._stats_cache = (key, stats)
+                    return dict(stats)
 
             # Total members
             cursor.execute('SELECT COUNT(*) FROM members WHERE status = "active"')
@@ -229,9 +615,17 @@ class CommunityPoolManager:
             cursor.execute('SELECT COUNT(*) FROM claims')
             total_claims_count = cursor.fetchone()[0] or 0
 
-            conn.close()
+            # Fold in rows that have been moved to the archive databases
+            cursor.execute('SELECT entity, status, row_count, total_amount FROM archive_ledger')
+            for entity, status, row_count, total_amount in cursor.fetchall():
+                if entity == 'contributions' and status == 'paid':
+                    total_contributions += total_amount
+                elif entity == 'payouts' and status == 'paid':
+                    total_payouts += total_amount
+                elif entity == 'claims':
+                    total_claims_count += row_count
             
-            return {
+            stats = {
                 'current_balance': float(total_contributions - total_payouts),
                 'total_contributions': float(total_contributions),
                 'total_payouts': float(total_payouts),
@@ -241,6 +635,18 @@ class CommunityPoolManager:
                 'total_claims': total_claims_count,
                 'monthly_expected': float(monthly_expected)
             }
+            if key:
+                try:
+                    cursor.execute('''
+                        INSERT OR REPLACE INTO pool_stats_cache (id, versions, stats, computed_at)
+                        VALUES (1, ?, ?, CURRENT_TIMESTAMP)
+                    ''', (key, json.dumps(stats)))
+                    conn.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not store pool stats: {e}")
+                self._stats_cache = (key, stats)
+            conn.close()
+            return dict(stats)
         except Exception as e:
             logger.error(f"Error getting pool stats: {e}")
             return {
@@ -259,67 +665,88 @@ class CommunityPoolManager:
         try:
             conn = self._connect()
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT m.*, 
-                       (SELECT COUNT(*) FROM claims WHERE member_id = m.id) as total_claims,
-                       (SELECT COUNT(*) FROM contributions WHERE member_id = m.id) as total_contributions,
-                       (SELECT COALESCE(SUM(amount), 0) FROM contributions WHERE member_id = m.id AND status = "paid") as total_contributed
+            cursor.row_factory = row_factory(MemberRow)
+            cursor.execute(f'''
+                SELECT {MEMBER_COLUMNS}
                 FROM members m
                 ORDER BY m.created_at DESC
             ''')
-            
-            columns = [desc[0] for desc in cursor.description]
-            members = []
-            for row in cursor.fetchall():
-                member = dict(zip(columns, row))
-                # Convert decimal to float
-                for key in ['monthly_amount', 'total_contributed']:
-                    if key in member:
-                        member[key] = float(member[key])
-                members.append(member)
-            
+            members = cursor.fetchall()
             conn.close()
             return members
         except Exception as e:
             logger.error(f"Error getting all members: {e}")
             return []
     
-    def get_recent_activity(self):
-        """Get recent activity for dashboard"""
+    def _refresh_activity(self):
+        """Re-warm the activity feed if ACTIVITY_TABLES changed since the last warm, e.g. in another worker"""
+        versions = self.get_table_versions(ACTIVITY_TABLES)
+        counters = {table: version for table, (version, _) in versions.items()} if versions else None
+        if (counters is None or counters != self._activity_versions) and self._warm_activity():
+            self._activity_versions = counters
+    
+    def _warm_activity(self):
+        """Fill the activity feed from the database"""
         try:
             conn = self._connect()
-            cursor = conn.cursor()
-            
-            # Recent contributions
-            cursor.execute('''
-                SELECT c.amount, c.created_at, m.name 
-                FROM contributions c 
-                JOIN members m ON c.member_id = m.id 
-                WHERE c.status = "paid"
-                ORDER BY c.created_at DESC 
-                LIMIT 5
-            ''')
-            recent_contributions = cursor.fetchall()
-            
-            # Recent claims
-            cursor.execute('''
-                SELECT cl.amount, cl.created_at, cl.status, m.name 
-                FROM claims cl 
-                JOIN members m ON cl.member_id = m.id 
-                ORDER BY cl.created_at DESC 
-                LIMIT 5
-            ''')
-            recent_claims = cursor.fetchall()
-            
+            rows = conn.execute('''
+                SELECT * FROM (
+                    SELECT 'contribution', c.id, c.member_id, m.name,
+                           CAST(ROUND(c.amount * 100) AS INTEGER), c.status, c.created_at
+                    FROM contributions c JOIN members m ON c.member_id = m.id
+                    WHERE c.status = 'paid'
+                    ORDER BY c.created_at DESC LIMIT :limit
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT 'claim', c.id, c.member_id, m.name,
+                           CAST(ROUND(c.amount * 100) AS INTEGER), 'pending', c.created_at
+                    FROM claims c JOIN members m ON c.member_id = m.id
+                    ORDER BY c.created_at DESC LIMIT :limit
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT 'claim_status', c.id, c.member_id, m.name,
+                           CAST(ROUND(c.amount * 100) AS INTEGER), c.status, c.reviewed_at
+                    FROM claims c JOIN members m ON c.member_id = m.id
+                    WHERE c.reviewed_at IS NOT NULL
+                    ORDER BY c.reviewed_at DESC LIMIT :limit
+                )
+                ORDER BY 7
+            ''', {'limit': self.activity.capacity}).fetchall()
             conn.close()
-            
-            return {
-                'recent_contributions': recent_contributions,
-                'recent_claims': recent_claims
-            }
+            self.activity.warm(rows)
+            return True
         except Exception as e:
-            logger.error(f"Error getting recent activity: {e}")
-            return {'recent_contributions': [], 'recent_claims': []}
+            logger.error(f"Error warming activity feed: {e}")
+            return False
+    
+    def _publish_claim_event(self, cursor, kind, claim_id, status):
+        cursor.execute('''
+            SELECT c.member_id, m.name, CAST(ROUND(c.amount * 100) AS INTEGER)
+            FROM claims c JOIN members m ON c.member_id = m.id
+            WHERE c.id = ?
+        ''', (claim_id,))
+        row = cursor.fetchone()
+        if row:
+            self.activity.publish(kind, claim_id, row[0], row[1], row[2], status)
+    
+    def _append_outbox(self, cursor, event_type, entity, entity_id, payload):
+        """Record a change event for outbox consumers; call before the write's commit"""
+        cursor.execute('''
+            INSERT INTO outbox_events (event_type, entity, entity_id, payload)
+            VALUES (?, ?, ?, ?)
+        ''', (event_type, entity, entity_id, json.dumps(payload, separators=(',', ':'))))
+    
+    def get_recent_activity(self, limit=5):
+        """Get recent activity for dashboard, from the in-memory feed"""
+        self._refresh_activity()
+        return {
+            'recent_contributions': self.activity.recent(limit, 'contribution'),
+            'recent_claims': self.activity.recent(limit, 'claim'),
+            'events': self.activity.recent(limit * 2),
+            'last_seq': self.activity.last_seq,
+        }
     
     def get_member_by_user_id(self, user_id):
         """Get member by user ID"""
@@ -349,27 +776,38 @@ class CommunityPoolManager:
             logger.error(f"Error getting member: {e}")
             return None
     
+    def get_member_totals(self, member_id):
+        """{'total_contributed_cents', 'total_contributions', 'total_claims'} for one member"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT (SELECT CAST(ROUND(COALESCE(SUM(amount), 0) * 100) AS INTEGER)
+                        FROM contributions WHERE member_id = ? AND status = 'paid'),
+                       (SELECT COUNT(*) FROM contributions WHERE member_id = ?),
+                       (SELECT COUNT(*) FROM claims WHERE member_id = ?)
+            ''', (member_id, member_id, member_id))
+            row = cursor.fetchone()
+            conn.close()
+            return {'total_contributed_cents': row[0], 'total_contributions': row[1], 'total_claims': row[2]}
+        except Exception as e:
+            logger.error(f"Error getting member totals: {e}")
+            return {'total_contributed_cents': None, 'total_contributions': None, 'total_claims': None}
+    
     def get_pending_claims(self):
         """Get all pending claims for admin review"""
         try:
             conn = self._connect()
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT c.*, m.name as member_name, m.phone, m.email
+            cursor.row_factory = row_factory(ClaimRow)
+            cursor.execute(f'''
+                SELECT {CLAIM_COLUMNS}, m.name AS member_name, m.phone AS member_phone, m.email AS member_email
                 FROM claims c
                 JOIN members m ON c.member_id = m.id
                 WHERE c.status = 'pending'
-                ORDER BY c.created_at DESC
+                ORDER BY c.flagged DESC, c.created_at DESC
             ''')
-            
-            columns = [desc[0] for desc in cursor.description]
-            claims = []
-            for row in cursor.fetchall():
-                claim = dict(zip(columns, row))
-                if 'amount' in claim:
-                    claim['amount'] = float(claim['amount'])
-                claims.append(claim)
-            
+            claims = cursor.fetchall()
             conn.close()
             return claims
         except Exception as e:
@@ -381,52 +819,314 @@ class CommunityPoolManager:
         try:
             conn = self._connect()
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT c.*, m.name as member_name, u.username as reviewer_name
+            cursor.row_factory = row_factory(ClaimRow)
+            cursor.execute(f'''
+                SELECT {CLAIM_COLUMNS}, m.name AS member_name, u.username AS reviewer_name
                 FROM claims c
                 JOIN members m ON c.member_id = m.id
                 LEFT JOIN users u ON c.reviewed_by = u.id
                 ORDER BY c.created_at DESC
             ''')
-            
-            columns = [desc[0] for desc in cursor.description]
-            claims = []
-            for row in cursor.fetchall():
-                claim = dict(zip(columns, row))
-                if 'amount' in claim:
-                    claim['amount'] = float(claim['amount'])
-                claims.append(claim)
-            
+            claims = cursor.fetchall()
             conn.close()
             return claims
         except Exception as e:
             logger.error(f"Error getting all claims: {e}")
             return []
     
-    def update_claim_status(self, claim_id, status, admin_id, admin_notes=None):
-        """Update claim status and record admin action"""
+    def get_claim_attachments(self, claim_ids):
+        """Attachments for the given claims as {claim_id: [AttachmentRow, ...]}"""
         try:
             conn = self._connect()
             cursor = conn.cursor()
-            
-            logger.info(f"Updating claim {claim_id} to status {status} by admin {admin_id}")
-            
+            cursor.row_factory = row_factory(AttachmentRow)
+            claim_ids = list(claim_ids)
+            attachments = {}
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(claim_ids), 500):
+                chunk = claim_ids[start:start + 500]
+                cursor.execute(f'''
+                    SELECT id, claim_id, sha256, filename, content_type, size_bytes, uploaded_by, created_at
+                    FROM claim_attachments
+                    WHERE claim_id IN ({', '.join('?' * len(chunk))})
+                    ORDER BY id
+                ''', chunk)
+                for attachment in cursor.fetchall():
+                    attachments.setdefault(attachment.claim_id, []).append(attachment)
+            conn.close()
+            return attachments
+        except Exception as e:
+            logger.error(f"Error getting claim attachments: {e}")
+            return {}
+    
+    def get_attachment(self, attachment_id):
+        """Single attachment row, or None"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.row_factory = row_factory(AttachmentRow)
             cursor.execute('''
-                UPDATE claims 
-                SET status = ?, reviewed_by = ?, reviewed_at = CURRENT_TIMESTAMP, admin_notes = ?
-                WHERE id = ?
-            ''', (status, admin_id, admin_notes, claim_id))
+                SELECT id, claim_id, sha256, filename, content_type, size_bytes, uploaded_by, created_at
+                FROM claim_attachments WHERE id = ?
+            ''', (attachment_id,))
+            attachment = cursor.fetchone()
+            conn.close()
+            return attachment
+        except Exception as e:
+            logger.error(f"Error getting attachment {attachment_id}: {e}")
+            return None
+    
+    def get_attachment_hashes(self):
+        """Set of every sha256 a live claim attachment points at, or None on error"""
+        try:
+            conn = self._connect()
+            hashes = {row[0] for row in conn.execute('SELECT DISTINCT sha256 FROM claim_attachments')}
+            conn.close()
+            return hashes
+        except Exception as e:
+            logger.error(f"Error getting attachment hashes: {e}")
+            return None
+    
+    def update_claim_status(self, claim_id, status, admin_id, admin_notes=None, expected_version=None):
+        """Review a claim; returns a ClaimTransition.
+        
+        With expected_version (the version the reviewer was shown) the change
+        only applies if nobody else has changed the claim since.
+        """
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
             
-            affected_rows = cursor.rowcount
+            logger.info(f"Updating claim {claim_id} to status {status} by admin {admin_id}")
+            result = self._transition_claim(cursor, claim_id, status, admin_id, admin_notes,
+                                            expected_version=expected_version, reviewer=admin_id)
             conn.commit()
+            if result.outcome == 'ok':
+                self._publish_claim_event(cursor, 'claim_status', claim_id, status)
             conn.close()
             
-            logger.info(f"Claim update affected {affected_rows} rows")
-            return affected_rows > 0
-            
+            logger.info(f"Claim {claim_id} update: {result.outcome} (now {result.status} v{result.version})")
+            return result
+        
         except Exception as e:
             logger.error(f"Error updating claim status: {e}")
-            return False
+            return ClaimTransition('error', None, None)
+    
+    def _transition_claim(self, cursor, claim_id, status, changed_by=None, notes=None, expected_version=None,
+                          reviewer=None, **extra):
+        """Compare-and-set a claim's status inside the caller's transaction; returns a ClaimTransition.
+        
+        The UPDATE matches the status and version just read, so a change that
+        commits in between makes this one a conflict instead of overwriting it.
+        A reviewer's change also clears their review lease, and is refused
+        while another admin holds a live one.
+        """
+        cursor.execute('''
+            SELECT status, version,
+                   leased_by IS NOT NULL AND leased_by IS NOT ? AND lease_expires_at > CURRENT_TIMESTAMP
+            FROM claims WHERE id = ?
+        ''', (reviewer, claim_id))
+        row = cursor.fetchone()
+        if row is None:
+            return ClaimTransition('missing', None, None)
+        current, version, leased_elsewhere = row
+        if expected_version is not None and version != expected_version:
+            return ClaimTransition('conflict', current, version)
+        if status not in CLAIM_TRANSITIONS.get(current, ()):
+            return ClaimTransition('invalid', current, version)
+        if reviewer is not None and leased_elsewhere:
+            return ClaimTransition('leased', current, version)
+        
+        if reviewer is not None:
+            cursor.execute('''
+                UPDATE claims
+                SET status = ?, version = version + 1, reviewed_by = ?, reviewed_at = CURRENT_TIMESTAMP,
+                    admin_notes = ?, leased_by = NULL, lease_expires_at = NULL
+                WHERE id = ? AND status = ? AND version = ?
+                  AND (leased_by IS NULL OR leased_by = ? OR lease_expires_at <= CURRENT_TIMESTAMP)
+            ''', (status, reviewer, notes, claim_id, current, version, reviewer))
+        else:
+            cursor.execute('''
+                UPDATE claims SET status = ?, version = version + 1
+                WHERE id = ? AND status = ? AND version = ?
+            ''', (status, claim_id, current, version))
+        if cursor.rowcount == 0:
+            cursor.execute('SELECT status, version FROM claims WHERE id = ?', (claim_id,))
+            return ClaimTransition('conflict', *cursor.fetchone())
+        
+        cursor.execute('''
+            INSERT INTO claim_status_history (claim_id, version, from_status, to_status, changed_by, notes)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (claim_id, version + 1, current, status, changed_by, notes))
+        self._append_claim_status_outbox(cursor, claim_id, status, reviewer, notes if reviewer else None,
+                                         version=version + 1, **extra)
+        return ClaimTransition('ok', status, version + 1)
+    
+    def get_claim_history(self, claim_ids):
+        """Status changes per claim as {claim_id: [(version, from, to, username, notes, changed_at), ...]}"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            claim_ids = list(claim_ids)
+            history = {}
+            for start in range(0, len(claim_ids), 500):
+                chunk = claim_ids[start:start + 500]
+                cursor.execute(f'''
+                    SELECT h.claim_id, h.version, h.from_status, h.to_status, u.username, h.notes, h.changed_at
+                    FROM claim_status_history h
+                    LEFT JOIN users u ON u.id = h.changed_by
+                    WHERE h.claim_id IN ({', '.join('?' * len(chunk))})
+                    ORDER BY h.claim_id, h.version
+                ''', chunk)
+                for claim_id, *change in cursor.fetchall():
+                    history.setdefault(claim_id, []).append(tuple(change))
+            conn.close()
+            return history
+        except Exception as e:
+            logger.error(f"Error getting claim history: {e}")
+            return {}
+    
+    def _append_claim_status_outbox(self, cursor, claim_id, status, reviewed_by=None, admin_notes=None, **extra):
+        cursor.execute('SELECT member_id, CAST(ROUND(amount * 100) AS INTEGER) FROM claims WHERE id = ?', (claim_id,))
+        member_id, amount_cents = cursor.fetchone()
+        self._append_outbox(cursor, 'claim.status_changed', 'claim', claim_id, {
+            'id': claim_id, 'member_id': member_id, 'amount_cents': amount_cents, 'status': status,
+            'reviewed_by': reviewed_by, 'admin_notes': admin_notes, **extra,
+        })
+    
+    def checkout_claims(self, admin_id, count=10, lease_seconds=900):
+        """Lease up to `count` pending claims to one reviewer; returns the claims now leased to them.
+        
+        The reviewer's own live leases are renewed first, then topped up with
+        unleased or expired claims, flagged and oldest first. The UPDATE runs
+        under SQLite's single write lock, so concurrent reviewers always get
+        disjoint sets.
+        """
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE claims
+                SET leased_by = ?, lease_expires_at = datetime('now', ?)
+                WHERE id IN (
+                    SELECT id FROM claims
+                    WHERE status = 'pending'
+                      AND (leased_by IS NULL OR leased_by = ? OR lease_expires_at <= CURRENT_TIMESTAMP)
+                    ORDER BY leased_by IS ? DESC, flagged DESC, created_at
+                    LIMIT ?
+                )
+            ''', (admin_id, f'+{int(lease_seconds)} seconds', admin_id, admin_id, count))
+            conn.commit()
+            conn.close()
+            logger.info(f"Admin {admin_id} holds {cursor.rowcount} claim leases")
+            return self.get_leased_claims(admin_id)
+        except Exception as e:
+            logger.error(f"Error checking out claims: {e}")
+            return []
+    
+    def get_leased_claims(self, admin_id):
+        """Pending claims currently leased to this reviewer"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.row_factory = row_factory(ClaimRow)
+            cursor.execute(f'''
+                SELECT {CLAIM_COLUMNS}, m.name AS member_name, m.phone AS member_phone, m.email AS member_email
+                FROM claims c
+                JOIN members m ON c.member_id = m.id
+                WHERE c.leased_by = ? AND c.lease_expires_at > CURRENT_TIMESTAMP AND c.status = 'pending'
+                ORDER BY c.flagged DESC, c.created_at
+            ''', (admin_id,))
+            claims = cursor.fetchall()
+            conn.close()
+            return claims
+        except Exception as e:
+            logger.error(f"Error getting leased claims: {e}")
+            return []
+    
+    def release_claim_leases(self, admin_id, claim_ids=None):
+        """Return this reviewer's leased claims (or just claim_ids) to the queue"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            sql = '''
+                UPDATE claims SET leased_by = NULL, lease_expires_at = NULL
+                WHERE leased_by = ? AND status = 'pending'
+            '''
+            params = [admin_id]
+            if claim_ids:
+                sql += f" AND id IN ({','.join('?' * len(claim_ids))})"
+                params.extend(claim_ids)
+            cursor.execute(sql, params)
+            released = cursor.rowcount
+            conn.commit()
+            conn.close()
+            return released
+        except Exception as e:
+            logger.error(f"Error releasing claim leases: {e}")
+            return 0
+    
+    def get_lease_expiry_bounds(self):
+        """(earliest live lease expiry, latest lapsed one not yet cleared), either may be None; None on error"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT MIN(CASE WHEN lease_expires_at > CURRENT_TIMESTAMP THEN lease_expires_at END),
+                       MAX(CASE WHEN lease_expires_at <= CURRENT_TIMESTAMP THEN lease_expires_at END)
+                FROM claims WHERE leased_by IS NOT NULL
+            ''')
+            bounds = cursor.fetchone()
+            conn.close()
+            return bounds
+        except Exception as e:
+            logger.error(f"Error getting lease expiry bounds: {e}")
+            return None
+    
+    def expire_claim_leases(self):
+        """Clear leases that have run out, so the queue shows those claims as free"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE claims SET leased_by = NULL, lease_expires_at = NULL
+                WHERE lease_expires_at <= CURRENT_TIMESTAMP
+            ''')
+            expired = cursor.rowcount
+            conn.commit()
+            conn.close()
+            return expired
+        except Exception as e:
+            logger.error(f"Error expiring claim leases: {e}")
+            return 0
+    
+    # ------------------------------------------------------------------
+    # Maintenance, run by the scheduler rather than on requests
+    # ------------------------------------------------------------------
+    
+    def checkpoint_wal(self, mode='PASSIVE'):
+        """Copy WAL frames into the database file; returns (busy, wal_pages, checkpointed_pages)"""
+        if mode not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+            raise ValueError(f"Unknown checkpoint mode: {mode}")
+        conn = self._connect()
+        try:
+            return tuple(conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone())
+        finally:
+            conn.close()
+    
+    def optimize(self, full=False):
+        """Refresh planner statistics: PRAGMA optimize, or a full ANALYZE plus FTS merge"""
+        conn = self._connect()
+        try:
+            if full:
+                conn.execute("ANALYZE")
+                if self.has_member_fts:
+                    conn.execute("INSERT INTO members_fts(members_fts) VALUES ('optimize')")
+            else:
+                conn.execute("PRAGMA optimize")
+            conn.commit()
+        finally:
+            conn.close()
     
     def debug_claim_update(self, claim_id, admin_id):
         """Debug method to check claim and admin user"""
@@ -454,17 +1154,20 @@ class CommunityPoolManager:
             logger.error(f"Debug error: {e}")
             return {'error': str(e)}
     
-    def get_member_contributions(self, member_id):
-        """Get member contributions"""
+    def get_member_contributions(self, member_id, limit=None, before=None):
+        """Get member contributions, newest first; `before` is a (created_at, id) keyset cursor"""
         try:
             conn = self._connect()
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT amount, status, created_at 
+            cursor.row_factory = row_factory(ContributionRow)
+            cursor.execute(f'''
+                SELECT id, member_id, CAST(ROUND(amount * 100) AS INTEGER) AS amount_cents,
+                       payment_reference, status, created_at, paid_at
                 FROM contributions 
-                WHERE member_id = ? 
-                ORDER BY created_at DESC
-            ''', (member_id,))
+                WHERE member_id = ? {'AND (created_at, id) < (?, ?)' if before else ''}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', (member_id, *(before or ()), -1 if limit is None else limit))
             contributions = cursor.fetchall()
             conn.close()
             return contributions
@@ -472,17 +1175,19 @@ class CommunityPoolManager:
             logger.error(f"Error getting contributions: {e}")
             return []
     
-    def get_member_claims(self, member_id):
-        """Get member claims"""
+    def get_member_claims(self, member_id, limit=None, before=None):
+        """Get member claims, newest first; `before` is a (created_at, id) keyset cursor"""
         try:
             conn = self._connect()
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT amount, status, description, type, hospital, priority, created_at 
-                FROM claims 
-                WHERE member_id = ? 
-                ORDER BY created_at DESC
-            ''', (member_id,))
+            cursor.row_factory = row_factory(ClaimRow)
+            cursor.execute(f'''
+                SELECT {CLAIM_COLUMNS}
+                FROM claims c
+                WHERE c.member_id = ? {'AND (c.created_at, c.id) < (?, ?)' if before else ''}
+                ORDER BY c.created_at DESC, c.id DESC
+                LIMIT ?
+            ''', (member_id, *(before or ()), -1 if limit is None else limit))
             claims = cursor.fetchall()
             conn.close()
             return claims
@@ -490,8 +1195,45 @@ class CommunityPoolManager:
             logger.error(f"Error getting claims: {e}")
             return []
     
+    def get_member_claim(self, member_id, claim_id):
+        """One of a member's claims, or None"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.row_factory = row_factory(ClaimRow)
+            cursor.execute(f'''
+                SELECT {CLAIM_COLUMNS}
+                FROM claims c
+                WHERE c.id = ? AND c.member_id = ?
+            ''', (claim_id, member_id))
+            claim = cursor.fetchone()
+            conn.close()
+            return claim
+        except Exception as e:
+            logger.error(f"Error getting claim {claim_id}: {e}")
+            return None
+    
+    def get_contribution_by_reference(self, member_id, payment_reference):
+        """A member's contribution with this payment reference, or None"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.row_factory = row_factory(ContributionRow)
+            cursor.execute('''
+                SELECT id, member_id, CAST(ROUND(amount * 100) AS INTEGER) AS amount_cents,
+                       payment_reference, status, created_at, paid_at
+                FROM contributions
+                WHERE payment_reference = ? AND member_id = ?
+            ''', (payment_reference, member_id))
+            contribution = cursor.fetchone()
+            conn.close()
+            return contribution
+        except Exception as e:
+            logger.error(f"Error getting contribution {payment_reference}: {e}")
+            return None
+    
     def record_contribution(self, member_id, amount, reference_id, status='paid'):
-        """Record contribution"""
+        """Record contribution; returns its id, or False"""
         try:
             conn = self._connect()
             cursor = conn.cursor()
@@ -499,30 +1241,78 @@ class CommunityPoolManager:
                 INSERT INTO contributions (member_id, amount, payment_reference, status, paid_at)
                 VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
             ''', (member_id, amount, reference_id, status))
+            contribution_id = cursor.lastrowid
+            self._append_outbox(cursor, 'contribution.recorded', 'contribution', contribution_id, {
+                'id': contribution_id, 'member_id': member_id, 'amount_cents': round(float(amount) * 100),
+                'payment_reference': reference_id, 'status': status,
+            })
             conn.commit()
+            if status == 'paid':
+                cursor.execute('SELECT name FROM members WHERE id = ?', (member_id,))
+                member = cursor.fetchone()
+                self.activity.publish('contribution', contribution_id, member_id,
+                                      member[0] if member else None, round(float(amount) * 100), status)
             conn.close()
-            return True
+            return contribution_id
         except Exception as e:
             logger.error(f"Error recording contribution: {e}")
             return False
     
-    def create_claim(self, member_id, amount, description, claim_type='General', hospital=None, priority='normal'):
-        """Submit new claim"""
+    def create_claim(self, member_id, amount, description, claim_type='General', hospital=None, priority='normal',
+                     attachments=None, uploaded_by=None):
+        """Submit new claim, with (sha256, filename, content_type, size_bytes) attachments in the same transaction"""
         try:
             conn = self._connect()
             cursor = conn.cursor()
+            risk_score, flag_reason = self.screener.screen(cursor, member_id, amount, claim_type, hospital)
+            flagged = self.screener.is_suspicious(risk_score)
             cursor.execute('''
-                INSERT INTO claims (member_id, amount, description, type, hospital, priority)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (member_id, amount, description, claim_type, hospital, priority))
+                INSERT INTO claims (member_id, amount, description, type, hospital, priority,
+                                    risk_score, flag_reason, flagged)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (member_id, amount, description, claim_type, hospital, priority,
+                  risk_score, flag_reason, int(flagged)))
             claim_id = cursor.lastrowid
+            if attachments:
+                cursor.executemany('''
+                    INSERT INTO claim_attachments (claim_id, sha256, filename, content_type, size_bytes, uploaded_by)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', [(claim_id, *attachment, uploaded_by) for attachment in attachments])
+            self._append_outbox(cursor, 'claim.submitted', 'claim', claim_id, {
+                'id': claim_id, 'member_id': member_id, 'amount_cents': round(float(amount) * 100),
+                'type': claim_type, 'hospital': hospital, 'priority': priority, 'status': 'pending',
+                'risk_score': risk_score, 'flagged': bool(flagged), 'attachments': len(attachments or ()),
+            })
+            if flagged:
+                logger.warning(f"Claim {claim_id} flagged for review: {flag_reason}")
             conn.commit()
+            self._publish_claim_event(cursor, 'claim', claim_id, 'pending')
             conn.close()
             return claim_id
         except Exception as e:
             logger.error(f"Error submitting claim: {e}")
             return None
     
+    def rescreen_pending_claims(self):
+        """Re-score every pending claim and return how many are flagged"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            results = self.screener.screen_pending(cursor)
+            cursor.executemany('''
+                UPDATE claims SET risk_score = ?, flag_reason = ?, flagged = ?
+                WHERE id = ?
+            ''', results)
+            conn.commit()
+            conn.close()
+            
+            flagged_count = sum(result[2] for result in results)
+            logger.info(f"Screened {len(results)} pending claims, {flagged_count} flagged")
+            return flagged_count
+        except Exception as e:
+            logger.error(f"Error screening pending claims: {e}")
+            return None
+    
     def get_member_by_id(self, member_id):
         """Get member by ID"""
         try:
@@ -549,17 +1339,116 @@ class CommunityPoolManager:
             logger.error(f"Error getting member: {e}")
             return None
     
+    def find_member_by_phone(self, phone):
+        """Exact member lookup by phone number in any common format"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute('SELECT id FROM members WHERE phone_e164 = ?', (normalize_phone(phone),))
+            row = cursor.fetchone()
+            conn.close()
+            return self.get_member_by_id(row[0]) if row else None
+        except Exception as e:
+            logger.error(f"Error finding member by phone: {e}")
+            return None
+    
+    def search_members(self, query, limit=50):
+        """Members matching a name, phone or email fragment, prefix matches first"""
+        plan = MemberSearchPlan(query)
+        if plan.is_empty:
+            return []
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            
+            member_ids = []
+            for column, pattern in plan.prefix_lookups():
+                cursor.execute(f'''
+                    SELECT id FROM members WHERE {column} GLOB ?
+                    ORDER BY {column} LIMIT ?
+                ''', (pattern, limit))
+                member_ids.extend(row[0] for row in cursor.fetchall())
+            
+            match = plan.trigram_match()
+            if match and self.has_member_fts and len(set(member_ids)) < limit:
+                # Newest members first; rowid order lets FTS5 stop after `limit` hits,
+                # where ORDER BY rank would score every match of a common name
+                cursor.execute('''
+                    SELECT rowid FROM members_fts WHERE members_fts MATCH ?
+                    ORDER BY rowid DESC LIMIT ?
+                ''', (match, limit))
+                member_ids.extend(row[0] for row in cursor.fetchall())
+            
+            member_ids = list(dict.fromkeys(member_ids))[:limit]
+            if not member_ids:
+                conn.close()
+                return []
+            
+            cursor.row_factory = row_factory(MemberRow)
+            placeholders = ','.join('?' * len(member_ids))
+            cursor.execute(f'''
+                SELECT {MEMBER_COLUMNS}
+                FROM members m
+                WHERE m.id IN ({placeholders})
+            ''', member_ids)
+            by_id = {member.id: member for member in cursor.fetchall()}
+            conn.close()
+            return [by_id[member_id] for member_id in member_ids if member_id in by_id]
+        except Exception as e:
+            logger.error(f"Error searching members: {e}")
+            return []
+    
     def update_member_phone(self, member_id, new_phone):
         """Update member phone number"""
         try:
             conn = self._connect()
             cursor = conn.cursor()
             cursor.execute('''
-                UPDATE members SET phone = ? WHERE id = ?
-            ''', (new_phone, member_id))
+                UPDATE members SET phone = ?, phone_e164 = ? WHERE id = ?
+            ''', (new_phone, normalize_phone(new_phone), member_id))
+            if cursor.rowcount:
+                self._append_outbox(cursor, 'member.phone_changed', 'member', member_id, {
+                    'member_id': member_id, 'phone': normalize_phone(new_phone),
+                })
             conn.commit()
             conn.close()
             return True
         except Exception as e:
             logger.error(f"Error updating phone: {e}")
-            return False 
\ No newline at end of file
+            return False 
+    
+    def iter_export_rows(self, entity, start_date=None, end_date=None, batch_size=1000):
+        """Stream rows for export: yields the column names, then batches of rows.
+        
+        start_date is inclusive and end_date exclusive; both are 'YYYY-MM-DD'
+        strings compared against created_at. The cursor is drained with
+        fetchmany so memory use stays flat regardless of table size.
+        """
+        if entity not in EXPORT_QUERIES:
+            raise ValueError(f"Unknown export entity: {entity}")
+        
+        query = EXPORT_QUERIES[entity]
+        conditions = []
+        params = []
+        if start_date:
+            conditions.append('created_at >= ?')
+            params.append(start_date)
+        if end_date:
+            conditions.append('created_at < ?')
+            params.append(end_date)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY created_at, id'
+        
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            yield [desc[0] for desc in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.close()
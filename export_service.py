@@ -0,0 +1,50 @@
+# export_service.py
+import csv
+import io
+import json
+from decimal import Decimal
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+def iter_csv(batches):
+    """Turn (columns, rows, rows, ...) batches into CSV text chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for index, batch in enumerate(batches):
+        if index == 0:
+            writer.writerow(batch)
+        else:
+            writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+def iter_jsonl(batches):
+    """Turn (columns, rows, rows, ...) batches into JSON Lines chunks"""
+    columns = None
+    for batch in batches:
+        if columns is None:
+            columns = batch
+            continue
+        yield ''.join(
+            json.dumps(dict(zip(columns, row)), default=_json_default, separators=(',', ':')) + '\n'
+            for row in batch
+        )
+
+def iter_export(batches, fmt):
+    """Serialize export batches in the requested format"""
+    if fmt == 'csv':
+        return iter_csv(batches)
+    if fmt == 'jsonl':
+        return iter_jsonl(batches)
+    raise ValueError(f"Unknown export format: {fmt}")
@@ -0,0 +1,398 @@
+# integrity.py
+"""Nightly data integrity verification.
+
+    python integrity.py --db health_pool.db --workers 4 --json integrity.json
+    python integrity.py --schema-file schema.sql     # also report drift in schema.sql
+
+Checks run on read-only connections, so in WAL mode they never block
+writers. Row checks (foreign keys, status vocabularies, claim status history,
+orphaned members and users, amounts, payout/claim agreement, derived search
+columns, attachment files) are split into id-range chunks and run in
+parallel. Every chunk is a short read transaction of its own, so the
+verifier never pins an old snapshot that would stop WAL checkpoints during a
+long run.
+
+Schema expectations come from the code itself: a scratch database is
+initialised by CommunityPoolManager and compared column by column with the
+live one, and the manager's shared SQL fragments and export queries are
+compiled with EXPLAIN, which catches "no such column" errors before a
+request does.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from attachments import AttachmentStore
+from database_manager import (CLAIM_COLUMNS, CLAIM_TRANSITIONS, EXPORT_QUERIES, MEMBER_COLUMNS, VERSIONED_TABLES,
+                              CommunityPoolManager)
+from member_search import normalize_phone
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 100000
+MAX_SAMPLES = 10
+
+STATUS_VOCABULARIES = {
+    ('members', 'status'): ('active', 'inactive', 'suspended'),
+    ('users', 'user_type'): ('admin', 'member'),
+    ('contributions', 'status'): ('pending', 'paid', 'failed'),
+    ('claims', 'status'): ('pending', 'approved', 'declined', 'paid'),
+    ('claims', 'priority'): ('normal', 'medium', 'high', 'urgent', 'emergency'),
+    ('payouts', 'status'): ('pending', 'submitted', 'paid', 'failed'),
+    ('claim_status_history', 'from_status'): tuple(CLAIM_TRANSITIONS),
+    ('claim_status_history', 'to_status'): tuple(CLAIM_TRANSITIONS),
+}
+
+# (table, column, parent table); every parent key is its id
+FOREIGN_KEYS = (
+    ('users', 'member_id', 'members'),
+    ('contributions', 'member_id', 'members'),
+    ('claims', 'member_id', 'members'),
+    ('claims', 'reviewed_by', 'users'),
+    ('claims', 'leased_by', 'users'),
+    ('payouts', 'claim_id', 'claims'),
+    ('claim_attachments', 'claim_id', 'claims'),
+    ('claim_attachments', 'uploaded_by', 'users'),
+    ('claim_status_history', 'claim_id', 'claims'),
+    ('claim_status_history', 'changed_by', 'users'),
+)
+
+# Queries assembled from the manager's shared column lists, compiled but never run
+CODE_QUERIES = {
+    'CLAIM_COLUMNS': f"SELECT {CLAIM_COLUMNS} FROM claims c",
+    'MEMBER_COLUMNS': f"SELECT {MEMBER_COLUMNS} FROM members m",
+    **{f"EXPORT_QUERIES['{entity}']": sql for entity, sql in EXPORT_QUERIES.items()},
+}
+
+Finding = namedtuple('Finding', ['severity', 'check', 'table', 'message', 'count', 'samples'])
+
+def _row_checks():
+    """(table, check, severity, message, sql) where sql selects offending ids for `id BETWEEN ? AND ?`"""
+    checks = []
+    for table, column, parent in FOREIGN_KEYS:
+        checks.append((table, 'foreign_key', 'error', f"{column} points at a missing {parent} row", f'''
+            SELECT t.id FROM {table} t
+            WHERE t.id BETWEEN ? AND ? AND t.{column} IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM {parent} p WHERE p.id = t.{column})
+        '''))
+    for (table, column), allowed in STATUS_VOCABULARIES.items():
+        values = ', '.join(f"'{value}'" for value in allowed)
+        checks.append((table, 'vocabulary', 'error', f"{column} outside ({values})", f'''
+            SELECT id FROM {table}
+            WHERE id BETWEEN ? AND ? AND ({column} IS NULL OR {column} NOT IN ({values}))
+        '''))
+    for table in ('contributions', 'claims', 'payouts'):
+        checks.append((table, 'amount', 'error', "amount is not positive", f'''
+            SELECT id FROM {table} WHERE id BETWEEN ? AND ? AND NOT amount > 0
+        '''))
+        checks.append((table, 'amount', 'warning', "amount has fractions of a cent", f'''
+            SELECT id FROM {table} WHERE id BETWEEN ? AND ? AND ROUND(amount, 2) != amount
+        '''))
+    checks += [
+        ('members', 'orphan', 'warning', "member has no user account", '''
+            SELECT m.id FROM members m
+            WHERE m.id BETWEEN ? AND ? AND NOT EXISTS (SELECT 1 FROM users u WHERE u.member_id = m.id)
+        '''),
+        ('users', 'orphan', 'error', "member login has no member_id", '''
+            SELECT id FROM users WHERE id BETWEEN ? AND ? AND user_type = 'member' AND member_id IS NULL
+        '''),
+        ('members', 'derived_column', 'error', "email_lower does not match email", '''
+            SELECT id FROM members
+            WHERE id BETWEEN ? AND ? AND email_lower IS NOT lower(trim(email))
+        '''),
+        ('claims', 'ledger', 'error', "claim is paid but has no paid payout", '''
+            SELECT c.id FROM claims c
+            WHERE c.id BETWEEN ? AND ? AND c.status = 'paid'
+              AND NOT EXISTS (SELECT 1 FROM payouts p WHERE p.claim_id = c.id AND p.status = 'paid')
+        '''),
+        ('claims', 'ledger', 'error', "paid payouts exceed the claim amount", '''
+            SELECT c.id FROM claims c JOIN payouts p ON p.claim_id = c.id AND p.status = 'paid'
+            WHERE c.id BETWEEN ? AND ?
+            GROUP BY c.id, c.amount
+            HAVING SUM(p.amount) > c.amount + 0.005
+        '''),
+        ('payouts', 'ledger', 'error', "payout is paid but its claim is not", '''
+            SELECT p.id FROM payouts p JOIN claims c ON c.id = p.claim_id
+            WHERE p.id BETWEEN ? AND ? AND p.status = 'paid' AND c.status != 'paid'
+        '''),
+        ('claims', 'history', 'error', "version is behind the claim's status history", '''
+            SELECT c.id FROM claims c
+            WHERE c.id BETWEEN ? AND ?
+              AND c.version < (SELECT MAX(h.version) FROM claim_status_history h WHERE h.claim_id = c.id)
+        '''),
+        ('claims', 'history', 'error', "status differs from the latest history entry", '''
+            SELECT c.id FROM claims c
+            JOIN claim_status_history h ON h.claim_id = c.id AND h.version = c.version
+            WHERE c.id BETWEEN ? AND ? AND h.to_status != c.status
+        '''),
+        ('claim_status_history', 'history', 'error', "transition is not in CLAIM_TRANSITIONS", f'''
+            SELECT id FROM claim_status_history
+            WHERE id BETWEEN ? AND ? AND from_status || '>' || to_status NOT IN ({', '.join(
+                f"'{source}>{target}'" for source, targets in CLAIM_TRANSITIONS.items() for target in targets)})
+        '''),
+        ('claims', 'ledger', 'warning', "claim was reviewed without a reviewer", '''
+            SELECT id FROM claims
+            WHERE id BETWEEN ? AND ? AND status IN ('approved', 'declined', 'paid') AND reviewed_by IS NULL
+        '''),
+    ]
+    return checks
+
+ROW_CHECKS = _row_checks()
+
+class IntegrityChecker:
+    """Runs every check against one database file and collects Findings"""
+
+    def __init__(self, db_path, workers=4, chunk_rows=CHUNK_ROWS, attachment_dir=None, schema_file=None):
+        self.db_path = db_path
+        self.workers = workers
+        self.chunk_rows = chunk_rows
+        self.attachment_dir = attachment_dir
+        self.schema_file = schema_file
+        self._findings = {}
+
+    def _connect(self):
+        conn = sqlite3.connect(f"file:{os.path.abspath(self.db_path)}?mode=ro", uri=True,
+                               check_same_thread=False, timeout=30.0)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def _report(self, severity, check, table, message, ids=(), count=None):
+        key = (severity, check, table, message)
+        total, samples = self._findings.get(key, (0, []))
+        total += len(ids) if count is None else count
+        self._findings[key] = (total, (samples + list(ids))[:MAX_SAMPLES])
+
+    # ------------------------------------------------------------------
+    # Whole-database checks
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _columns(conn):
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+            "AND name NOT LIKE 'members_fts%'")]
+        return {table: {row[1] for row in conn.execute(f"PRAGMA table_info({table})")} for table in tables}
+
+    def _expected_columns(self):
+        """Columns the current code creates, taken from a scratch database it initialises"""
+        scratch = tempfile.mkdtemp(prefix='integrity-')
+        try:
+            path = os.path.join(scratch, 'expected.db')
+            level = logging.getLogger('database_manager').level
+            logging.getLogger('database_manager').setLevel(logging.WARNING)
+            try:
+                CommunityPoolManager(path)
+            finally:
+                logging.getLogger('database_manager').setLevel(level)
+            conn = sqlite3.connect(path)
+            try:
+                return self._columns(conn)
+            finally:
+                conn.close()
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    def check_schema(self, conn):
+        expected = self._expected_columns()
+        actual = self._columns(conn)
+        for table, columns in sorted(expected.items()):
+            if table not in actual:
+                self._report('error', 'schema', table, "table missing", count=1)
+                continue
+            missing = sorted(columns - actual[table])
+            extra = sorted(actual[table] - columns)
+            if missing:
+                self._report('error', 'schema', table, f"columns the code uses are missing: {', '.join(missing)}",
+                             count=len(missing))
+            if extra:
+                self._report('info', 'schema', table, f"columns the code never creates: {', '.join(extra)}",
+                             count=len(extra))
+
+        for name, sql in CODE_QUERIES.items():
+            try:
+                conn.execute(f"EXPLAIN {sql}")
+            except sqlite3.OperationalError as e:
+                self._report('error', 'code_query', None, f"{name} does not compile: {e}", count=1)
+
+        if self.schema_file:
+            documented = sqlite3.connect(':memory:')
+            try:
+                with open(self.schema_file, encoding='utf-8') as f:
+                    documented.executescript(f.read())
+                documented_columns = self._columns(documented)
+                for (table, column), allowed in STATUS_VOCABULARIES.items():
+                    if table not in documented_columns:
+                        continue
+                    for row in documented.execute(f"PRAGMA table_info({table})"):
+                        default = (row[4] or '').strip("'")
+                        if row[1] == column and default and default not in allowed:
+                            self._report('warning', 'schema_file', table,
+                                         f"{column} defaults to '{default}', which the code never writes", count=1)
+            finally:
+                documented.close()
+            for table in sorted(set(expected) - set(documented_columns)):
+                self._report('warning', 'schema_file', table, "table created by the code is not documented", count=1)
+            for table, columns in sorted(documented_columns.items()):
+                if table not in expected:
+                    self._report('warning', 'schema_file', table, "table in schema file but not in code", count=1)
+                    continue
+                missing = sorted(expected[table] - columns)
+                stale = sorted(columns - expected[table])
+                if missing or stale:
+                    self._report('warning', 'schema_file', table,
+                                 f"schema file lacks {', '.join(missing) or 'nothing'}; "
+                                 f"has unused {', '.join(stale) or 'nothing'}", count=len(missing) + len(stale))
+
+    def check_totals(self, conn):
+        versions = {row[0] for row in conn.execute("SELECT table_name FROM table_versions")}
+        for table in VERSIONED_TABLES:
+            if table not in versions:
+                self._report('error', 'ledger', 'table_versions', f"no change counter for {table}", count=1)
+
+        contributed = conn.execute(
+            "SELECT COALESCE(SUM(amount), 0) FROM contributions WHERE status = 'paid'").fetchone()[0]
+        paid_out = conn.execute("SELECT COALESCE(SUM(amount), 0) FROM payouts WHERE status = 'paid'").fetchone()[0]
+        for entity, status, total_amount in conn.execute(
+                "SELECT entity, status, total_amount FROM archive_ledger WHERE status = 'paid'"):
+            if entity == 'contributions':
+                contributed += total_amount
+            elif entity == 'payouts':
+                paid_out += total_amount
+        if paid_out > contributed + 0.005:
+            self._report('error', 'ledger', None,
+                         f"paid out R{paid_out:.2f} exceeds contributions R{contributed:.2f}", count=1)
+
+        lagging = conn.execute('''
+            SELECT name FROM outbox_consumers
+            WHERE last_event_id > (SELECT COALESCE(MAX(id), 0) FROM outbox_events)
+              AND last_event_id != 0
+        ''').fetchall()
+        for (name,) in lagging:
+            self._report('warning', 'outbox', 'outbox_consumers', f"consumer {name} is past the newest event", count=1)
+
+    # ------------------------------------------------------------------
+    # Chunked row checks
+    # ------------------------------------------------------------------
+
+    def _chunks(self, conn, tables):
+        chunks = []
+        for table in tables:
+            low, high = conn.execute(f"SELECT MIN(id), MAX(id) FROM {table}").fetchone()
+            if low is None:
+                continue
+            for start in range(low, high + 1, self.chunk_rows):
+                chunks.append((table, start, min(start + self.chunk_rows - 1, high)))
+        return chunks
+
+    def _check_chunk(self, table, low, high):
+        results = []
+        conn = self._connect()
+        try:
+            for check_table, check, severity, message, sql in ROW_CHECKS:
+                if check_table != table:
+                    continue
+                try:
+                    ids = [row[0] for row in conn.execute(sql, (low, high))]
+                except sqlite3.OperationalError as e:
+                    # A missing column is already reported by the schema check
+                    results.append(('warning', 'skipped', table, f"{check} check could not run: {e}", [0]))
+                    continue
+                if ids:
+                    results.append((severity, check, table, message, ids))
+
+            try:
+                if table == 'members':
+                    wrong = [member_id for member_id, phone, phone_e164 in conn.execute(
+                        "SELECT id, phone, phone_e164 FROM members WHERE id BETWEEN ? AND ?", (low, high))
+                        if phone_e164 != normalize_phone(phone)]
+                    if wrong:
+                        results.append(('error', 'derived_column', table, "phone_e164 does not match phone", wrong))
+
+                if table == 'claim_attachments' and self.attachment_dir:
+                    missing = [attachment_id for attachment_id, sha256 in conn.execute(
+                        "SELECT id, sha256 FROM claim_attachments WHERE id BETWEEN ? AND ?", (low, high))
+                        if not os.path.exists(self._store.path_for(sha256))]
+                    if missing:
+                        results.append(('error', 'attachment', table, "attachment file missing from the store",
+                                        missing))
+            except sqlite3.OperationalError as e:
+                results.append(('warning', 'skipped', table, f"file and derived column checks could not run: {e}",
+                                [0]))
+        finally:
+            conn.close()
+        return results
+
+    def run(self):
+        """Run every check; returns Findings, errors first"""
+        started = time.perf_counter()
+        self._findings = {}
+        if self.attachment_dir:
+            if not os.path.isdir(self.attachment_dir):
+                raise FileNotFoundError(f"attachment store {self.attachment_dir} does not exist")
+            self._store = AttachmentStore(self.attachment_dir)
+
+        conn = self._connect()
+        try:
+            self.check_schema(conn)
+            try:
+                self.check_totals(conn)
+            except sqlite3.OperationalError as e:
+                self._report('warning', 'skipped', None, f"ledger totals could not be checked: {e}", count=1)
+            tables = sorted({check[0] for check in ROW_CHECKS} | {'members', 'claim_attachments'})
+            tables = [table for table in tables if table in self._columns(conn)]
+            chunks = self._chunks(conn, tables)
+        finally:
+            conn.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='integrity') as executor:
+            for results in executor.map(lambda chunk: self._check_chunk(*chunk), chunks):
+                for severity, check, table, message, ids in results:
+                    if check == 'skipped':
+                        self._findings[(severity, check, table, message)] = (1, [])
+                    else:
+                        self._report(severity, check, table, message, ids)
+
+        order = {'error': 0, 'warning': 1, 'info': 2}
+        findings = sorted(
+            (Finding(severity, check, table, message, count, samples)
+             for (severity, check, table, message), (count, samples) in self._findings.items()),
+            key=lambda finding: (order[finding.severity], finding.check, finding.table or ''))
+        logger.info(f"Checked {len(chunks)} chunks in {time.perf_counter() - started:.1f}s: "
+                    f"{sum(1 for finding in findings if finding.severity == 'error')} error findings")
+        return findings
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Verify database integrity without blocking live traffic")
+    parser.add_argument('--db', default='health_pool.db', help='database file')
+    parser.add_argument('--workers', type=int, default=4, help='parallel read-only connections')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='ids per row-check chunk')
+    parser.add_argument('--attachments', help='attachment store directory to check files against')
+    parser.add_argument('--schema-file', help='documented schema (e.g. schema.sql) to compare with the code')
+    parser.add_argument('--json', help='write findings here as JSON')
+    args = parser.parse_args()
+
+    checker = IntegrityChecker(args.db, workers=args.workers, chunk_rows=args.chunk_rows,
+                               attachment_dir=args.attachments, schema_file=args.schema_file)
+    findings = checker.run()
+    for finding in findings:
+        where = f"{finding.table}: " if finding.table else ''
+        samples = f" (e.g. ids {', '.join(map(str, finding.samples))})" if finding.samples else ''
+        print(f"{finding.severity.upper():<8}{finding.check:<15}{where}{finding.message} "
+              f"[{finding.count}]{samples}")
+    if not findings:
+        print("No problems found")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([finding._asdict() for finding in findings], f, indent=2)
+    return 1 if any(finding.severity == 'error' for finding in findings) else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,62 @@
+# member_forms.py
+"""Form validation and login state shared by the Flask views (app.py), the
+async views (asgi.py) and the JSON API (api.py).
+
+Validators take the submitted form (any mapping with .get) and return the
+cleaned values together with an error message for the user, or None.
+"""
+
+# Copied from the authenticated user into the session at login
+SESSION_USER_KEYS = ('username', 'user_type', 'member_id', 'name', 'phone', 'email')
+
+INVALID_AMOUNT = 'Please enter a valid amount.'
+
+def start_session(session, pool_id, user):
+    """Log user into the given (Flask or Quart) session"""
+    session['pool_id'] = pool_id
+    session['user_id'] = user['id']
+    for key in SESSION_USER_KEYS:
+        session[key] = user[key]
+
+def home_endpoint(user_type):
+    """Where a user lands after logging in"""
+    return 'dashboard' if user_type == 'admin' else 'member_dashboard'
+
+def parse_login(form):
+    """(username, password, error)"""
+    username = form.get('username', '').strip()
+    password = form.get('password', '')
+    if not username or not password:
+        return username, password, 'Username and password are required.'
+    return username, password, None
+
+def _parse_amount(form):
+    try:
+        return float(form.get('amount', 0))
+    except ValueError:
+        return None
+
+def parse_contribution(form):
+    """(amount, error)"""
+    amount = _parse_amount(form)
+    if amount is None or amount <= 0:
+        return None, INVALID_AMOUNT
+    return amount, None
+
+def parse_claim(form):
+    """(fields, error); fields holds amount, description, claim_type, hospital and priority"""
+    amount = _parse_amount(form)
+    if amount is None:
+        return None, INVALID_AMOUNT
+    description = form.get('description', '').strip()
+    if not description:
+        return None, 'Description is required.'
+    if amount <= 0:
+        return None, INVALID_AMOUNT
+    return {
+        'amount': amount,
+        'description': description,
+        'claim_type': form.get('type', 'General').strip(),
+        'hospital': form.get('hospital', '').strip(),
+        'priority': form.get('priority', 'normal'),
+    }, None
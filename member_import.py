@@ -0,0 +1,221 @@
+# member_import.py
+import argparse
+import csv
+import json
+import logging
+import math
+import os
+import secrets
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash
+
+from database_manager import CommunityPoolManager
+from member_search import normalize_email, normalize_phone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MONTHLY_AMOUNT = 50.00
+
+class ImportRow:
+    """One member from an enrollment file, with its line number for reporting"""
+
+    def __init__(self, line, username, phone, email, password=None, monthly_amount=None):
+        self.line = line
+        self.username = (username or '').strip()
+        self.phone = (phone or '').strip()
+        self.email = (email or '').strip()
+        self.password = password or None
+        self.generated_password = False
+        self.monthly_amount = monthly_amount
+        self.password_hash = None
+
+def read_rows(path, fmt=None):
+    """Yield ImportRows from a CSV (with a header) or JSONL enrollment file"""
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if fmt == 'jsonl':
+            records = ((line, json.loads(text)) for line, text in enumerate(f, start=1) if text.strip())
+        else:
+            records = enumerate(csv.DictReader(f), start=2)
+        for line, record in records:
+            yield ImportRow(line,
+                            record.get('username') or record.get('name'),
+                            record.get('phone'),
+                            record.get('email'),
+                            record.get('password'),
+                            record.get('monthly_amount'))
+
+class MemberImporter:
+    """Bulk enrollment: validate, hash passwords in parallel, insert in batched transactions.
+
+    Password hashing dominates the cost of creating a member, so it runs on
+    a process pool before any write lock is taken. Each batch is then
+    inserted in one transaction; a row whose username, phone or email is
+    already taken is reported and skipped without failing its batch.
+    """
+
+    def __init__(self, manager, workers=None, batch_size=500):
+        self.manager = manager
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+
+    def _validate(self, row, seen):
+        if not all([row.username, row.phone, row.email]):
+            return 'username, phone and email are required'
+        if not row.phone.replace(' ', '').replace('-', '').replace('+', '').isdigit():
+            return 'invalid phone number'
+        if '@' not in row.email:
+            return 'invalid email address'
+        # Only a missing or blank amount takes the default; 0 and "nan" are errors
+        if row.monthly_amount is None or str(row.monthly_amount).strip() == '':
+            row.monthly_amount = DEFAULT_MONTHLY_AMOUNT
+        else:
+            try:
+                row.monthly_amount = float(row.monthly_amount)
+            except (TypeError, ValueError):
+                return 'invalid monthly amount'
+            if not math.isfinite(row.monthly_amount) or row.monthly_amount <= 0:
+                return 'invalid monthly amount'
+
+        # Duplicates inside the file itself
+        keys = (('username', row.username),
+                ('phone', normalize_phone(row.phone)),
+                ('email', normalize_email(row.email)))
+        for key in keys:
+            if key in seen:
+                return f"duplicate {key[0]} (line {seen[key]})"
+        for key in keys:
+            seen[key] = row.line
+        return None
+
+    def _hash_passwords(self, rows):
+        for row in rows:
+            if not row.password:
+                row.password = secrets.token_urlsafe(9)
+                row.generated_password = True
+        chunksize = max(1, len(rows) // (self.workers * 4))
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            hashes = executor.map(generate_password_hash, [row.password for row in rows], chunksize=chunksize)
+            for row, password_hash in zip(rows, hashes):
+                row.password_hash = password_hash
+
+    def _insert_batch(self, conn, rows, failures):
+        cursor = conn.cursor()
+        created = 0
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for row in rows:
+                conflict = self.manager._registration_conflict(cursor, row.username, row.phone, row.email)
+                if conflict:
+                    failures.append((row, f"{conflict} already registered"))
+                    continue
+
+                cursor.execute("SAVEPOINT import_row")
+                try:
+                    cursor.execute('''
+                        INSERT INTO members (name, phone, email, monthly_amount, phone_e164, email_lower)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', (row.username, row.phone, row.email, row.monthly_amount,
+                          normalize_phone(row.phone), normalize_email(row.email)))
+                    member_id = cursor.lastrowid
+                    cursor.execute('''
+                        INSERT INTO users (username, password_hash, user_type, member_id)
+                        VALUES (?, ?, 'member', ?)
+                    ''', (row.username, row.password_hash, member_id))
+                    self.manager._append_outbox(cursor, 'member.registered', 'member', member_id, {
+                        'member_id': member_id, 'user_id': cursor.lastrowid, 'username': row.username,
+                        'user_type': 'member', 'phone': normalize_phone(row.phone),
+                        'email': normalize_email(row.email),
+                        'monthly_amount_cents': round(row.monthly_amount * 100),
+                    })
+                    cursor.execute("RELEASE import_row")
+                    created += 1
+                except sqlite3.IntegrityError as e:
+                    cursor.execute("ROLLBACK TO import_row")
+                    cursor.execute("RELEASE import_row")
+                    failures.append((row, str(e)))
+            conn.commit()
+            return created
+        except Exception:
+            conn.rollback()
+            raise
+
+    def run(self, rows):
+        """Import rows; returns {'created': n, 'failed': [(row, reason), ...], 'rows': [...]}"""
+        rows = list(rows)
+        failures = []
+        seen = {}
+        valid = []
+        for row in rows:
+            error = self._validate(row, seen)
+            if error:
+                failures.append((row, error))
+            else:
+                valid.append(row)
+
+        created = 0
+        conn = self.manager._connect()
+        conn.isolation_level = None
+        try:
+            # Skip hashing rows that already clash with registered members;
+            # the insert transaction checks again in case of concurrent sign-ups
+            cursor = conn.cursor()
+            pending = []
+            for row in valid:
+                conflict = self.manager._registration_conflict(cursor, row.username, row.phone, row.email)
+                if conflict:
+                    failures.append((row, f"{conflict} already registered"))
+                else:
+                    pending.append(row)
+            valid = pending
+
+            if valid:
+                logger.info(f"Hashing {len(valid)} passwords on {self.workers} processes")
+                self._hash_passwords(valid)
+
+            for start in range(0, len(valid), self.batch_size):
+                created += self._insert_batch(conn, valid[start:start + self.batch_size], failures)
+        finally:
+            conn.close()
+
+        failures.sort(key=lambda failure: failure[0].line)
+        logger.info(f"Imported {created} members, {len(failures)} rows failed")
+        return {'created': created, 'failed': failures, 'rows': rows}
+
+def write_report(path, result):
+    """Per-row outcome, including passwords generated for rows that had none"""
+    failed = {id(row): reason for row, reason in result['failed']}
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['line', 'username', 'status', 'reason', 'initial_password'])
+        for row in result['rows']:
+            reason = failed.get(id(row))
+            writer.writerow([row.line, row.username,
+                             'failed' if reason else 'created',
+                             reason or '',
+                             row.password if row.generated_password and not reason else ''])
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Enroll members in bulk from a CSV or JSONL file")
+    parser.add_argument('path', help='file with username, phone, email[, password, monthly_amount]')
+    parser.add_argument('--db', default='health_pool.db', help='database file')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='defaults to the file extension')
+    parser.add_argument('--workers', type=int, help='password hashing processes (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--report', help='write a per-row CSV report here')
+    args = parser.parse_args()
+
+    importer = MemberImporter(CommunityPoolManager(args.db), workers=args.workers, batch_size=args.batch_size)
+    result = importer.run(read_rows(args.path, args.format))
+    for row, reason in result['failed']:
+        logger.warning(f"Line {row.line} ({row.username or 'no username'}): {reason}")
+    if args.report:
+        write_report(args.report, result)
+        logger.info(f"Wrote report to {args.report}")
+    return 0 if not result['failed'] else 2
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,84 @@
+# member_search.py
+import re
+
+DEFAULT_COUNTRY_CODE = '27'
+
+# Trigram search needs at least three characters to match anything
+MIN_TRIGRAM_LENGTH = 3
+
+def normalize_phone(phone, country_code=DEFAULT_COUNTRY_CODE):
+    """E.164 form of a phone number ('082 123-4567' -> '+27821234567'); None if it has no digits"""
+    if not phone:
+        return None
+    phone = phone.strip()
+    digits = re.sub(r'\D', '', phone)
+    if not digits:
+        return None
+    if phone.startswith('+'):
+        return '+' + digits
+    if digits.startswith('00'):
+        return '+' + digits[2:]
+    if digits.startswith('0'):
+        return '+' + country_code + digits[1:]
+    return '+' + digits
+
+def normalize_email(email):
+    return email.strip().lower() if email else None
+
+def looks_like_phone(query):
+    return bool(re.fullmatch(r'[\d\s\-+()]+', query)) and any(ch.isdigit() for ch in query)
+
+def glob_prefix(prefix):
+    """GLOB pattern matching values that start with prefix; uses the column's index"""
+    escaped = re.sub(r'([*?\[])', r'[\1]', prefix)
+    return escaped + '*'
+
+def fts_phrase(text):
+    """Quote text as a single FTS5 phrase"""
+    return '"' + text.replace('"', '""') + '"'
+
+class MemberSearchPlan:
+    """Turns an admin's search box input into index lookups.
+
+    Phone-like input is normalized the same way stored numbers are, so
+    '082 123' finds '+27821234567'. Prefix matches on the normalized phone
+    and email columns go through their B-tree indexes; anything else
+    (substrings of names, emails or numbers) goes through the trigram index.
+    """
+
+    def __init__(self, query):
+        self.query = ' '.join((query or '').split())
+        self.phone_prefix = None
+        if looks_like_phone(self.query):
+            compact = re.sub(r'[^\d+]', '', self.query)
+            self.phone_prefix = normalize_phone(compact) if compact.startswith(('0', '+')) else None
+            self.phone_digits = re.sub(r'\D', '', self.query)
+        else:
+            self.phone_digits = None
+        self.email_prefix = normalize_email(self.query) if not self.phone_digits else None
+
+    @property
+    def is_empty(self):
+        return not self.query
+
+    def prefix_lookups(self):
+        """(column, glob pattern) pairs answered from B-tree indexes"""
+        lookups = []
+        if self.phone_prefix:
+            lookups.append(('phone_e164', glob_prefix(self.phone_prefix)))
+        elif self.phone_digits:
+            lookups.append(('phone_e164', glob_prefix('+' + self.phone_digits)))
+        if self.email_prefix:
+            lookups.append(('email_lower', glob_prefix(self.email_prefix)))
+        return lookups
+
+    def trigram_match(self):
+        """FTS5 MATCH expression for the trigram index, or None when the input is too short"""
+        if self.phone_digits:
+            term = self.phone_digits[1:] if self.phone_digits.startswith('0') else self.phone_digits
+            if len(term) >= MIN_TRIGRAM_LENGTH:
+                return f"phone_e164 : {fts_phrase(term)}"
+            return None
+        if len(self.query) >= MIN_TRIGRAM_LENGTH:
+            return fts_phrase(self.query)
+        return None
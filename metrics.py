@@ -0,0 +1,202 @@
+# metrics.py
+import bisect
+import os
+import sqlite3
+import threading
+import time
+
+# Upper bounds in seconds, Prometheus-style; the last bucket is +Inf
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# How long a statement may wait for a SQLite lock once it has found one held
+LOCK_WAIT_TIMEOUT_MS = 30000
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+class Histogram:
+    """Cumulative-bucket latency histogram; observe() is a bisect and three additions"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {self.sum:.6f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {self.count}")
+        return lines
+
+class MetricsRegistry:
+    """Process-wide counters, histograms and gauges, rendered in Prometheus text format.
+
+    Series are keyed by a metric name and a tuple of (label, value) pairs.
+    A single lock guards updates; each update is a few dictionary and list
+    operations, so it is cheap next to the request being measured.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = []
+        self.started_at = time.time()
+
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=()):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def gauge(self, name, help_text, callback):
+        """Register a gauge read at scrape time; callback returns a number or {labels: number}"""
+        self.describe(name, 'gauge', help_text)
+        self._gauges.append((name, callback))
+
+    def render(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            histograms = [(key, Histogram.render(histogram, *key)) for key, histogram in histograms]
+
+        lines = []
+        described = set()
+
+        def header(name):
+            if name not in described and name in self._help:
+                kind, help_text = self._help[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                described.add(name)
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, _), rendered in histograms:
+            header(name)
+            lines.extend(rendered)
+        for name, callback in self._gauges:
+            try:
+                value = callback()
+            except Exception:
+                continue
+            header(name)
+            if isinstance(value, dict):
+                for labels, labelled_value in sorted(value.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {labelled_value}")
+            else:
+                lines.append(f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+metrics.describe('http_requests_total', 'counter', 'Requests by endpoint, method and status code')
+metrics.describe('http_request_duration_seconds', 'histogram', 'Request latency by endpoint')
+metrics.describe('http_errors_total', 'counter', 'Responses produced by the error handlers, by status code')
+metrics.describe('sqlite_lock_waits_total', 'counter', 'Statements that found the database locked and had to wait')
+metrics.describe('sqlite_lock_timeouts_total', 'counter', 'Statements that gave up waiting for a database lock')
+metrics.describe('sqlite_lock_wait_seconds', 'histogram', 'Time spent waiting for database locks')
+
+# ----------------------------------------------------------------------
+# SQLite lock-wait accounting
+# ----------------------------------------------------------------------
+
+def _is_lock_error(error):
+    message = str(error)
+    return 'locked' in message or 'busy' in message
+
+class MeteredCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        return self.connection._wait_for_lock(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not isinstance(seq_of_parameters, (list, tuple)):
+            seq_of_parameters = list(seq_of_parameters)
+        return self.connection._wait_for_lock(super().executemany, sql, seq_of_parameters)
+
+class MeteredConnection(sqlite3.Connection):
+    """Connection that counts and times lock waits.
+
+    Connect it with timeout=0: every statement first runs without a busy
+    timeout, which costs nothing when the database is free. Only when SQLite
+    reports the lock held does the statement retry with the normal timeout,
+    and that wait is recorded. A statement that failed with SQLITE_BUSY had
+    no effect, so running it again is safe.
+    """
+
+    def cursor(self, factory=MeteredCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        return self._wait_for_lock(super().commit)
+
+    def _wait_for_lock(self, operation, *args):
+        try:
+            return operation(*args)
+        except sqlite3.OperationalError as e:
+            if not _is_lock_error(e):
+                raise
+
+        metrics.inc('sqlite_lock_waits_total')
+        started = time.perf_counter()
+        sqlite3.Connection.execute(self, f"PRAGMA busy_timeout = {LOCK_WAIT_TIMEOUT_MS}")
+        try:
+            return operation(*args)
+        except sqlite3.OperationalError as e:
+            if _is_lock_error(e):
+                metrics.inc('sqlite_lock_timeouts_total')
+            raise
+        finally:
+            metrics.observe('sqlite_lock_wait_seconds', time.perf_counter() - started)
+            sqlite3.Connection.execute(self, "PRAGMA busy_timeout = 0")
+
+# ----------------------------------------------------------------------
+# Process gauges
+# ----------------------------------------------------------------------
+
+def _resident_memory_bytes():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+def _open_fds():
+    return len(os.listdir('/proc/self/fd'))
+
+metrics.gauge('process_uptime_seconds', 'Seconds since this process imported the app',
+              lambda: round(time.time() - metrics.started_at, 3))
+metrics.gauge('process_cpu_seconds_total', 'CPU time used by this process', lambda: round(time.process_time(), 3))
+metrics.gauge('process_resident_memory_bytes', 'Resident set size', _resident_memory_bytes)
+metrics.gauge('process_open_fds', 'Open file descriptors', _open_fds)
+metrics.gauge('process_threads', 'Live Python threads', threading.active_count)
@@ -0,0 +1,183 @@
+# outbox.py
+"""Change-data-capture consumers for the outbox_events table.
+
+    python outbox.py read finance --limit 500 --ack   # print the next events as JSONL, then acknowledge them
+    python outbox.py status                          # each consumer's position and lag
+    python outbox.py compact                         # drop events every consumer has acknowledged
+
+CommunityPoolManager appends an event to outbox_events inside the same
+transaction as each write (member.registered, member.phone_changed,
+contribution.recorded, claim.submitted, claim.status_changed), so an event
+exists exactly when its change committed. Consumers keep a cursor (the last
+acknowledged event id) in outbox_consumers and read forward from it through
+the primary key, so each poll costs the number of new events, not the size
+of the contributions or claims tables.
+
+Delivery is at-least-once: a consumer that crashes between handling a batch
+and acknowledging it sees that batch again, so handlers should be idempotent
+(event ids are unique and increasing). A consumer registered after events
+were compacted starts from the oldest event still held; take a snapshot with
+export_service first when it needs the full history.
+"""
+import argparse
+import json
+import logging
+from collections import namedtuple
+
+from database_manager import CommunityPoolManager
+
+logger = logging.getLogger(__name__)
+
+# Unacknowledged events older than this are dropped anyway, so a consumer
+# that has been abandoned cannot make the table grow without bound
+RETENTION_DAYS = 30
+COMPACT_BATCH_SIZE = 5000
+
+OutboxEvent = namedtuple('OutboxEvent', ['id', 'event_type', 'entity', 'entity_id', 'payload', 'created_at'])
+
+class OutboxConsumer:
+    """A named, durable cursor over the outbox"""
+
+    def __init__(self, manager, name, start='earliest'):
+        if start not in ('earliest', 'latest'):
+            raise ValueError("start must be 'earliest' or 'latest'")
+        self.manager = manager
+        self.name = name
+        self._register(start)
+
+    def _register(self, start):
+        conn = self.manager._connect()
+        try:
+            first = '(SELECT COALESCE(MAX(id), 0) FROM outbox_events)' if start == 'latest' else '0'
+            conn.execute(f'''
+                INSERT OR IGNORE INTO outbox_consumers (name, last_event_id)
+                VALUES (?, {first})
+            ''', (self.name,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def fetch(self, limit=100):
+        """The next unacknowledged events, oldest first"""
+        conn = self.manager._connect()
+        try:
+            rows = conn.execute('''
+                SELECT id, event_type, entity, entity_id, payload, created_at
+                FROM outbox_events
+                WHERE id > (SELECT last_event_id FROM outbox_consumers WHERE name = ?)
+                ORDER BY id
+                LIMIT ?
+            ''', (self.name, limit)).fetchall()
+        finally:
+            conn.close()
+        return [OutboxEvent(event_id, event_type, entity, entity_id, json.loads(payload), created_at)
+                for event_id, event_type, entity, entity_id, payload, created_at in rows]
+
+    def ack(self, event_id):
+        """Mark everything up to and including event_id as handled; the cursor never moves back"""
+        conn = self.manager._connect()
+        try:
+            conn.execute('''
+                UPDATE outbox_consumers
+                SET last_event_id = MAX(last_event_id, ?), acked_at = CURRENT_TIMESTAMP
+                WHERE name = ?
+            ''', (event_id, self.name))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def consume(self, handler, limit=100):
+        """Pass the next batch to handler(events) and acknowledge it if handler returns; returns the batch size"""
+        events = self.fetch(limit)
+        if events:
+            handler(events)
+            self.ack(events[-1].id)
+        return len(events)
+
+    def position(self):
+        conn = self.manager._connect()
+        try:
+            row = conn.execute('SELECT last_event_id FROM outbox_consumers WHERE name = ?', (self.name,)).fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+
+def consumer_status(manager):
+    """(name, last_event_id, lag, acked_at) per consumer"""
+    conn = manager._connect()
+    try:
+        return conn.execute('''
+            SELECT c.name, c.last_event_id,
+                   (SELECT COUNT(*) FROM outbox_events e WHERE e.id > c.last_event_id) AS lag,
+                   c.acked_at
+            FROM outbox_consumers c
+            ORDER BY c.name
+        ''').fetchall()
+    finally:
+        conn.close()
+
+def compact(manager, retention_days=RETENTION_DAYS, batch_size=COMPACT_BATCH_SIZE):
+    """Delete events every consumer has acknowledged, and any past retention; returns rows deleted.
+
+    Deletes run in short batches so writers are never held up for long.
+    With no registered consumers only the retention limit applies.
+    """
+    conn = manager._connect()
+    deleted = 0
+    try:
+        acked = conn.execute('SELECT MIN(last_event_id) FROM outbox_consumers').fetchone()[0] or 0
+        while True:
+            cursor = conn.execute('''
+                DELETE FROM outbox_events
+                WHERE id IN (
+                    SELECT id FROM outbox_events
+                    WHERE id <= ? OR created_at < datetime('now', ?)
+                    ORDER BY id
+                    LIMIT ?
+                )
+            ''', (acked, f'-{int(retention_days)} days', batch_size))
+            conn.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                break
+    finally:
+        conn.close()
+    if deleted:
+        logger.info(f"Compacted {deleted} outbox events")
+    return deleted
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Read and manage the change-data-capture outbox")
+    parser.add_argument('--db', default='health_pool.db', help='database file')
+    commands = parser.add_subparsers(dest='command', required=True)
+    read = commands.add_parser('read', help='print the next events for a consumer as JSONL')
+    read.add_argument('consumer')
+    read.add_argument('--limit', type=int, default=100)
+    read.add_argument('--ack', action='store_true', help='acknowledge the events printed')
+    read.add_argument('--start', choices=['earliest', 'latest'], default='earliest',
+                      help='where a new consumer begins')
+    commands.add_parser('status', help="show each consumer's position and lag")
+    compact_parser = commands.add_parser('compact', help='delete acknowledged events')
+    compact_parser.add_argument('--retention-days', type=int, default=RETENTION_DAYS)
+    args = parser.parse_args()
+
+    manager = CommunityPoolManager(args.db)
+    if args.command == 'read':
+        consumer = OutboxConsumer(manager, args.consumer, start=args.start)
+        events = consumer.fetch(args.limit)
+        for event in events:
+            print(json.dumps(event._asdict(), separators=(',', ':')))
+        if args.ack and events:
+            consumer.ack(events[-1].id)
+            logger.info(f"{args.consumer} acknowledged up to event {events[-1].id}")
+    elif args.command == 'status':
+        print(f"{'consumer':<20}{'position':>10}{'lag':>8}  acknowledged")
+        for name, position, lag, acked_at in consumer_status(manager):
+            print(f"{name:<20}{position:>10}{lag:>8}  {acked_at or '-'}")
+    else:
+        print(f"Deleted {compact(manager, args.retention_days)} events")
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,271 @@
+# payout_engine.py
+import argparse
+import csv
+import logging
+import os
+import uuid
+from datetime import datetime
+
+from database_manager import CommunityPoolManager
+
+logger = logging.getLogger(__name__)
+
+UNASSIGNED_PROVIDER = 'Unassigned'
+
+class StubPaymentProvider:
+    """Local stand-in for the payment provider.
+
+    Writes each batch to a CSV payment file and accepts every line, returning
+    a provider reference per payout like a real bulk-payment API would. The
+    payment files double as its record of what it received, which lookup()
+    answers from.
+    """
+
+    def __init__(self, output_dir='payout_batches'):
+        self.output_dir = output_dir
+
+    def _path(self, batch_id, provider):
+        safe_provider = ''.join(ch if ch.isalnum() else '_' for ch in provider)[:50]
+        return os.path.join(self.output_dir, f"{batch_id}_{safe_provider}.csv")
+
+    def submit_batch(self, batch_id, provider, lines):
+        """lines are (payment_reference, claim_id, amount); returns {payment_reference: (status, provider_reference)}"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        results = {
+            payment_reference: ('paid', f"STUB-{uuid.uuid4().hex[:12].upper()}")
+            for payment_reference, _, _ in lines
+        }
+        path = self._path(batch_id, provider)
+        with open(path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if f.tell() == 0:
+                writer.writerow(['payment_reference', 'claim_id', 'provider', 'amount', 'provider_reference'])
+            for payment_reference, claim_id, amount in lines:
+                writer.writerow([payment_reference, claim_id, provider, f"{float(amount):.2f}",
+                                 results[payment_reference][1]])
+        logger.info(f"Wrote payment file {path} with {len(lines)} lines")
+        return results
+
+    def lookup(self, batch_id, provider, references):
+        """Outcome of earlier submissions as {payment_reference: (status, provider_reference)}; unknown references are omitted"""
+        path = self._path(batch_id, provider)
+        if not os.path.exists(path):
+            return {}
+        wanted = set(references)
+        with open(path, newline='', encoding='utf-8') as f:
+            return {
+                row['payment_reference']: ('paid', row['provider_reference'])
+                for row in csv.DictReader(f) if row['payment_reference'] in wanted
+            }
+
+class PayoutEngine:
+    """Turns approved claims into payouts, batched per provider (hospital).
+
+    Payout rows move pending -> submitted -> paid | failed. Paid payouts move
+    their claim from approved to paid; failed ones leave the claim approved so
+    the next run picks it up again.
+
+    Only the run that moves a row from pending to submitted sends it, so
+    overlapping runs never pay a claim twice. Rows older than stale_after
+    seconds are treated as left behind by a crashed run: pending ones are
+    submitted again, and submitted ones are reconciled against the
+    provider's own record instead of being resent.
+    """
+
+    def __init__(self, manager, provider=None, batch_size=1000, stale_after=900):
+        self.manager = manager
+        self.provider = provider or StubPaymentProvider()
+        self.batch_size = batch_size
+        self.stale_after = stale_after
+
+    def _reserve_batch(self, conn, batch_id):
+        """Create pending payout rows for the next approved, unpaid claims in one transaction"""
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute('''
+                SELECT c.id, c.amount, COALESCE(NULLIF(TRIM(c.hospital), ''), ?)
+                FROM claims c
+                WHERE c.status = 'approved'
+                  AND NOT EXISTS (
+                      SELECT 1 FROM payouts p
+                      WHERE p.claim_id = c.id AND p.status != 'failed'
+                  )
+                ORDER BY c.id
+                LIMIT ?
+            ''', (UNASSIGNED_PROVIDER, self.batch_size))
+            claims = cursor.fetchall()
+
+            rows = [
+                (claim_id, amount, f"PO-{batch_id}-{claim_id}", batch_id, provider)
+                for claim_id, amount, provider in claims
+            ]
+            cursor.executemany('''
+                INSERT INTO payouts (claim_id, amount, payment_reference, status, batch_id, provider)
+                VALUES (?, ?, ?, 'pending', ?, ?)
+            ''', rows)
+            conn.commit()
+            return rows
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _stale_payouts(self, conn, status, since_column):
+        """Payouts stuck in status for longer than stale_after, left by an interrupted run"""
+        return conn.execute(f'''
+            SELECT claim_id, amount, payment_reference, batch_id, provider
+            FROM payouts
+            WHERE status = ? AND {since_column} <= datetime('now', ?)
+            ORDER BY id
+        ''', (status, f"-{int(self.stale_after)} seconds")).fetchall()
+
+    def _claim_for_submission(self, conn, lines):
+        """Move lines from pending to submitted; returns the ones this run moved and so must send"""
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            claimed = []
+            for line in lines:
+                cursor.execute('''
+                    UPDATE payouts SET status = 'submitted', submitted_at = CURRENT_TIMESTAMP
+                    WHERE payment_reference = ? AND status = 'pending'
+                ''', (line[0],))
+                if cursor.rowcount == 1:
+                    claimed.append(line)
+            conn.commit()
+            return claimed
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _record_results(self, conn, provider, lines, results):
+        """Settle submitted lines from the provider's results; lines missing from results fail"""
+        cursor = conn.cursor()
+        paid_claims = []
+        summary = {'paid': 0, 'failed': 0}
+        for payment_reference, claim_id, _ in lines:
+            status, provider_ref = results.get(payment_reference, ('failed', None))
+            if status == 'paid':
+                cursor.execute('''
+                    UPDATE payouts SET status = 'paid', provider_reference = ?, paid_at = CURRENT_TIMESTAMP
+                    WHERE payment_reference = ? AND status = 'submitted'
+                ''', (provider_ref, payment_reference))
+            else:
+                cursor.execute('''
+                    UPDATE payouts SET status = 'failed', failure_reason = ?
+                    WHERE payment_reference = ? AND status = 'submitted'
+                ''', ('Rejected by provider' if payment_reference in results else 'Not received by provider',
+                      payment_reference))
+            if cursor.rowcount == 0:
+                continue  # settled by an overlapping run
+            if status != 'paid':
+                summary['failed'] += 1
+                continue
+            summary['paid'] += 1
+            result = self.manager._transition_claim(cursor, claim_id, 'paid',
+                                                    notes=f"Paid via {provider} ({provider_ref})",
+                                                    payment_reference=payment_reference,
+                                                    provider_reference=provider_ref)
+            if result.outcome == 'ok':
+                paid_claims.append(claim_id)
+            else:
+                logger.warning(f"Claim {claim_id} paid by {payment_reference} but is {result.status}")
+        conn.commit()
+        for claim_id in paid_claims:
+            self.manager._publish_claim_event(conn.cursor(), 'claim_status', claim_id, 'paid')
+        return summary
+
+    def _by_batch(self, rows):
+        by_batch = {}
+        for claim_id, amount, payment_reference, batch_id, provider in rows:
+            by_batch.setdefault((batch_id, provider), []).append((payment_reference, claim_id, amount))
+        return by_batch
+
+    def _submit(self, conn, rows):
+        """Send rows to the provider grouped by provider and record the outcome"""
+        summary = {'paid': 0, 'failed': 0}
+        for (batch_id, provider), lines in self._by_batch(rows).items():
+            lines = self._claim_for_submission(conn, lines)
+            if not lines:
+                continue
+
+            try:
+                results = self.provider.submit_batch(batch_id, provider, lines)
+            except Exception as e:
+                logger.error(f"Provider rejected batch {batch_id} for {provider}: {e}")
+                results = {reference: ('failed', None) for reference, _, _ in lines}
+
+            outcome = self._record_results(conn, provider, lines, results)
+            for key, value in outcome.items():
+                summary[key] += value
+            logger.info(f"Batch {batch_id} for {provider}: {outcome['paid']} paid, {outcome['failed']} failed")
+        return summary
+
+    def _reconcile(self, conn, rows):
+        """Settle submitted rows whose outcome was never recorded from the provider's record of them"""
+        summary = {'paid': 0, 'failed': 0}
+        for (batch_id, provider), lines in self._by_batch(rows).items():
+            try:
+                results = self.provider.lookup(batch_id, provider, [line[0] for line in lines])
+            except Exception as e:
+                logger.error(f"Could not look up batch {batch_id} for {provider}, leaving it submitted: {e}")
+                continue
+            outcome = self._record_results(conn, provider, lines, results)
+            for key, value in outcome.items():
+                summary[key] += value
+            logger.info(f"Reconciled batch {batch_id} for {provider}: "
+                        f"{outcome['paid']} paid, {outcome['failed']} failed")
+        return summary
+
+    def run(self, max_batches=None):
+        """Pay out every approved claim; returns {'paid': n, 'failed': n, 'batches': n}"""
+        summary = {'paid': 0, 'failed': 0, 'batches': 0}
+        try:
+            conn = self.manager._connect()
+
+            unsettled = self._stale_payouts(conn, 'submitted', 'submitted_at')
+            if unsettled:
+                logger.warning(f"Reconciling {len(unsettled)} submitted payouts from an earlier run")
+                for key, value in self._reconcile(conn, unsettled).items():
+                    summary[key] += value
+
+            leftover = self._stale_payouts(conn, 'pending', 'created_at')
+            if leftover:
+                logger.warning(f"Resubmitting {len(leftover)} pending payouts from an earlier run")
+                for key, value in self._submit(conn, leftover).items():
+                    summary[key] += value
+
+            while max_batches is None or summary['batches'] < max_batches:
+                batch_id = datetime.now().strftime('%Y%m%d%H%M%S') + '-' + uuid.uuid4().hex[:6]
+                rows = self._reserve_batch(conn, batch_id)
+                if not rows:
+                    break
+                summary['batches'] += 1
+                for key, value in self._submit(conn, rows).items():
+                    summary[key] += value
+
+            conn.close()
+            logger.info(f"Payout run complete: {summary}")
+            return summary
+        except Exception as e:
+            logger.error(f"Payout run error: {e}")
+            return None
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Pay out approved claims")
+    parser.add_argument('--db', default='health_pool.db', help='database file')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--output-dir', default='payout_batches', help='where payment files are written')
+    parser.add_argument('--stale-after', type=int, default=900,
+                        help='seconds before pending or submitted payouts count as left by a crashed run')
+    args = parser.parse_args()
+
+    engine = PayoutEngine(CommunityPoolManager(args.db),
+                          provider=StubPaymentProvider(args.output_dir),
+                          batch_size=args.batch_size,
+                          stale_after=args.stale_after)
+    return 0 if engine.run() is not None else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+# pool_registry.py
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database_manager import CommunityPoolManager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_ID = 'default'
+
+def load_pool_config(config_path=None):
+    """Read the pool -> database mapping.
+
+    HEALTH_POOL_POOLS may point at a JSON file shaped like
+    {"soweto": {"name": "Soweto Pool", "db_path": "pools/soweto.db"}}.
+    Without it a single default pool backed by HEALTH_POOL_DB (or
+    health_pool.db) is used, which matches the single-database setup.
+    """
+    config_path = config_path or os.getenv('HEALTH_POOL_POOLS')
+    if config_path:
+        with open(config_path, encoding='utf-8') as f:
+            pools = json.load(f)
+    else:
+        pools = {
+            DEFAULT_POOL_ID: {
+                'name': 'Community Health Pool',
+                'db_path': os.getenv('HEALTH_POOL_DB', 'health_pool.db'),
+            }
+        }
+
+    for pool_id, pool in pools.items():
+        pool.setdefault('name', pool_id)
+        pool.setdefault('db_path', os.path.join('pools', f'{pool_id}.db'))
+    return pools
+
+class PoolRegistry:
+    """Routes each community pool to its own CommunityPoolManager and SQLite file"""
+
+    def __init__(self, pools=None, default_pool=None):
+        self.pools = pools if pools is not None else load_pool_config()
+        self.default_pool = default_pool or next(iter(self.pools))
+        self._managers = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, min(len(self.pools), 16)),
+            thread_name_prefix='pool-fanout'
+        )
+
+    def __contains__(self, pool_id):
+        return pool_id in self.pools
+
+    def pool_ids(self):
+        return list(self.pools)
+
+    def pool_name(self, pool_id):
+        return self.pools.get(pool_id, {}).get('name', pool_id)
+
+    def get(self, pool_id=None):
+        """Return the cached manager for a pool, creating it on first use"""
+        pool_id = pool_id or self.default_pool
+        manager = self._managers.get(pool_id)
+        if manager is not None:
+            return manager
+
+        if pool_id not in self.pools:
+            raise KeyError(f"Unknown pool: {pool_id}")
+
+        with self._lock:
+            manager = self._managers.get(pool_id)
+            if manager is None:
+                db_path = self.pools[pool_id]['db_path']
+                directory = os.path.dirname(db_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                manager = CommunityPoolManager(db_path)
+                self._managers[pool_id] = manager
+                logger.info(f"Opened pool {pool_id} at {db_path}")
+        return manager
+
+    def fan_out(self, method_name, *args, **kwargs):
+        """Call a manager method on every pool in parallel; returns {pool_id: result}"""
+        futures = {
+            pool_id: self._executor.submit(
+                lambda pool_id=pool_id: getattr(self.get(pool_id), method_name)(*args, **kwargs)
+            )
+            for pool_id in self.pools
+        }
+        results = {}
+        for pool_id, future in futures.items():
+            try:
+                results[pool_id] = future.result()
+            except Exception as e:
+                logger.error(f"Error running {method_name} on pool {pool_id}: {e}")
+                results[pool_id] = None
+        return results
+
+    def aggregate_stats(self):
+        """Per-pool stats plus summed totals across every pool"""
+        per_pool = self.fan_out('get_pool_stats')
+        totals = {}
+        for stats in per_pool.values():
+            for key, value in (stats or {}).items():
+                totals[key] = totals.get(key, 0) + value
+        return per_pool, totals
@@ -0,0 +1,398 @@
+# query_plans.py
+"""Query plan and latency regression check for CommunityPoolManager.
+
+    python query_plans.py check              # compare with query_plans.json; exit 1 on a regression
+    python query_plans.py record             # rewrite the baseline after an intended change
+    python query_plans.py check --scale 5    # larger synthetic pool
+
+Builds a synthetic pool (20,000 members, 240,000 contributions and 20,000
+claims per unit of --scale) in a scratch database, then runs a scenario that
+calls the manager's read and write methods. A trace callback on every
+connection the manager opens records each statement against the method that
+issued it; literals are folded to ? so the same query with different values
+is one statement. Each statement's EXPLAIN QUERY PLAN is compared with the
+committed baseline:
+
+  - a statement that now fully scans a table (SCAN, with or without an
+    index) it did not scan in the baseline fails the check
+  - a statement that no longer compiles (e.g. "no such column"), or any
+    error the manager logs during the scenario, fails
+  - other plan changes, and new or vanished statements, are reported only
+
+Each scenario call is timed (median of --repeat runs after a warm-up) and
+fails when it exceeds its budget_ms in the baseline. record sets budgets for
+new calls to five times the measured median, at least 20 ms, and keeps
+existing budgets so hand-tuned values survive; --reset-budgets recomputes
+them all.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from werkzeug.security import generate_password_hash
+
+from database_manager import CommunityPoolManager
+from member_search import normalize_email, normalize_phone
+
+logger = logging.getLogger(__name__)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_plans.json')
+MEMBERS_PER_SCALE = 20000
+CONTRIBUTIONS_PER_MEMBER = 12
+CLAIMS_PER_MEMBER = 1
+MIN_BUDGET_MS = 20.0
+BUDGET_FACTOR = 5
+SCENARIO_PASSWORD = 'plan-check-password'
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_TABLE_SCAN = re.compile(r"^SCAN ([\w.]+)")
+
+def normalize_sql(sql):
+    """Fold literals and IN-lists to placeholders and collapse whitespace"""
+    sql = _LITERAL.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('?, ...', sql)
+    return ' '.join(sql.split())
+
+def scanned_tables(plan):
+    """Tables or aliases the plan reads in full.
+
+    Constant rows, FTS5 index lookups and the FTS5 module's own one-row
+    config reads (traced as main.<table>_config) are not scans of data.
+    """
+    scans = set()
+    for detail in plan:
+        match = _TABLE_SCAN.match(detail)
+        if match and match.group(1) != 'CONSTANT' and 'VIRTUAL TABLE' not in detail \
+                and not match.group(1).endswith('_config'):
+            scans.add(match.group(1))
+    return scans
+
+# ----------------------------------------------------------------------
+# Synthetic data
+# ----------------------------------------------------------------------
+
+def build_dataset(path, scale=1, seed=7):
+    """Create a pool database of the given scale; returns ids the scenario needs"""
+    rng = random.Random(seed)
+    manager = CommunityPoolManager(path)
+    members = int(MEMBERS_PER_SCALE * scale)
+    now = datetime(2026, 6, 30, 12, 0, 0)
+    stamp = lambda days: (now - timedelta(days=days, seconds=rng.randrange(86400))).strftime('%Y-%m-%d %H:%M:%S')
+    password_hash = generate_password_hash(SCENARIO_PASSWORD)
+    first_names = ['Thandi', 'Sipho', 'Lerato', 'Bongani', 'Naledi', 'Kagiso', 'Zanele', 'Pieter', 'Aisha', 'Musa']
+    last_names = ['Nkosi', 'Dlamini', 'Mokoena', 'van der Merwe', 'Naidoo', 'Botha', 'Khumalo', 'Mahlangu']
+
+    conn = manager._connect()
+    try:
+        cursor = conn.cursor()
+        admin_id = cursor.execute("SELECT id FROM users WHERE user_type = 'admin'").fetchone()[0]
+
+        member_rows = []
+        for i in range(1, members + 1):
+            phone = f"08{i * 7919 % 10**8:08d}"  # distinct for any realistic scale
+            email = f"member{i}@example.co.za"
+            member_rows.append((f"{rng.choice(first_names)} {rng.choice(last_names)}", phone, email,
+                                rng.choice((50, 100, 150, 200)), stamp(rng.randrange(730)),
+                                normalize_phone(phone), normalize_email(email)))
+        cursor.executemany('''
+            INSERT INTO members (name, phone, email, monthly_amount, created_at, phone_e164, email_lower)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', member_rows)
+        first_member = cursor.execute('SELECT MIN(id) FROM members WHERE email = ?',
+                                      ('member1@example.co.za',)).fetchone()[0]
+        member_ids = range(first_member, first_member + members)
+        cursor.executemany('''
+            INSERT INTO users (username, password_hash, user_type, member_id) VALUES (?, ?, 'member', ?)
+        ''', ((f"member{member_id - first_member + 1}", password_hash, member_id) for member_id in member_ids))
+
+        cursor.executemany('''
+            INSERT INTO contributions (member_id, amount, payment_reference, status, created_at, paid_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', ((member_id, rng.choice((50, 100, 150, 200)), f"SYN-{member_id}-{n}",
+               'paid' if rng.random() < 0.9 else rng.choice(('pending', 'failed')), created, created)
+              for member_id in member_ids
+              for n, created in enumerate(stamp(30 * month) for month in range(CONTRIBUTIONS_PER_MEMBER))))
+
+        claim_rows = []
+        for member_id in member_ids:
+            for _ in range(CLAIMS_PER_MEMBER):
+                status = rng.choices(('pending', 'approved', 'declined', 'paid'), (2, 1, 1, 6))[0]
+                created = stamp(rng.randrange(365))
+                claim_rows.append((member_id, rng.randrange(500, 20000), 'Clinic visit and medication',
+                                   rng.choice(('General', 'Hospital', 'Medication')), 'Chris Hani Baragwanath',
+                                   rng.choice(('normal', 'medium', 'high')), status,
+                                   None if status == 'pending' else admin_id,
+                                   None if status == 'pending' else created, created))
+        cursor.executemany('''
+            INSERT INTO claims (member_id, amount, description, type, hospital, priority, status,
+                                reviewed_by, reviewed_at, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', claim_rows)
+        cursor.execute('''
+            INSERT INTO payouts (claim_id, amount, payment_reference, status, created_at, paid_at)
+            SELECT id, amount, 'SYN-PAYOUT-' || id, 'paid', reviewed_at, reviewed_at
+            FROM claims WHERE status = 'paid'
+        ''')
+        conn.commit()
+        cursor.execute('ANALYZE')
+        conn.commit()
+        pending = [row[0] for row in cursor.execute(
+            "SELECT id FROM claims WHERE status = 'pending' ORDER BY id LIMIT 200")]
+    finally:
+        conn.close()
+
+    return {'admin_id': admin_id, 'member_ids': list(member_ids), 'pending_claims': pending,
+            'rows': {'members': members, 'contributions': members * CONTRIBUTIONS_PER_MEMBER,
+                     'claims': members * CLAIMS_PER_MEMBER}}
+
+# ----------------------------------------------------------------------
+# Recording
+# ----------------------------------------------------------------------
+
+class StatementRecorder(logging.Handler):
+    """Traces every statement a manager runs, attributed to the innermost manager method.
+
+    Manager methods catch their own exceptions and log them, and a statement
+    that fails to prepare never reaches the trace callback, so the recorder
+    also collects the database_manager logger's errors.
+    """
+
+    def __init__(self, manager):
+        super().__init__(level=logging.ERROR)
+        self.manager = manager
+        self.statements = {}  # (method, normalized sql) -> first expanded sql seen
+        self.errors = []
+        self._local = threading.local()
+        self._instrument()
+
+    def emit(self, record):
+        stack = getattr(self._local, 'stack', None)
+        self.errors.append(f"{stack[-1] if stack else 'unknown'}: {record.getMessage()}")
+
+    def _trace(self, sql):
+        stack = getattr(self._local, 'stack', None)
+        head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+        if not stack or head not in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE'):
+            return
+        self.statements.setdefault((stack[-1], normalize_sql(sql)), sql)
+
+    def _instrument(self):
+        connect = self.manager._connect
+
+        def traced_connect():
+            conn = connect()
+            conn.set_trace_callback(self._trace)
+            return conn
+        self.manager._connect = traced_connect
+
+        for name in dir(CommunityPoolManager):
+            method = getattr(self.manager, name)
+            if name.startswith('__') or name == '_connect' or not callable(method):
+                continue
+            setattr(self.manager, name, self._attributed(name, method))
+
+    def _attributed(self, name, method):
+        @wraps(method)
+        def call(*args, **kwargs):
+            stack = self._local.__dict__.setdefault('stack', [])
+            stack.append(name)
+            try:
+                result = method(*args, **kwargs)
+                # Generators run their queries while being consumed
+                return list(result) if name.startswith('iter_') else result
+            finally:
+                stack.pop()
+        return call
+
+def scenario(manager, data):
+    """(label, call) pairs covering the manager's request-path and maintenance methods"""
+    rng = random.Random(11)
+    admin_id = data['admin_id']
+    pending = iter(data['pending_claims'])
+    counter = iter(range(10**9))
+    member = lambda: rng.choice(data['member_ids'])
+    username = lambda: f"member{rng.randrange(1, data['rows']['members'] + 1)}"
+    return [
+        ('authenticate_user', lambda: manager.authenticate_user(username(), SCENARIO_PASSWORD)),
+        ('registration_conflict', lambda: manager.registration_conflict(username(), '0821234567', 'x@example.com')),
+        ('get_member_by_user_id', lambda: manager.get_member_by_user_id(member() + 1)),
+        ('get_member_by_id', lambda: manager.get_member_by_id(member())),
+        ('get_member_totals', lambda: manager.get_member_totals(member())),
+        ('get_member_contributions', lambda: manager.get_member_contributions(member())),
+        ('get_member_contributions:page', lambda: manager.get_member_contributions(
+            member(), 20, ('2026-01-01 00:00:00', 10**9))),
+        ('get_member_claims', lambda: manager.get_member_claims(member())),
+        ('get_member_claims:page', lambda: manager.get_member_claims(member(), 20, ('2026-01-01 00:00:00', 10**9))),
+        ('get_member_claim', lambda: manager.get_member_claim(member(), rng.randrange(1, 1000))),
+        ('get_contribution_by_reference', lambda: manager.get_contribution_by_reference(
+            member(), f"SYN-{member()}-3")),
+        ('find_member_by_phone', lambda: manager.find_member_by_phone(f"08{rng.randrange(10**8):08d}")),
+        ('search_members:name', lambda: manager.search_members('Thandi Nk')),
+        ('search_members:phone', lambda: manager.search_members('0821')),
+        ('search_members:email', lambda: manager.search_members('member123')),
+        ('get_table_versions', lambda: manager.get_table_versions(('members', 'claims', 'contributions'))),
+        ('get_pool_stats', lambda: manager.get_pool_stats()),
+        ('get_pending_claims', lambda: manager.get_pending_claims()),
+        ('get_all_claims', lambda: manager.get_all_claims()),
+        ('get_all_members', lambda: manager.get_all_members()),
+        ('get_claim_attachments', lambda: manager.get_claim_attachments(range(1, 200))),
+        ('get_claim_history', lambda: manager.get_claim_history(range(1, 200))),
+        ('checkout_claims', lambda: manager.checkout_claims(admin_id, 10)),
+        ('get_leased_claims', lambda: manager.get_leased_claims(admin_id)),
+        ('release_claim_leases', lambda: manager.release_claim_leases(admin_id)),
+        ('expire_claim_leases', lambda: manager.expire_claim_leases()),
+        ('update_claim_status', lambda: manager.update_claim_status(next(pending), 'approved', admin_id, 'ok',
+                                                                    expected_version=0)),
+        ('record_contribution', lambda: manager.record_contribution(member(), 100, f"PLAN-{next(counter)}")),
+        ('create_claim', lambda: manager.create_claim(member(), 1500, 'Pharmacy', 'Medication', 'Clinic')),
+        ('update_member_phone', lambda: manager.update_member_phone(member(), f"08{rng.randrange(10**8):08d}")),
+        ('iter_export_rows', lambda: manager.iter_export_rows('claims', '2026-06-01', '2026-06-08')),
+    ]
+
+def measure(path, scale=1, repeat=5):
+    """Build the dataset, run the scenario; returns (plans, timings, dataset rows, logged errors)"""
+    data = build_dataset(path, scale)
+    manager = CommunityPoolManager(path)
+    recorder = StatementRecorder(manager)
+
+    timings = {}
+    logging.getLogger('database_manager').addHandler(recorder)
+    try:
+        for label, call in scenario(manager, data):
+            call()  # warm-up
+            runs = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                call()
+                runs.append((time.perf_counter() - started) * 1000)
+            timings[label] = round(statistics.median(runs), 3)
+    finally:
+        logging.getLogger('database_manager').removeHandler(recorder)
+
+    plans = {}
+    conn = sqlite3.connect(path)
+    try:
+        for (method, sql), sample in sorted(recorder.statements.items()):
+            key = f"{method} {hashlib.sha1(sql.encode()).hexdigest()[:10]}"
+            try:
+                plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sample}")]
+                plans[key] = {'method': method, 'sql': sql, 'plan': plan}
+            except sqlite3.Error as e:
+                plans[key] = {'method': method, 'sql': sql, 'plan': [], 'error': str(e)}
+    finally:
+        conn.close()
+    return plans, timings, data['rows'], sorted(set(recorder.errors))
+
+# ----------------------------------------------------------------------
+# Comparison
+# ----------------------------------------------------------------------
+
+def compare(baseline, plans, timings, errors=()):
+    """Returns (failures, notes) as lists of strings"""
+    failures = list(errors)
+    notes = []
+    expected = baseline.get('statements', {})
+    for key, current in sorted(plans.items()):
+        if current.get('error'):
+            failures.append(f"{key}: does not compile: {current['error']}\n    {current['sql']}")
+            continue
+        previous = expected.get(key)
+        scans = scanned_tables(current['plan'])
+        if previous is None:
+            if scans:
+                failures.append(f"{key}: new statement scans {', '.join(sorted(scans))}\n    {current['sql']}\n"
+                                f"    plan: {'; '.join(current['plan'])}")
+            else:
+                notes.append(f"{key}: new statement (run record to add it)")
+            continue
+        new_scans = scans - scanned_tables(previous['plan'])
+        if new_scans:
+            failures.append(f"{key}: now scans {', '.join(sorted(new_scans))}\n    {current['sql']}\n"
+                            f"    was: {'; '.join(previous['plan'])}\n    now: {'; '.join(current['plan'])}")
+        elif current['plan'] != previous['plan']:
+            notes.append(f"{key}: plan changed: {'; '.join(current['plan'])}")
+    for key in sorted(set(expected) - set(plans)):
+        notes.append(f"{key}: no longer issued")
+
+    budgets = baseline.get('calls', {})
+    for label, median_ms in sorted(timings.items()):
+        budget = budgets.get(label, {}).get('budget_ms')
+        if budget is None:
+            notes.append(f"{label}: no latency budget yet ({median_ms:.1f} ms)")
+        elif median_ms > budget:
+            failures.append(f"{label}: {median_ms:.1f} ms exceeds its {budget:.1f} ms budget")
+    return failures, notes
+
+def record(baseline, plans, timings, rows, scale, reset_budgets=False):
+    calls = {}
+    for label, median_ms in sorted(timings.items()):
+        previous = baseline.get('calls', {}).get(label, {})
+        budget = max(round(median_ms * BUDGET_FACTOR, 1), MIN_BUDGET_MS)
+        calls[label] = {'median_ms': median_ms,
+                        'budget_ms': budget if reset_budgets or 'budget_ms' not in previous else previous['budget_ms']}
+    return {'sqlite_version': sqlite3.sqlite_version, 'scale': scale, 'rows': rows,
+            'statements': plans, 'calls': calls}
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logging.getLogger('database_manager').setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser(description="Check CommunityPoolManager query plans and latency against a baseline")
+    parser.add_argument('command', choices=['check', 'record'])
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline JSON file')
+    parser.add_argument('--scale', type=float, default=1, help=f'{MEMBERS_PER_SCALE} members per unit')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per scenario call')
+    parser.add_argument('--reset-budgets', action='store_true', help='recompute every latency budget on record')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    scratch = tempfile.mkdtemp(prefix='query-plans-')
+    try:
+        started = time.perf_counter()
+        plans, timings, rows, errors = measure(os.path.join(scratch, 'pool.db'), args.scale, args.repeat)
+        logger.info(f"Traced {len(plans)} statements from {len(timings)} calls "
+                    f"in {time.perf_counter() - started:.0f}s")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.command == 'record':
+        if errors:
+            print("Not recording; the scenario hit errors:\n  " + '\n  '.join(errors))
+            return 1
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(record(baseline, plans, timings, rows, args.scale, args.reset_budgets), f, indent=2)
+            f.write('\n')
+        print(f"Recorded {len(plans)} statements and {len(timings)} call budgets to {args.baseline}")
+        return 0
+
+    if not baseline:
+        print(f"No baseline at {args.baseline}; run `python query_plans.py record` first")
+        return 1
+    if baseline.get('scale') != args.scale:
+        print(f"Note: baseline was recorded at scale {baseline.get('scale')}, checking at {args.scale}")
+    failures, notes = compare(baseline, plans, timings, errors)
+    for note in notes:
+        print(f"NOTE  {note}")
+    for failure in failures:
+        print(f"FAIL  {failure}")
+    print(f"{len(failures)} regressions, {len(notes)} notes across {len(plans)} statements")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,72 @@
+# response_cache.py
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+class RenderedPageCache:
+    """Small thread-safe LRU of rendered page bodies keyed by ETag"""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def set(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+def make_etag(*parts, versions):
+    """Build an ETag from the view identity and the versions of the tables it reads"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(repr(part).encode('utf-8'))
+        digest.update(b'\0')
+    for table in sorted(versions):
+        digest.update(f"{table}={versions[table][0]};".encode('utf-8'))
+    return digest.hexdigest()
+
+def page_etag(endpoint, pool_id, user_id, view_args, query_args, *extra, versions):
+    """ETag of a rendered page, the one key both serving modes use for it.
+
+    Covers the view, pool and user, the view's URL arguments and query
+    string (a MultiDict), any extra parts and the table versions.
+    """
+    arguments = sorted(view_args.items()) + sorted(query_args.items(multi=True))
+    return make_etag(endpoint, pool_id, user_id, arguments, *extra, versions=versions)
+
+def is_not_modified(request, etag, modified):
+    """Whether the request's validators match the page"""
+    if request.if_none_match:
+        return etag in request.if_none_match
+    if request.if_modified_since and modified:
+        # Second-resolution timestamps are only trusted once that second has passed
+        settled = (datetime.now(timezone.utc) - modified).total_seconds() >= 1
+        return settled and modified <= request.if_modified_since
+    return False
+
+def last_modified(versions, *stamps):
+    """Latest updated_at across the tables and any extra UTC timestamps, as an aware UTC datetime"""
+    stamps = [updated_at for _, updated_at in versions.values() if updated_at] + [stamp for stamp in stamps if stamp]
+    if not stamps:
+        return None
+    return datetime.strptime(max(stamps), '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
@@ -0,0 +1,69 @@
+# row_types.py
+from collections import namedtuple
+from functools import lru_cache
+
+def money_property(cents_field):
+    """Expose an integer-cents field as a rand amount for display"""
+    def getter(self):
+        cents = getattr(self, cents_field)
+        return cents / 100 if cents is not None else None
+    return property(getter)
+
+class MemberRow(namedtuple('MemberRow', [
+        'id', 'name', 'phone', 'email', 'monthly_amount_cents', 'status', 'created_at',
+        'total_claims', 'total_contributions', 'total_contributed_cents'])):
+    __slots__ = ()
+    monthly_amount = money_property('monthly_amount_cents')
+    total_contributed = money_property('total_contributed_cents')
+
+class ClaimRow(namedtuple('ClaimRow', [
+        'id', 'member_id', 'amount_cents', 'description', 'type', 'hospital', 'priority',
+        'status', 'reviewed_by', 'reviewed_at', 'admin_notes', 'created_at',
+        'risk_score', 'flag_reason', 'flagged', 'leased_by', 'lease_expires_at', 'version',
+        'member_name', 'member_phone', 'member_email', 'reviewer_name'])):
+    __slots__ = ()
+    amount = money_property('amount_cents')
+
+class ContributionRow(namedtuple('ContributionRow', [
+        'id', 'member_id', 'amount_cents', 'payment_reference', 'status', 'created_at',
+        'paid_at', 'member_name'])):
+    __slots__ = ()
+    amount = money_property('amount_cents')
+
+class AttachmentRow(namedtuple('AttachmentRow', [
+        'id', 'claim_id', 'sha256', 'filename', 'content_type', 'size_bytes', 'uploaded_by', 'created_at'])):
+    __slots__ = ()
+
+    @property
+    def is_image(self):
+        return self.content_type.startswith('image/')
+
+@lru_cache(maxsize=256)
+def _column_order(row_class, column_names):
+    """Map each row field to its position in the result set (None when not selected)"""
+    positions = {name: index for index, name in enumerate(column_names)}
+    unknown = set(column_names) - set(row_class._fields)
+    if unknown:
+        raise ValueError(f"{row_class.__name__} has no fields for columns: {sorted(unknown)}")
+    return tuple(positions.get(field) for field in row_class._fields)
+
+def row_factory(row_class):
+    """Build a sqlite3 row_factory producing row_class instances.
+
+    The column mapping is resolved once per query shape; when a query selects
+    exactly the row's fields in order, each row is wrapped without copying.
+    """
+    new_row = tuple.__new__
+    order = None
+    direct = False
+
+    def factory(cursor, values):
+        nonlocal order, direct
+        if order is None:
+            order = _column_order(row_class, tuple(column[0] for column in cursor.description))
+            direct = order == tuple(range(len(row_class._fields)))
+        if direct:
+            return new_row(row_class, values)
+        return new_row(row_class, [values[index] if index is not None else None for index in order])
+
+    return factory
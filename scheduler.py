@@ -0,0 +1,280 @@
+# scheduler.py
+"""In-process scheduler for database maintenance.
+
+    python scheduler.py list                 # job state for a database
+    python scheduler.py run wal_checkpoint   # run one job now (still takes the job lock)
+
+Each app process starts a JobScheduler thread (disable with
+SCHEDULER_ENABLED=0). Job state lives in each pool's scheduled_jobs table,
+and a job runs only in the process that wins a conditional UPDATE on its
+row, so several workers on one database never run the same job at once.
+Intervals carry random jitter so workers started together spread out.
+"""
+import argparse
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+
+from attachments import AttachmentStore
+from backup_manager import BackupManager
+from database_manager import CommunityPoolManager
+from integrity import IntegrityChecker
+from metrics import metrics
+from pool_registry import PoolRegistry
+from outbox import compact as compact_outbox
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 15
+DEFAULT_JITTER = 0.1
+
+metrics.describe('scheduler_job_runs_total', 'counter', 'Maintenance job runs by job and outcome')
+metrics.describe('scheduler_job_duration_seconds', 'histogram', 'Maintenance job run time')
+
+class Job:
+    """A named task run every `interval` seconds against one pool's manager (or every pool's)"""
+
+    def __init__(self, name, interval, func, jitter=DEFAULT_JITTER, lock_seconds=600, description='',
+                 all_pools=False):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.jitter = jitter
+        self.lock_seconds = lock_seconds
+        self.description = description
+        # Runs once per interval, locked on the first pool, and is also given the registry
+        self.all_pools = all_pools
+
+    def next_delay(self):
+        return max(1, round(self.interval * (1 + random.uniform(-self.jitter, self.jitter))))
+
+def _checkpoint(manager):
+    busy, wal_pages, checkpointed = manager.checkpoint_wal('PASSIVE')
+    return f"{checkpointed}/{wal_pages} WAL pages checkpointed" + (' (readers busy)' if busy else '')
+
+def _truncate_wal(manager):
+    busy, wal_pages, checkpointed = manager.checkpoint_wal('TRUNCATE')
+    return 'WAL busy, not truncated' if busy else f"WAL truncated after {checkpointed} pages"
+
+def _optimize(manager):
+    manager.optimize()
+    return 'PRAGMA optimize'
+
+def _analyze(manager):
+    manager.optimize(full=True)
+    return 'ANALYZE and search index merge'
+
+def _expire_leases(manager):
+    return f"{manager.expire_claim_leases()} expired claim leases cleared"
+
+def _refresh_stats(manager):
+    manager.get_pool_stats()
+    return 'pool stats current'
+
+def _compact_outbox(manager):
+    return f"{compact_outbox(manager)} outbox events compacted"
+
+def _verify_integrity(manager):
+    findings = IntegrityChecker(manager.db_path, workers=2).run()
+    for finding in findings:
+        if finding.severity == 'error':
+            logger.warning(f"Integrity: {finding.check} {finding.table or ''} {finding.message} "
+                           f"[{finding.count}] e.g. {finding.samples}")
+    errors = sum(1 for finding in findings if finding.severity == 'error')
+    return f"{errors} error and {len(findings) - errors} other integrity findings"
+
+def _collect_attachments(manager, pools):
+    # The attachment store is shared, so a file is garbage only if no pool or archive refers to it
+    referenced = set()
+    for pool_id in pools.pool_ids():
+        pool_manager = pools.get(pool_id)
+        hashes = pool_manager.get_attachment_hashes()
+        if hashes is None:
+            raise RuntimeError(f"could not read attachment references for pool {pool_id}")
+        referenced |= hashes
+        referenced |= BackupManager(pool_manager.db_path).archived_attachment_hashes()
+    return f"{AttachmentStore().collect_garbage(referenced)} unreferenced attachment files removed"
+
+DEFAULT_JOBS = [
+    Job('wal_checkpoint', 300, _checkpoint, description='passive WAL checkpoint'),
+    Job('wal_truncate', 86400, _truncate_wal, description='checkpoint and shrink the WAL file'),
+    Job('optimize', 3600, _optimize, description='PRAGMA optimize'),
+    Job('analyze', 86400, _analyze, lock_seconds=1800, description='full ANALYZE and FTS merge'),
+    Job('expire_claim_leases', 300, _expire_leases, description='clear lapsed review leases'),
+    Job('refresh_pool_stats', 60, _refresh_stats,
+        description='recompute pool stats into the shared pool_stats_cache table'),
+    Job('compact_outbox', 3600, _compact_outbox, description='drop acknowledged outbox events'),
+    Job('verify_integrity', 86400, _verify_integrity, lock_seconds=3600,
+        description='read-only integrity checks (python integrity.py for the full report)'),
+    Job('collect_attachments', 86400, _collect_attachments, lock_seconds=3600, all_pools=True,
+        description='delete attachment files no claim refers to'),
+]
+
+class JobScheduler:
+    """Runs due jobs for every pool on one background thread"""
+
+    def __init__(self, pools, jobs=None, poll_seconds=POLL_SECONDS):
+        self.pools = pools
+        self.jobs = {job.name: job for job in (jobs or DEFAULT_JOBS)}
+        self.poll_seconds = poll_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._thread = None
+        self._registered = set()
+
+    def _register(self, manager):
+        """Create state rows for new jobs, first due after a random share of their interval"""
+        if manager.db_path in self._registered:
+            return
+        conn = manager._connect()
+        try:
+            conn.executemany('''
+                INSERT OR IGNORE INTO scheduled_jobs (name, next_run_at)
+                VALUES (?, datetime('now', ?))
+            ''', [(job.name, f'+{round(random.uniform(0, job.interval * job.jitter))} seconds')
+                  for job in self.jobs.values()])
+            conn.commit()
+        finally:
+            conn.close()
+        self._registered.add(manager.db_path)
+
+    def _acquire(self, manager, job, force=False):
+        conn = manager._connect()
+        try:
+            cursor = conn.execute(f'''
+                UPDATE scheduled_jobs
+                SET lock_owner = ?, lock_expires_at = datetime('now', ?), last_started_at = CURRENT_TIMESTAMP
+                WHERE name = ?
+                  AND (lock_owner IS NULL OR lock_expires_at <= CURRENT_TIMESTAMP)
+                  {'' if force else 'AND next_run_at <= CURRENT_TIMESTAMP'}
+            ''', (self.owner, f'+{job.lock_seconds} seconds', job.name))
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def _release(self, manager, job, status, error, duration_ms):
+        conn = manager._connect()
+        try:
+            conn.execute('''
+                UPDATE scheduled_jobs
+                SET lock_owner = NULL, lock_expires_at = NULL, last_finished_at = CURRENT_TIMESTAMP,
+                    last_status = ?, last_error = ?, last_duration_ms = ?, run_count = run_count + 1,
+                    next_run_at = datetime('now', ?)
+                WHERE name = ? AND lock_owner = ?
+            ''', (status, error, duration_ms, f'+{job.next_delay()} seconds', job.name, self.owner))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def run_job(self, manager, name, force=False):
+        """Run one job if due (or if force) and not locked elsewhere; returns (status, detail)"""
+        job = self.jobs[name]
+        self._register(manager)
+        if not self._acquire(manager, job, force):
+            return 'skipped', 'not due or running elsewhere'
+
+        started = time.perf_counter()
+        status, detail, error = 'ok', None, None
+        try:
+            detail = job.func(manager, self.pools) if job.all_pools else job.func(manager)
+        except Exception as e:
+            status, error = 'failed', str(e)
+            logger.error(f"Job {name} failed on {manager.db_path}: {e}")
+        duration = time.perf_counter() - started
+        self._release(manager, job, status, error, round(duration * 1000))
+
+        metrics.inc('scheduler_job_runs_total', (('job', name), ('status', status)))
+        metrics.observe('scheduler_job_duration_seconds', duration, (('job', name),))
+        logger.info(f"Job {name} on {manager.db_path}: {status} in {duration * 1000:.0f} ms"
+                    + (f" ({detail})" if detail else ''))
+        return status, detail or error
+
+    def run_pending(self):
+        pool_ids = self.pools.pool_ids()
+        for pool_id in pool_ids:
+            try:
+                manager = self.pools.get(pool_id)
+                for name, job in self.jobs.items():
+                    if self._stop.is_set():
+                        return
+                    if job.all_pools and pool_id != pool_ids[0]:
+                        continue
+                    self.run_job(manager, name)
+            except Exception as e:
+                logger.error(f"Scheduler pass for pool {pool_id} failed: {e}")
+
+    def _loop(self):
+        while not self._stop.wait(self.poll_seconds * random.uniform(1 - DEFAULT_JITTER, 1 + DEFAULT_JITTER)):
+            self.run_pending()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+            self._thread.start()
+            logger.info(f"Scheduler started with {len(self.jobs)} jobs as {self.owner}")
+
+    def stop(self):
+        self._stop.set()
+
+def job_states(manager):
+    conn = manager._connect()
+    try:
+        cursor = conn.execute('''
+            SELECT name, next_run_at, lock_owner, last_finished_at, last_status,
+                   last_duration_ms, run_count, last_error
+            FROM scheduled_jobs ORDER BY name
+        ''')
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+class _SinglePool:
+    """Just enough of PoolRegistry for running jobs against one database"""
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def pool_ids(self):
+        return ['default']
+
+    def get(self, pool_id=None):
+        return self.manager
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Inspect and run maintenance jobs")
+    parser.add_argument('--db', default='health_pool.db', help='database file')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='show job state')
+    run = commands.add_parser('run', help='run a job now')
+    run.add_argument('job', choices=[job.name for job in DEFAULT_JOBS])
+    args = parser.parse_args()
+
+    manager = CommunityPoolManager(args.db)
+    scheduler = JobScheduler(_SinglePool(manager))
+    if args.command == 'run':
+        if scheduler.jobs[args.job].all_pools:
+            # Needs every configured pool (HEALTH_POOL_POOLS), not just --db
+            pools = PoolRegistry()
+            scheduler = JobScheduler(pools)
+            manager = pools.get(pools.pool_ids()[0])
+        status, detail = scheduler.run_job(manager, args.job, force=True)
+        print(f"{args.job}: {status}" + (f" - {detail}" if detail else ''))
+        return 0 if status == 'ok' else 1
+
+    scheduler._register(manager)
+    print(f"{'job':<22}{'next run (UTC)':<22}{'last finished':<22}{'status':<9}{'ms':>7}{'runs':>6}  lock")
+    for name, next_run_at, lock_owner, finished, status, duration_ms, run_count, error in job_states(manager):
+        print(f"{name:<22}{next_run_at:<22}{finished or '-':<22}{status or '-':<9}"
+              f"{duration_ms if duration_ms is not None else '-':>7}{run_count:>6}  {lock_owner or ''}")
+        if error:
+            print(f"    last error: {error}")
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,281 @@
+# statements.py
+"""Monthly member statements, generated in bulk.
+
+    python statements.py 2026-09                    # statements/2026-09/html/part-*.zip
+    python statements.py 2026-09 --format pdf --workers 8 --merge
+
+The month's contributions, claim activity and year-to-date totals are read
+with four set-based queries over one read snapshot, each sorted by member,
+and merged with the member list in a single pass. Members are grouped into
+parts by fixed id ranges; each part is rendered and compressed by a worker
+process into its own zip file, written under a temporary name and renamed
+when complete. Each format has its own directory, and rerunning the same
+month and format skips parts that already exist, so an interrupted run
+resumes where it stopped; a rerun with a different --part-size is refused
+rather than mixing part ranges. --merge combines the parts into one
+statements-<month>-<format>.zip at the end.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+import zipfile
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date, datetime
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from database_manager import CommunityPoolManager
+from row_types import ClaimRow, ContributionRow, row_factory
+
+try:
+    from weasyprint import HTML
+except ImportError:  # PDF output is optional
+    HTML = None
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+STATEMENT_TEMPLATE = 'statement.html'
+
+def month_bounds(month):
+    """('YYYY-MM-01 00:00:00' of the month, of the next month, of January) for 'YYYY-MM'"""
+    start = datetime.strptime(month, '%Y-%m').date()
+    end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    stamp = '{:%Y-%m-%d} 00:00:00'.format
+    return stamp(start), stamp(end), stamp(start.replace(month=1))
+
+def previous_month():
+    today = date.today()
+    return f"{today.year - (today.month == 1)}-{(today.month - 2) % 12 + 1:02d}"
+
+class _MemberGroups:
+    """Walks rows sorted by member_id, handing out each member's rows in turn"""
+
+    def __init__(self, rows, key=lambda row: row.member_id):
+        self._rows = iter(rows)
+        self._key = key
+        self._next = next(self._rows, None)
+
+    def take(self, member_id):
+        group = []
+        while self._next is not None and self._key(self._next) <= member_id:
+            if self._key(self._next) == member_id:
+                group.append(self._next)
+            self._next = next(self._rows, None)
+        return group
+
+# ----------------------------------------------------------------------
+# Worker side
+# ----------------------------------------------------------------------
+
+_env = None
+
+def _init_worker(template_dir):
+    global _env
+    _env = Environment(loader=FileSystemLoader(template_dir), autoescape=select_autoescape(['html']))
+
+def _render_part(path, month, statements, fmt):
+    """Render one part's statements into a zip at path; returns how many were written"""
+    template = _env.get_template(STATEMENT_TEMPLATE)
+    generated_at = datetime.now().strftime('%Y-%m-%d %H:%M')
+    partial = path + '.partial'
+    with zipfile.ZipFile(partial, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for statement in statements:
+            body = template.render(month=month, generated_at=generated_at, **statement)
+            name = f"{month}/{statement['member']['id']:07d}"
+            if fmt == 'pdf':
+                archive.writestr(f"{name}.pdf", HTML(string=body).write_pdf())
+            else:
+                archive.writestr(f"{name}.html", body)
+    os.replace(partial, path)
+    return len(statements)
+
+# ----------------------------------------------------------------------
+# Coordinator
+# ----------------------------------------------------------------------
+
+class StatementGenerator:
+    """Reads a month's data in bulk and fans statement rendering out to a process pool"""
+
+    def __init__(self, manager, month, output_dir='statements', workers=None, part_size=1000, fmt='html'):
+        if fmt == 'pdf' and HTML is None:
+            raise RuntimeError("PDF statements need weasyprint; install it or use --format html")
+        self.manager = manager
+        self.month = month
+        self.base_dir = output_dir
+        self.output_dir = os.path.join(output_dir, month, fmt)
+        self.workers = workers or os.cpu_count() or 1
+        self.part_size = part_size
+        self.fmt = fmt
+
+    def part_path(self, part):
+        first = part * self.part_size + 1
+        return os.path.join(self.output_dir, f"part-{first:08d}-{first + self.part_size - 1:08d}.zip")
+
+    def _check_resume(self):
+        """Refuse to add parts to an earlier run that split members differently"""
+        path = os.path.join(self.output_dir, 'manifest.json')
+        if not os.path.exists(path):
+            return
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('parts') and manifest.get('part_size') != self.part_size:
+            raise RuntimeError(f"{self.output_dir} holds parts of {manifest.get('part_size')} members; "
+                               f"rerun with --part-size {manifest.get('part_size')} or use a new --out")
+
+    def _statements(self, conn):
+        """Yield (part, statement) for every member who existed by the end of the month, in id order"""
+        start, end, year_start = month_bounds(self.month)
+
+        contributions = conn.cursor()
+        contributions.row_factory = row_factory(ContributionRow)
+        contributions.execute('''
+            SELECT id, member_id, CAST(ROUND(amount * 100) AS INTEGER) AS amount_cents,
+                   payment_reference, status, created_at, paid_at
+            FROM contributions
+            WHERE created_at >= ? AND created_at < ?
+            ORDER BY member_id, created_at
+        ''', (start, end))
+
+        claims = conn.cursor()
+        claims.row_factory = row_factory(ClaimRow)
+        claims.execute('''
+            SELECT c.id, c.member_id, CAST(ROUND(c.amount * 100) AS INTEGER) AS amount_cents,
+                   c.description, c.type, c.hospital, c.status, c.reviewed_at, c.admin_notes, c.created_at
+            FROM claims c
+            WHERE (c.created_at >= ? AND c.created_at < ?) OR (c.reviewed_at >= ? AND c.reviewed_at < ?)
+            ORDER BY c.member_id, c.created_at
+        ''', (start, end, start, end))
+
+        year_to_date = conn.execute('''
+            SELECT member_id, CAST(ROUND(SUM(amount) * 100) AS INTEGER)
+            FROM contributions
+            WHERE status = 'paid' AND created_at >= ? AND created_at < ?
+            GROUP BY member_id
+            ORDER BY member_id
+        ''', (year_start, end))
+
+        members = conn.execute('''
+            SELECT id, name, phone, email, CAST(ROUND(monthly_amount * 100) AS INTEGER), status
+            FROM members
+            WHERE created_at < ?
+            ORDER BY id
+        ''', (end,))
+
+        contribution_groups = _MemberGroups(contributions)
+        claim_groups = _MemberGroups(claims)
+        ytd_groups = _MemberGroups(year_to_date, key=lambda row: row[0])
+        for member_id, name, phone, email, monthly_amount_cents, status in members:
+            member_contributions = contribution_groups.take(member_id)
+            ytd = ytd_groups.take(member_id)
+            yield (member_id - 1) // self.part_size, {
+                'member': {'id': member_id, 'name': name, 'phone': phone, 'email': email,
+                           'monthly_amount': monthly_amount_cents / 100, 'status': status},
+                'contributions': member_contributions,
+                'claims': claim_groups.take(member_id),
+                'month_paid': sum(row.amount_cents for row in member_contributions if row.status == 'paid') / 100,
+                'ytd_paid': (ytd[0][1] if ytd else 0) / 100,
+            }
+
+    def run(self):
+        """Generate every missing part; returns {'written': n, 'skipped_parts': n, 'parts': n}"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._check_resume()
+        written = skipped_parts = parts = 0
+        started = time.perf_counter()
+
+        conn = self.manager._connect()
+        conn.isolation_level = None
+        conn.execute('BEGIN')  # one snapshot for all four queries
+        total = conn.execute('SELECT COUNT(*) FROM members WHERE created_at < ?',
+                             (month_bounds(self.month)[1],)).fetchone()[0]
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(TEMPLATE_DIR,)) as executor:
+                in_flight = set()
+
+                def collect(block):
+                    nonlocal written, in_flight
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED if block else ALL_COMPLETED)
+                    for future in done:
+                        written += future.result()
+                    rate = written / max(time.perf_counter() - started, 1e-6)
+                    logger.info(f"{written}/{total} statements ({rate:.0f}/s, "
+                                f"~{(total - written) / rate if rate else 0:.0f}s left)")
+
+                def submit(part, statements):
+                    nonlocal parts, skipped_parts, total
+                    parts += 1
+                    if os.path.exists(self.part_path(part)):
+                        skipped_parts += 1
+                        total -= len(statements)
+                        return
+                    # Bound the rows held in memory while workers catch up
+                    while len(in_flight) >= self.workers * 2:
+                        collect(block=True)
+                    in_flight.add(executor.submit(_render_part, self.part_path(part), self.month,
+                                                  statements, self.fmt))
+
+                current, batch = None, []
+                for part, statement in self._statements(conn):
+                    if part != current and batch:
+                        submit(current, batch)
+                        batch = []
+                    current = part
+                    batch.append(statement)
+                if batch:
+                    submit(current, batch)
+                if in_flight:
+                    collect(block=False)
+        finally:
+            conn.execute('COMMIT')
+            conn.close()
+
+        logger.info(f"Wrote {written} statements in {time.perf_counter() - started:.1f}s "
+                    f"({skipped_parts} of {parts} parts already done)")
+        with open(os.path.join(self.output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump({'month': self.month, 'format': self.fmt, 'part_size': self.part_size,
+                       'parts': sorted(name for name in os.listdir(self.output_dir) if name.endswith('.zip'))},
+                      f, indent=2)
+        return {'written': written, 'skipped_parts': skipped_parts, 'parts': parts}
+
+    def merge(self, path=None):
+        """Combine the part archives into a single zip; returns its path"""
+        path = path or os.path.join(self.base_dir, f"statements-{self.month}-{self.fmt}.zip")
+        part_names = sorted(name for name in os.listdir(self.output_dir) if name.endswith('.zip'))
+        with zipfile.ZipFile(path + '.partial', 'w', compression=zipfile.ZIP_DEFLATED) as merged:
+            for name in part_names:
+                with zipfile.ZipFile(os.path.join(self.output_dir, name)) as part:
+                    for info in part.infolist():
+                        merged.writestr(info, part.read(info))
+        os.replace(path + '.partial', path)
+        logger.info(f"Merged {len(part_names)} parts into {path}")
+        return path
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Generate monthly member statements")
+    parser.add_argument('month', nargs='?', default=previous_month(), help='YYYY-MM (default: last month)')
+    parser.add_argument('--db', default='health_pool.db', help='database file')
+    parser.add_argument('--out', default='statements', help='output directory')
+    parser.add_argument('--workers', type=int, help='rendering processes (default: CPU count)')
+    parser.add_argument('--part-size', type=int, default=1000, help='members per part archive')
+    parser.add_argument('--format', choices=['html', 'pdf'], default='html')
+    parser.add_argument('--merge', action='store_true', help='also combine the parts into one zip')
+    args = parser.parse_args()
+
+    try:
+        generator = StatementGenerator(CommunityPoolManager(args.db), args.month, args.out,
+                                       workers=args.workers, part_size=args.part_size, fmt=args.format)
+        generator.run()
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+    if args.merge:
+        generator.merge()
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,223 @@
+# template_build.py
+"""Validate and precompile the Jinja templates.
+
+    python template_build.py            # compile every template into the bytecode cache
+    python template_build.py --bench    # also time each template with realistic data sizes
+
+Flask compiles a template the first time each worker renders it. This
+build step compiles every template into a FileSystemBytecodeCache, which
+app.py (and asgi.py) attach to their Jinja environments and load in full at
+startup, so the first request after a deploy skips parsing and code
+generation just like the thousandth.
+"""
+import argparse
+import logging
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from jinja2 import FileSystemBytecodeCache, TemplateError
+
+from activity_feed import ActivityEvent
+from row_types import AttachmentRow, MemberRow, ClaimRow, ContributionRow
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_CACHE_DIR = os.getenv('TEMPLATE_CACHE_DIR', os.path.join(BASE_DIR, 'template_cache'))
+
+# Row counts for the benchmark, sized like a busy pool
+BENCH_SIZES = {
+    'members': 2000,
+    'claims': 1000,
+    'pending_claims': 200,
+    'member_contributions': 60,
+    'member_claims': 20,
+}
+
+def _cache_dir(app, cache_dir):
+    # Async (Quart) and sync (Flask) environments generate different code for
+    # the same source, so they must not share bytecode files
+    return os.path.join(cache_dir, 'async' if app.jinja_env.is_async else 'sync')
+
+def attach_bytecode_cache(app, cache_dir=TEMPLATE_CACHE_DIR):
+    """Point the app's Jinja environment at the persistent bytecode cache"""
+    path = _cache_dir(app, cache_dir)
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError as e:
+        logger.warning(f"Template bytecode cache disabled, cannot use {path}: {e}")
+        return False
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(path)
+    return True
+
+def compile_templates(env):
+    """Load every template, writing bytecode for any not yet cached; returns (names, {name: error})"""
+    compiled, errors = [], {}
+    for name in env.list_templates(extensions=['html']):
+        try:
+            env.get_template(name)
+            compiled.append(name)
+        except TemplateError as e:
+            errors[name] = e
+    return compiled, errors
+
+def warm_templates(app):
+    """Load every template into this process's template cache at startup"""
+    started = time.perf_counter()
+    compiled, errors = compile_templates(app.jinja_env)
+    for name, error in errors.items():
+        logger.error(f"Template {name} failed to compile: {error}")
+    logger.info(f"Loaded {len(compiled)} templates in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return compiled, errors
+
+def build(app):
+    """Recompile every template from source into a fresh bytecode cache"""
+    env = app.jinja_env
+    if env.bytecode_cache is None and not attach_bytecode_cache(app):
+        return [], {'*': 'bytecode cache directory is not writable'}
+    env.bytecode_cache.clear()
+    env.cache.clear()
+    return compile_templates(env)
+
+def _bench_contexts(sizes):
+    """Template context per template, built from the same row types the manager returns"""
+    now = datetime.now()
+    def stamp(offset):
+        return (now - timedelta(minutes=offset)).strftime('%Y-%m-%d %H:%M:%S')
+
+    members = [
+        MemberRow(i, f"Member {i}", f"07{i:08d}", f"member{i}@example.co.za", 15000, 'active',
+                  stamp(i), i % 4, 12, 180000)
+        for i in range(1, sizes['members'] + 1)
+    ]
+
+    def claim(i, status):
+        flagged = int(i % 17 == 0)
+        return ClaimRow(i, i % sizes['members'] + 1, 250000 + i, f"Hospital visit {i} for treatment",
+                        'Hospital', 'Chris Hani Baragwanath', ('normal', 'medium', 'high')[i % 3],
+                        status, None if status == 'pending' else 1,
+                        None if status == 'pending' else stamp(i), None, stamp(i),
+                        70 if flagged else 10, 'Near-duplicate of a recent claim' if flagged else None,
+                        flagged, None, None, int(status != 'pending'), f"Member {i}", f"07{i:08d}", f"member{i}@example.co.za",
+                        None if status == 'pending' else 'Administrator')
+
+    statuses = ('pending', 'approved', 'declined', 'paid')
+    claims = [claim(i, statuses[i % 4]) for i in range(1, sizes['claims'] + 1)]
+    pending_claims = [claim(i, 'pending') for i in range(1, sizes['pending_claims'] + 1)]
+    contributions = [
+        ContributionRow(i, 1, 15000, f"REF-{i}", 'paid', stamp(i * 1440), stamp(i * 1440), 'Member 1')
+        for i in range(1, sizes['member_contributions'] + 1)
+    ]
+    member = {'id': 1, 'name': 'Member 1', 'phone': '0700000001', 'email': 'member1@example.co.za',
+              'monthly_amount': 150.0, 'status': 'active'}
+    stats = {'current_balance': 1250000.0, 'total_contributions': 3600000.0, 'total_payouts': 2350000.0,
+             'member_count': sizes['members'], 'pending_claims': sizes['pending_claims'],
+             'monthly_expected': sizes['members'] * 150.0}
+
+    return {
+        'dashboard.html': {
+            'stats': stats,
+            'pending_claims_list': pending_claims,
+            'recent_activity': {
+                'recent_contributions': contributions[:5],
+                'recent_claims': claims[:5],
+                'events': [ActivityEvent(i, 'contribution', i, 1, 'Member 1', 15000, 'paid', stamp(i))
+                           for i in range(10, 0, -1)],
+                'last_seq': 10,
+            },
+            'all_members': members,
+        },
+        'admin_members.html': {'members': members},
+        'admin_claims.html': {
+            'claims': claims,
+            'attachments': {
+                claim.id: [AttachmentRow(claim.id, claim.id, f"{claim.id:064x}", f"invoice-{claim.id}.pdf",
+                                         'application/pdf', 480000, 1, claim.created_at)]
+                for claim in claims[::3]
+            },
+            'now': stamp(0),
+        },
+        'admin_pools.html': {'pool_rows': [('default', 'Community Health Pool', stats)], 'totals': stats},
+        'member_dashboard.html': {
+            'member': member,
+            'contributions': contributions,
+            'claims': claims[:sizes['member_claims']],
+        },
+        'contribute.html': {'member': member},
+        'submit_claim.html': {'member': member},
+        'update_phone.html': {'member': member},
+        '503.html': {'retry_after': 5},
+        'statement.html': {
+            'month': now.strftime('%Y-%m'),
+            'generated_at': stamp(0),
+            'member': member,
+            'contributions': contributions[:2],
+            'claims': claims[:3],
+            'month_paid': 300.0,
+            'ytd_paid': 2700.0,
+        },
+    }
+
+def benchmark(app, sizes=BENCH_SIZES, rounds=20):
+    """Time compile-from-source, load-from-bytecode and render for every template"""
+    from flask import render_template, session
+
+    env = app.jinja_env
+    contexts = _bench_contexts(sizes)
+    results = []
+    with app.test_request_context('/'):
+        session.update({'user_id': 1, 'user_type': 'admin', 'username': 'admin', 'name': 'Administrator'})
+        for name in env.list_templates(extensions=['html']):
+            source, filename, _ = env.loader.get_source(env, name)
+            started = time.perf_counter()
+            env.compile(source, name, filename)
+            compile_ms = (time.perf_counter() - started) * 1000
+
+            env.cache.clear()
+            started = time.perf_counter()
+            env.get_template(name)
+            load_ms = (time.perf_counter() - started) * 1000
+
+            context = contexts.get(name, {})
+            timings = []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                body = render_template(name, **context)
+                timings.append((time.perf_counter() - started) * 1000)
+            session.pop('_flashes', None)
+            results.append((name, compile_ms, load_ms, statistics.median(timings), len(body)))
+    return results
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Validate and precompile Jinja templates")
+    parser.add_argument('--bench', action='store_true', help='time every template with realistic data sizes')
+    parser.add_argument('--rounds', type=int, default=20, help='renders per template when benchmarking')
+    args = parser.parse_args()
+
+    from app import app
+    apps = [app]
+    try:
+        from asgi import async_app
+        apps.append(async_app)
+    except ImportError:
+        logger.info("quart not installed; skipping the async template cache")
+
+    failed = False
+    for target in apps:
+        compiled, errors = build(target)
+        for name, error in errors.items():
+            logger.error(f"{name}: {error}")
+        failed = failed or bool(errors)
+        logger.info(f"Compiled {len(compiled)} templates into {_cache_dir(target, TEMPLATE_CACHE_DIR)}")
+
+    if args.bench and not failed:
+        print(f"{'template':<24}{'compile ms':>12}{'load ms':>10}{'render ms':>11}{'KB':>9}")
+        for name, compile_ms, load_ms, render_ms, size in benchmark(app, rounds=args.rounds):
+            print(f"{name:<24}{compile_ms:>12.2f}{load_ms:>10.2f}{render_ms:>11.2f}{size / 1024:>9.1f}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
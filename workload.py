@@ -0,0 +1,289 @@
+# workload.py
+"""Capture real traffic and replay it against a copy of the database.
+
+    python workload.py from-log app.log workload.jsonl       # convert werkzeug access lines
+    python workload.py replay workload.jsonl --db backups/health_pool_20250925.db \\
+        --speed 2 --concurrency 16 --report after.json --compare before.json
+
+A workload file is JSONL with one request per line:
+
+    {"t": 12.503, "method": "POST", "path": "/contribute", "status": 302,
+     "session": {"user_id": 7, "user_type": "member", ...}, "form": {"amount": "150"}}
+
+Access-log lines give method, path, status and time only, so POSTs
+converted from app.log have no form and are skipped on replay, and every
+request runs anonymously. Setting WORKLOAD_CAPTURE=path makes app.py
+record the full shape (session identity and form fields, with passwords
+replaced by REPLAY_PASSWORD) through WorkloadRecorder. Capture files hold
+member names and phone numbers; keep them with the database backups.
+
+Replay runs in-process through Flask's test client on a private copy of
+the database, so writes in the workload never reach the source file. Take
+the copy from a backup made before the capture started; otherwise replayed
+registrations collide with the members they created the first time.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Form fields never written to a capture file
+REDACTED_FIELDS = {'password', 'confirm_password', 'new_password'}
+REPLAY_PASSWORD = 'replay-password'
+
+# Session keys needed to replay a request as the same user
+SESSION_FIELDS = ('pool_id', 'user_id', 'username', 'user_type', 'member_id', 'name', 'phone', 'email')
+
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*m')
+ACCESS_LINE = re.compile(
+    r'^(?P<asctime>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - werkzeug - INFO - '
+    r'\S+ - - \[[^\]]+\] "(?P<method>[A-Z]+) (?P<path>\S+) HTTP/[\d.]+" (?P<status>\d{3})'
+)
+
+# Requests from the interactive debugger are not application traffic
+IGNORED_PATHS = ('__debugger__=',)
+
+# ----------------------------------------------------------------------
+# Capture
+# ----------------------------------------------------------------------
+
+def parse_access_log(path):
+    """Yield workload records from werkzeug access lines in an app.log file"""
+    started = None
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            match = ACCESS_LINE.match(ANSI_ESCAPE.sub('', line))
+            if not match or any(marker in match['path'] for marker in IGNORED_PATHS):
+                continue
+            at = datetime.strptime(match['asctime'], '%Y-%m-%d %H:%M:%S,%f').timestamp()
+            started = at if started is None else started
+            yield {'t': round(at - started, 3), 'method': match['method'], 'path': match['path'],
+                   'status': int(match['status']), 'session': None, 'form': None}
+
+class WorkloadRecorder:
+    """Appends one workload record per request to a JSONL file.
+
+    Registered as an after_request hook, so it sees the response status and
+    costs one json.dumps and a buffered write per request.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8', buffering=1)
+
+    def init_app(self, app):
+        app.after_request(self.record)
+        logger.info(f"Capturing workload to {self.path}")
+
+    def record(self, response):
+        from flask import request, session
+        if request.endpoint in ('static_asset', 'metrics_endpoint', 'healthz'):
+            return response
+        form = None
+        if request.method == 'POST':
+            form = {key: REPLAY_PASSWORD if key in REDACTED_FIELDS else value
+                    for key, value in request.form.items()}
+        identity = {key: session[key] for key in SESSION_FIELDS if key in session} or None
+        record = {'t': round(time.time() - self.started, 3), 'method': request.method,
+                  'path': request.full_path.rstrip('?'), 'status': response.status_code,
+                  'session': identity, 'form': form}
+        line = json.dumps(record, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + '\n')
+        return response
+
+def read_workload(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def write_workload(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+# ----------------------------------------------------------------------
+# Replay
+# ----------------------------------------------------------------------
+
+def copy_database(db_path, directory):
+    """Consistent copy of a (possibly live) database via the backup API"""
+    from backup_manager import BackupManager
+    target = os.path.join(directory, os.path.basename(db_path))
+    if not BackupManager(db_path, backup_dir=directory).backup(target):
+        raise RuntimeError(f"Could not copy {db_path}")
+    return target
+
+class WorkloadReplayer:
+    """Replays workload records at their recorded offsets, divided by speed.
+
+    speed=0 sends every request as soon as a worker is free. Each worker
+    thread has its own test client; a record with a session runs with that
+    session installed, so the view sees the same user it did in production.
+    Lag (how late a request started against its schedule) is reported
+    separately, so a saturated replay is not mistaken for slow routes.
+    """
+
+    def __init__(self, app, speed=1.0, concurrency=8):
+        self.app = app
+        self.speed = speed
+        self.concurrency = concurrency
+        self._local = threading.local()
+        self._adapter = app.url_map.bind('localhost')
+
+    def endpoint(self, record):
+        try:
+            endpoint, _ = self._adapter.match(record['path'].split('?', 1)[0], method=record['method'])
+            return endpoint
+        except Exception:
+            return 'unmatched'
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        return client
+
+    def _send(self, record, due):
+        client = self._client()
+        started = time.perf_counter()
+        lag = max(0.0, started - due) if due is not None else 0.0
+        with client.session_transaction() as session:
+            session.clear()
+            if record.get('session'):
+                session.update(record['session'])
+        if record['method'] == 'POST':
+            response = client.post(record['path'], data=record['form'])
+        else:
+            response = client.open(record['path'], method=record['method'])
+        response.close()
+        return {'endpoint': self.endpoint(record), 'elapsed': time.perf_counter() - started, 'lag': lag,
+                'status': response.status_code, 'expected': record.get('status')}
+
+    def run(self, records):
+        """Replay records; returns (results, skipped)"""
+        runnable = [record for record in records if record['method'] != 'POST' or record.get('form') is not None]
+        skipped = len(records) - len(runnable)
+        futures = []
+        origin = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='replay') as executor:
+            for record in runnable:
+                due = None
+                if self.speed:
+                    due = origin + record['t'] / self.speed
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                futures.append(executor.submit(self._send, record, due))
+            results = [future.result() for future in futures]
+        logger.info(f"Replayed {len(results)} requests in {time.perf_counter() - origin:.1f} s"
+                    f" ({skipped} POSTs without form data skipped)")
+        return results, skipped
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(results):
+    """Per-endpoint latency distribution in milliseconds"""
+    by_endpoint = {}
+    for result in results:
+        by_endpoint.setdefault(result['endpoint'], []).append(result)
+
+    summary = {}
+    for endpoint, rows in sorted(by_endpoint.items()):
+        latencies = sorted(row['elapsed'] * 1000 for row in rows)
+        summary[endpoint] = {
+            'count': len(rows),
+            'mean_ms': round(statistics.fmean(latencies), 2),
+            'p50_ms': round(_percentile(latencies, 0.50), 2),
+            'p90_ms': round(_percentile(latencies, 0.90), 2),
+            'p99_ms': round(_percentile(latencies, 0.99), 2),
+            'max_ms': round(latencies[-1], 2),
+            'errors': sum(1 for row in rows if row['status'] >= 500),
+            'status_mismatches': sum(1 for row in rows if row['expected'] and row['status'] != row['expected']),
+            'max_lag_ms': round(max(row['lag'] for row in rows) * 1000, 2),
+        }
+    return summary
+
+def print_summary(summary, baseline=None):
+    header = f"{'endpoint':<26}{'count':>7}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}{'5xx':>5}{'lag ms':>9}"
+    if baseline:
+        header += f"{'p50 Δ':>9}{'p99 Δ':>9}"
+    print(header)
+    for endpoint, row in summary.items():
+        line = (f"{endpoint:<26}{row['count']:>7}{row['p50_ms']:>9.2f}{row['p90_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+                f"{row['max_ms']:>9.2f}{row['errors']:>5}{row['max_lag_ms']:>9.2f}")
+        before = (baseline or {}).get(endpoint)
+        if before:
+            line += f"{row['p50_ms'] - before['p50_ms']:>+9.2f}{row['p99_ms'] - before['p99_ms']:>+9.2f}"
+        print(line)
+
+def replay(workload_path, db_path, speed=1.0, concurrency=8):
+    """Replay a workload file against a temporary copy of db_path; returns the per-endpoint summary"""
+    records = read_workload(workload_path)
+    workdir = tempfile.mkdtemp(prefix='replay-')
+    try:
+        # app.py opens its pools at import, so point it at the copy first
+        os.environ.pop('HEALTH_POOL_POOLS', None)
+        os.environ['HEALTH_POOL_DB'] = copy_database(db_path, workdir)
+        os.environ.pop('WORKLOAD_CAPTURE', None)
+        os.environ['SCHEDULER_ENABLED'] = '0'
+        from app import app, pools
+        for record in records:
+            if record.get('session'):
+                record['session']['pool_id'] = pools.default_pool
+        results, _ = WorkloadReplayer(app, speed=speed, concurrency=concurrency).run(records)
+        return summarize(results)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Capture and replay request workloads")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    from_log = commands.add_parser('from-log', help='convert werkzeug access lines into a workload file')
+    from_log.add_argument('log', help='application log, e.g. app.log')
+    from_log.add_argument('output', help='workload file to write')
+
+    run = commands.add_parser('replay', help='replay a workload against a copy of a database')
+    run.add_argument('workload', help='workload file')
+    run.add_argument('--db', default='health_pool.db', help='database to copy (never modified)')
+    run.add_argument('--speed', type=float, default=1.0, help='time scale; 2 is twice as fast, 0 is flat out')
+    run.add_argument('--concurrency', type=int, default=8, help='requests in flight at once')
+    run.add_argument('--report', help='write the per-endpoint summary as JSON')
+    run.add_argument('--compare', help='earlier --report to show latency changes against')
+    args = parser.parse_args()
+
+    if args.command == 'from-log':
+        records = list(parse_access_log(args.log))
+        write_workload(args.output, records)
+        logger.info(f"Wrote {len(records)} requests to {args.output}")
+        return 0
+
+    summary = replay(args.workload, args.db, speed=args.speed, concurrency=args.concurrency)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_summary(summary, baseline)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        logger.info(f"Wrote report to {args.report}")
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())